@@ -0,0 +1,175 @@
+"""
+Serve collected static files before the rest of the middleware runs.
+
+The files in STATIC_ROOT are indexed once at startup; collectstatic runs
+before the application starts, so the index does not change afterwards.
+Each request picks the smallest precompressed variant the client accepts
+(brotli, then gzip), so nothing is compressed while serving. Fingerprinted
+names get a year-long ``immutable`` Cache-Control; plain names are
+revalidated with ETag and Last-Modified after a minute.
+"""
+
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .storage import ENCODINGS
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=60"
+
+
+@dataclass
+class StaticAsset:
+    """A collected file and its precompressed variants."""
+
+    path: str
+    content_type: str
+    mtime: int
+    immutable: bool
+    # encoding -> (path, size), the identity encoding under None
+    variants: dict = field(default_factory=dict)
+
+    def etag(self, encoding) -> str:
+        size = self.variants[encoding][1]
+        suffix = f"-{encoding}" if encoding else ""
+        return f'"{self.mtime:x}-{size:x}{suffix}"'
+
+
+def accepted_encodings(header: str) -> set:
+    """Parse Accept-Encoding into the set of codings with a non-zero q."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+def build_index(root, hashed_names=()) -> dict:
+    """Map every file under ``root`` (by URL path) to a StaticAsset."""
+    root = Path(root)
+    hashed_names = set(hashed_names)
+    suffixes = {suffix: encoding for encoding, suffix in ENCODINGS.items()}
+    index = {}
+    variants = []
+
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            path = Path(directory, file_name)
+            name = path.relative_to(root).as_posix()
+            stat = path.stat()
+            encoding = suffixes.get(path.suffix)
+            if encoding:
+                variants.append((name[:-len(path.suffix)], encoding, str(path), stat.st_size))
+                continue
+            content_type, _ = mimetypes.guess_type(file_name)
+            index[name] = StaticAsset(
+                path=str(path),
+                content_type=content_type or "application/octet-stream",
+                mtime=int(stat.st_mtime),
+                immutable=name in hashed_names,
+                variants={None: (str(path), stat.st_size)},
+            )
+
+    for name, encoding, path, size in variants:
+        if name in index:
+            index[name].variants[encoding] = (path, size)
+    return index
+
+
+class StaticFilesMiddleware:
+    """
+    Answer requests under STATIC_URL from the collected files.
+
+    Place it first in MIDDLEWARE so static requests skip sessions,
+    authentication and the metrics of the site's views. It is disabled
+    when STATIC_ROOT is unset; the staticfiles app serves assets in
+    development.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        root = getattr(settings, "STATIC_ROOT", None)
+        if not root or not os.path.isdir(root) or not settings.STATIC_URL.startswith("/"):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.index = build_index(
+            root, getattr(staticfiles_storage, "hashed_files", {}).values())
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """Return a response for a collected file, or None to pass the request on."""
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(self.prefix):
+            return None
+        asset = self.index.get(request.path[len(self.prefix):])
+        if asset is None:
+            return None
+
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        encoding = next(
+            (coding for coding in ENCODINGS if coding in asset.variants and coding in accepted),
+            None,
+        )
+        path, size = asset.variants[encoding]
+
+        headers = HttpResponse()
+        headers["ETag"] = asset.etag(encoding)
+        headers["Last-Modified"] = http_date(asset.mtime)
+        headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL)
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        response = get_conditional_response(
+            request, etag=headers["ETag"], last_modified=asset.mtime, response=headers)
+        if response is not headers:
+            return response
+
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=asset.content_type)
+        else:
+            response = FileResponse(open(path, "rb"), content_type=asset.content_type)
+            response.headers.pop("Content-Disposition", None)
+        for header in ("ETag", "Last-Modified", "Cache-Control", "Vary"):
+            if header in headers:
+                response[header] = headers[header]
+        response["Content-Length"] = str(size)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+            response["X-Content-Type-Options"] = "nosniff"
+        return response
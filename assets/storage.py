@@ -0,0 +1,92 @@
+"""
+Static files storage that fingerprints and precompresses assets.
+
+``collectstatic`` copies every asset into STATIC_ROOT under a content-hashed
+name (``css/base.3f2a9c1e0b7d.css``), rewrites the references between them
+and records the mapping in ``staticfiles.json``, as ManifestStaticFilesStorage
+does. It then writes a gzip variant (``.gz``) of every compressible file and
+a brotli variant (``.br``) when the optional ``brotli`` package is
+installed. Variants that would not be meaningfully smaller are skipped.
+assets.middleware serves them.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always written.
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = frozenset({
+    ".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".xml", ".html",
+    ".ico", ".webmanifest", ".ttf", ".otf", ".eot",
+})
+MIN_COMPRESS_SIZE = 256
+# A variant is kept only if it is at least this much smaller.
+MIN_SAVING = 0.05
+
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def is_compressible(name: str) -> bool:
+    return any(name.lower().endswith(extension) for extension in COMPRESSIBLE_EXTENSIONS)
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(content: bytes) -> dict:
+    """Return ``{encoding: compressed bytes}`` for the worthwhile variants."""
+    if len(content) < MIN_COMPRESS_SIZE:
+        return {}
+
+    # mtime=0 keeps the output identical across builds.
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+
+    limit = len(content) * (1 - MIN_SAVING)
+    return {encoding: data for encoding, data in variants.items() if len(data) <= limit}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes compressed variants.
+
+    Until collectstatic has written a manifest (development, tests), URLs
+    use the plain file names and the staticfiles finders serve them.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        hashed_names = set(self.hashed_files.values())
+        for name in sorted({*paths, *hashed_names}):
+            if is_compressible(name):
+                self._write_variants(name, hashed=name in hashed_names)
+
+    def _write_variants(self, name: str, hashed: bool) -> None:
+        # A hashed name always holds the same content, so variants written
+        # by an earlier build are still current.
+        if hashed and all(self.exists(name + ENCODINGS[e]) for e in available_encodings()):
+            return
+
+        with self.open(name) as source:
+            variants = compress(source.read())
+        for encoding, suffix in ENCODINGS.items():
+            variant = name + suffix
+            if self.exists(variant):
+                self.delete(variant)
+            if encoding in variants:
+                self._save(variant, ContentFile(variants[encoding]))
@@ -0,0 +1,198 @@
+import gzip
+import json
+import tempfile
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, SimpleTestCase, override_settings
+
+from .middleware import accepted_encodings
+from .views import RangeNotSatisfiable, parse_range
+
+fake_brotli = SimpleNamespace(compress=lambda data, quality: zlib.compress(data, 9)[2:])
+
+
+class CollectedAssetsMixin:
+    """Run collectstatic into a temporary STATIC_ROOT."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+        settings = override_settings(STATIC_ROOT=self.root, DEBUG=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        with mock.patch("assets.storage.brotli", fake_brotli):
+            call_command("collectstatic", interactive=False, verbosity=0)
+        self.manifest = json.loads((self.root / "staticfiles.json").read_text())["paths"]
+        self.css = self.manifest["css/base.css"]
+
+
+class CompressedStorageTests(CollectedAssetsMixin, SimpleTestCase):
+
+    def test_assets_are_fingerprinted_and_precompressed(self):
+        self.assertRegex(self.css, r"^css/base\.[0-9a-f]{12}\.css$")
+        self.assertEqual(static("css/base.css"), f"/static/{self.css}")
+
+        original = (self.root / self.css).read_bytes()
+        self.assertEqual(gzip.decompress((self.root / f"{self.css}.gz").read_bytes()), original)
+        self.assertTrue((self.root / f"{self.css}.br").exists())
+        self.assertTrue((self.root / "css/base.css.gz").exists())
+
+    def test_other_types_and_tiny_files_are_not_compressed(self):
+        others = [name for name in self.manifest.values() if name.endswith(".md")]
+        self.assertTrue(others)
+        self.assertFalse((self.root / f"{others[0]}.gz").exists())
+
+        tiny = [
+            name for name in self.manifest.values()
+            if name.endswith(".js") and (self.root / name).stat().st_size < 256
+        ]
+        for name in tiny:
+            self.assertFalse((self.root / f"{name}.gz").exists(), name)
+
+
+class StaticFilesMiddlewareTests(CollectedAssetsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.url = f"/static/{self.css}"
+
+    def test_encoding_is_negotiated(self):
+        response = self.client.get(self.url, headers={"accept-encoding": "gzip, deflate, br"})
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        response = self.client.get(self.url, headers={"accept-encoding": "br;q=0, gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, (self.root / self.css).read_bytes())
+
+        response = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+
+    def test_cache_headers_and_revalidation(self):
+        response = self.client.get(self.url, headers={"accept-encoding": "gzip"})
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+
+        response = self.client.get(
+            self.url, headers={"accept-encoding": "gzip", "if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        # Another encoding is another representation with its own ETag.
+        response = self.client.get(
+            self.url, headers={"accept-encoding": "br", "if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.head("/static/css/base.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(response.content, b"")
+
+    def test_unknown_files_fall_through(self):
+        self.assertEqual(self.client.get("/static/css/missing.css").status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(accepted_encodings("gzip;q=0.5, br;q=0, identity"), {"gzip", "identity"})
+        self.assertEqual(accepted_encodings("*"), {"*", "br", "gzip"})
+        self.assertEqual(accepted_encodings(""), set())
+
+
+class MediaServingTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        (root / "products").mkdir()
+        self.body = bytes(range(256)) * 40
+        (root / "products" / "shirt.jpg").write_bytes(self.body)
+        (root / "products" / "shirt.3f2a9c1be0d4.400w.webp").write_bytes(b"webp")
+
+        settings = override_settings(MEDIA_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = "/media/products/shirt.jpg"
+
+    def test_full_response_and_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.body)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Content-Length"], str(len(self.body)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.url, headers={"if-modified-since": response["Last-Modified"]})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, headers={"if-match": '"stale"'})
+        self.assertEqual(response.status_code, 412)
+
+        response = self.client.head("/media/products/shirt.3f2a9c1be0d4.400w.webp")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Length"], "4")
+
+    def test_ranges(self):
+        response = self.client.get(self.url, headers={"range": "bytes=100-199"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.body)}")
+        self.assertEqual(b"".join(response.streaming_content), self.body[100:200])
+
+        response = self.client.get(self.url, headers={"range": "bytes=-10"})
+        self.assertEqual(b"".join(response.streaming_content), self.body[-10:])
+
+        response = self.client.get(self.url, headers={"range": f"bytes={len(self.body)}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.body)}")
+
+        etag = self.client.head(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"range": "bytes=0-9", "if-range": etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(
+            self.url, headers={"range": "bytes=0-9", "if-range": '"changed"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=5-", 10), (5, 9))
+        self.assertEqual(parse_range("bytes=5-100", 10), (5, 9))
+        self.assertEqual(parse_range("bytes=-100", 10), (0, 9))
+        self.assertIsNone(parse_range("bytes=0-1,4-5", 10))
+        self.assertIsNone(parse_range("bytes=9-5", 10))
+        self.assertIsNone(parse_range("items=0-5", 10))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=-0", 10)
+
+    def test_missing_and_unsafe_paths_are_404(self):
+        self.assertEqual(self.client.get("/media/products/nope.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/products/").status_code, 404)
+        self.assertEqual(self.client.get("/media/../boutique_ado/settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/%2e%2e/manage.py").status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_transfer_can_be_offloaded(self):
+        with self.settings(MEDIA_OFFLOAD="x-accel-redirect"):
+            response = self.client.get(self.url, headers={"range": "bytes=0-9"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/products/shirt.jpg")
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+        with self.settings(MEDIA_OFFLOAD="x-sendfile"):
+            response = self.client.get(self.url)
+        self.assertTrue(response["X-Sendfile"].endswith("products/shirt.jpg"))
@@ -0,0 +1,183 @@
+"""
+Media (uploaded file) serving with validators and byte ranges.
+
+Responses carry a strong ETag built from the file's modification time and
+size, answer conditional requests with 304 (or 412), and honour single
+``Range`` requests, including ``If-Range``. Derivative product images are
+named after their content and are cached as immutable.
+
+With ``MEDIA_OFFLOAD`` set, the view only checks the request and the
+validators; the front-end server sends the bytes. For nginx::
+
+    location /protected-media/ {
+        internal;
+        alias /srv/boutique_ado/media/;
+    }
+
+and ``MEDIA_OFFLOAD = "x-accel-redirect"``. ``"x-sendfile"`` does the same
+for Apache (mod_xsendfile) and lighttpd, using the absolute path.
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from products.images import is_derivative
+
+from .middleware import IMMUTABLE_CACHE_CONTROL
+
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """The Range header asks only for bytes past the end of the file."""
+
+
+def media_etag(file_stat) -> str:
+    """A strong ETag from the file's modification time and size."""
+    return f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+
+
+def parse_range(header: str, size: int):
+    """
+    Return the ``(start, end)`` byte positions (inclusive) to send, or None
+    to send the whole file.
+
+    Only single ranges are served; malformed headers and multiple ranges are
+    ignored, as RFC 9110 allows. Raises RangeNotSatisfiable when no
+    requested byte exists.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag: str, last_modified: int) -> bool:
+    """Apply If-Range: ranges are only served while the validator matches."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _offloaded(path: str, name: str, content_type: str):
+    """An empty response telling the front-end server to send the file."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == "x-accel-redirect":
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    elif settings.MEDIA_OFFLOAD == "x-sendfile":
+        response["X-Sendfile"] = path
+    else:
+        raise ImproperlyConfigured(
+            f"Unknown MEDIA_OFFLOAD {settings.MEDIA_OFFLOAD!r}; "
+            "use 'x-accel-redirect' or 'x-sendfile'.")
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("Media file not found.")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404("Media file not found.")
+
+    size = file_stat.st_size
+    etag = media_etag(file_stat)
+    last_modified = int(file_stat.st_mtime)
+
+    validators = HttpResponse()
+    validators["ETag"] = etag
+    validators["Last-Modified"] = http_date(last_modified)
+    validators["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL if is_derivative(path) else MEDIA_CACHE_CONTROL)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=validators)
+    if response is not validators:
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if getattr(settings, "MEDIA_OFFLOAD", None):
+        # The front-end server handles Range and sets Content-Length.
+        response = _offloaded(full_path, path, content_type)
+    else:
+        try:
+            byte_range = (
+                parse_range(request.headers.get("Range", ""), size)
+                if _if_range_matches(request, etag, last_modified) else None
+            )
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                () if request.method == "HEAD" else _read_range(full_path, start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        elif request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+            length = size
+        else:
+            # FileResponse lets the WSGI server use sendfile() when it can.
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+            response.headers.pop("Content-Disposition", None)
+            length = size
+        response["Content-Length"] = str(length)
+        response["Accept-Ranges"] = "bytes"
+
+    for header in ("ETag", "Last-Modified", "Cache-Control"):
+        response[header] = validators[header]
+    return response
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path("", async_views.view_bag, name="view_bag"),
+    path("add/<int:item_id>/", async_views.add_to_bag, name="add_to_bag"),
+    path("update/<int:item_id>/", async_views.update_bag, name="update_bag"),
+    path("remove/<int:item_id>/", async_views.remove_from_bag, name="remove_from_bag"),
+    path("batch/", async_views.batch_update_bag, name="batch_update_bag"),
+]
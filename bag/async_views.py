@@ -0,0 +1,139 @@
+"""
+Async versions of the bag views, for ASGI deployments.
+
+The bag is read and written through the async session API and products are
+loaded with the async ORM; the bag logic itself is shared with bag.views.
+"""
+
+from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from products.async_views import page_context
+from products.models import Product
+
+from .contexts import aload_bag_contents, clear_bag_contents
+from .storage import aget_bag, asave_bag
+from .views import (
+    _add_item,
+    _apply_batch,
+    _bag_summary_json,
+    _batch_errors,
+    _batch_product_ids,
+    _clamp_quantity,
+    _clean_size,
+    _parse_operations,
+    _read_operations,
+    _remove_item,
+    _safe_int,
+    _set_item,
+)
+
+
+async def _save_bag(request, bag: dict) -> None:
+    if await asave_bag(request, bag):
+        clear_bag_contents(request)
+
+
+async def view_bag(request):
+    """Render the shopping bag page."""
+    return render(request, "bag/bag.html", await page_context(request))
+
+
+@require_POST
+async def add_to_bag(request, item_id: int):
+    """Add a quantity of the specified product to the shopping bag."""
+    product = await aget_object_or_404(Product, pk=item_id)
+
+    quantity = _clamp_quantity(
+        _safe_int(request.POST.get("quantity"), default=1))
+    redirect_url = request.POST.get("redirect_url") or reverse("products")
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        messages.error(request, "That size is not available.")
+        return redirect(redirect_url)
+
+    bag = await aget_bag(request)
+    _add_item(request, bag, product, size, quantity)
+
+    await _save_bag(request, bag)
+    return redirect(redirect_url)
+
+
+@require_POST
+async def update_bag(request, item_id: int):
+    """Update the quantity for the specified product in the shopping bag."""
+    product = await aget_object_or_404(Product, pk=item_id)
+
+    quantity = _clamp_quantity(
+        _safe_int(request.POST.get("quantity"), default=1))
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        messages.error(request, "That size is not available.")
+        return redirect(reverse("view_bag"))
+
+    bag = await aget_bag(request)
+    item_id_str = str(item_id)
+
+    if item_id_str not in bag:
+        messages.error(request, "That item is not in your bag.")
+        return redirect(reverse("view_bag"))
+
+    _set_item(bag, item_id_str, size, quantity)
+    await _save_bag(request, bag)
+
+    messages.success(
+        request,
+        f"Updated {product.name} quantity in your bag",
+        extra_tags="bag",
+    )
+    return redirect(reverse("view_bag"))
+
+
+@require_POST
+async def remove_from_bag(request, item_id: int):
+    """Remove an item (or a size variant) from the shopping bag."""
+    product = await aget_object_or_404(Product, pk=item_id)
+
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        return JsonResponse({"ok": False, "error": "Invalid size."}, status=400)
+    bag = await aget_bag(request)
+
+    error = _remove_item(bag, str(item_id), size)
+    if error is not None:
+        return error
+
+    await _save_bag(request, bag)
+
+    messages.success(
+        request,
+        f"Removed {product.name} from your bag",
+        extra_tags="bag",
+    )
+    return JsonResponse({"ok": True}, status=200)
+
+
+@require_POST
+async def batch_update_bag(request):
+    """Apply a list of bag operations in one request (see bag.views)."""
+    operations = _read_operations(request)
+    if isinstance(operations, JsonResponse):
+        return operations
+
+    parsed, errors = _parse_operations(operations)
+    products = await Product.objects.ain_bulk(_batch_product_ids(parsed))
+    error = _batch_errors(parsed, errors, products)
+    if error is not None:
+        return error
+
+    bag = await aget_bag(request)
+    error = _apply_batch(bag, parsed)
+    if error is not None:
+        return error
+    await _save_bag(request, bag)
+
+    contents = await aload_bag_contents(bag, products)
+    return JsonResponse({"ok": True, "bag": _bag_summary_json(contents)}, status=200)
@@ -1,38 +1,90 @@
+import hashlib
+import json
 from decimal import Decimal
+from functools import cached_property, partial
 
 from django.conf import settings
-from django.shortcuts import get_object_or_404
 
 from products.models import Product
 
+from .storage import BAG_SESSION_KEY, aget_bag, get_bag
 
-def bag_contents(request):
-    """Build the bag context from session data."""
-    bag_items = []
-    total = Decimal("0.00")
-    product_count = 0
-
-    bag = request.session.get("bag", {})
-
-    for item_id, item_data in bag.items():
-        product = get_object_or_404(Product, pk=item_id)
-
-        if isinstance(item_data, int):
-            quantity = item_data
-            total += quantity * product.price
-            product_count += quantity
-
-            bag_items.append(
-                {
-                    "item_id": item_id,
-                    "quantity": quantity,
-                    "product": product,
-                    "subtotal": quantity * product.price,
-                }
-            )
-        else:
-            items_by_size = item_data.get("items_by_size", {})
-            for size, quantity in items_by_size.items():
+BAG_CONTEXT_KEYS = (
+    "bag_items",
+    "total",
+    "product_count",
+    "delivery",
+    "free_delivery_delta",
+    "grand_total",
+)
+
+
+def _bag_product_ids(bag: dict) -> list:
+    return [int(item_id) for item_id in bag if str(item_id).isdigit()]
+
+
+def _missing_product_ids(bag: dict, loaded: dict) -> list:
+    return [pk for pk in _bag_product_ids(bag) if pk not in loaded]
+
+
+def _keyed_by_item_id(products: dict) -> dict:
+    return {str(pk): product for pk, product in products.items()}
+
+
+def _fetch_bag_products(bag: dict, loaded: dict | None = None) -> dict:
+    """
+    Load every product referenced by the bag in a single query.
+
+    ``loaded`` is an ``in_bulk`` result the caller already has; only the
+    products missing from it are fetched.
+    """
+    loaded = loaded or {}
+    product_ids = _missing_product_ids(bag, loaded)
+    if product_ids:
+        loaded = {**loaded, **Product.objects.in_bulk(product_ids)}
+    return _keyed_by_item_id(loaded)
+
+
+async def _afetch_bag_products(bag: dict, loaded: dict | None = None) -> dict:
+    """Async version of _fetch_bag_products."""
+    loaded = loaded or {}
+    product_ids = _missing_product_ids(bag, loaded)
+    if product_ids:
+        loaded = {**loaded, **await Product.objects.ain_bulk(product_ids)}
+    return _keyed_by_item_id(loaded)
+
+
+class BagContents:
+    """
+    Bag lines and totals, computed on first access and then cached.
+
+    ``products`` maps item ids to products already loaded for the bag; when
+    it is omitted they are fetched on first access.
+    """
+
+    def __init__(self, bag: dict, products: dict | None = None):
+        self.bag = bag if isinstance(bag, dict) else {}
+        self.products = products
+
+    @cached_property
+    def summary(self) -> dict:
+        """Walk the bag once and return lines and totals."""
+        bag_items = []
+        total = Decimal("0.00")
+        product_count = 0
+
+        products = self.products
+        if products is None:
+            products = _fetch_bag_products(self.bag)
+
+        for item_id, item_data in self.bag.items():
+            product = products.get(str(item_id))
+            if product is None:
+                # The product was removed from the catalogue; skip the stale line.
+                continue
+
+            if isinstance(item_data, int):
+                quantity = item_data
                 total += quantity * product.price
                 product_count += quantity
 
@@ -41,31 +93,128 @@ def bag_contents(request):
                         "item_id": item_id,
                         "quantity": quantity,
                         "product": product,
-                        "size": size,
                         "subtotal": quantity * product.price,
                     }
                 )
+            else:
+                items_by_size = item_data.get("items_by_size", {})
+                for size, quantity in items_by_size.items():
+                    total += quantity * product.price
+                    product_count += quantity
+
+                    bag_items.append(
+                        {
+                            "item_id": item_id,
+                            "quantity": quantity,
+                            "product": product,
+                            "size": size,
+                            "subtotal": quantity * product.price,
+                        }
+                    )
+
+        if total < Decimal(str(settings.FREE_DELIVERY_THRESHOLD)):
+            delivery = total * \
+                Decimal(str(settings.STANDARD_DELIVERY_PERCENTAGE)) / \
+                Decimal("100")
+            free_delivery_delta = Decimal(
+                str(settings.FREE_DELIVERY_THRESHOLD)) - total
+        else:
+            delivery = Decimal("0.00")
+            free_delivery_delta = Decimal("0.00")
 
-    if total < Decimal(str(settings.FREE_DELIVERY_THRESHOLD)):
-        delivery = total * \
-            Decimal(str(settings.STANDARD_DELIVERY_PERCENTAGE)) / \
-            Decimal("100")
-        free_delivery_delta = Decimal(
-            str(settings.FREE_DELIVERY_THRESHOLD)) - total
-    else:
-        delivery = Decimal("0.00")
-        free_delivery_delta = Decimal("0.00")
+        grand_total = total + delivery
 
-    grand_total = total + delivery
+        return {
+            "bag_items": bag_items,
+            "total": total,
+            "product_count": product_count,
+            "delivery": delivery,
+            "free_delivery_delta": free_delivery_delta,
+            "free_delivery_threshold": settings.FREE_DELIVERY_THRESHOLD,
+            "grand_total": grand_total,
+        }
+
+    def __getitem__(self, key: str):
+        """Return a single value from the summary."""
+        return self.summary[key]
+
+
+def get_bag_contents(request) -> BagContents:
+    """Return the bag contents for this request, creating them once."""
+    contents = getattr(request, "_bag_contents", None)
+    if contents is None:
+        contents = BagContents(get_bag(request))
+        request._bag_contents = contents
+    return contents
+
+
+def load_bag_contents(bag: dict, loaded: dict | None = None) -> BagContents:
+    """
+    Return contents for a bag with its products already loaded.
+
+    ``loaded`` is passed on to _fetch_bag_products.
+    """
+    return BagContents(bag, products=_fetch_bag_products(bag, loaded))
+
+
+async def aload_bag_contents(bag: dict, loaded: dict | None = None) -> BagContents:
+    """Async version of load_bag_contents."""
+    return BagContents(bag, products=await _afetch_bag_products(bag, loaded))
+
+
+async def aget_bag_contents(request) -> BagContents:
+    """
+    Async version of get_bag_contents.
+
+    The products are loaded here, so templates that read the bag context
+    afterwards never query the database from the event loop.
+    """
+    contents = getattr(request, "_bag_contents", None)
+    if contents is None or contents.products is None:
+        contents = await aload_bag_contents(await aget_bag(request))
+        request._bag_contents = contents
+    return contents
+
+
+def _fingerprint(stored) -> str:
+    if not stored:
+        return "empty"
+    payload = json.dumps(stored, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def bag_fingerprint(request) -> str:
+    """Return a short digest that changes whenever the session bag changes."""
+    return _fingerprint(request.session.get(BAG_SESSION_KEY))
+
+
+async def abag_fingerprint(request) -> str:
+    """Async version of bag_fingerprint."""
+    return _fingerprint(await request.session.aget(BAG_SESSION_KEY))
+
+
+def clear_bag_contents(request) -> None:
+    """Forget cached bag contents after the bag has changed."""
+    if hasattr(request, "_bag_contents"):
+        del request._bag_contents
+
+
+def _lazy_bag_value(request, key: str):
+    """Resolve one bag context value on demand."""
+    return get_bag_contents(request)[key]
+
+
+def bag_contents(request):
+    """
+    Expose the bag context lazily.
 
+    Each value is a callable that the template engine only invokes when a
+    template reads it, so pages that never show the bag do no bag work.
+    """
     context = {
-        "bag_items": bag_items,
-        "total": total,
-        "product_count": product_count,
-        "delivery": delivery,
-        "free_delivery_delta": free_delivery_delta,
-        "free_delivery_threshold": settings.FREE_DELIVERY_THRESHOLD,
-        "grand_total": grand_total,
+        key: partial(_lazy_bag_value, request, key)
+        for key in BAG_CONTEXT_KEYS
     }
+    context["free_delivery_threshold"] = settings.FREE_DELIVERY_THRESHOLD
 
     return context
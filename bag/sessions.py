@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from boutique_ado.db import retry_on_locked
+
+
+class SessionStore(CachedDBStore):
+    """
+    Cache-first sessions that only write through to the database on change.
+
+    Reads are served from the cache. A save whose data matches what was
+    loaded is skipped, so assigning an unchanged value never costs a
+    ``django_session`` write, and a write that finds the database locked
+    is retried.
+    """
+
+    def load(self):
+        data = super().load()
+        self._loaded_digest = self._digest(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._loaded_digest = self._digest(data)
+        return data
+
+    @retry_on_locked
+    def save(self, must_create=False):
+        if self._unchanged(must_create):
+            return
+
+        super().save(must_create=must_create)
+        self._loaded_digest = self._digest(self._session)
+
+    @retry_on_locked
+    async def asave(self, must_create=False):
+        if self._unchanged(must_create):
+            return
+
+        await super().asave(must_create=must_create)
+        self._loaded_digest = self._digest(self._session)
+
+    def _unchanged(self, must_create: bool) -> bool:
+        return (
+            not must_create
+            and bool(self.session_key)
+            and self._digest(self._session) == getattr(self, "_loaded_digest", None)
+        )
+
+    @staticmethod
+    def _digest(data) -> str:
+        return json.dumps(data, sort_keys=True, default=str)
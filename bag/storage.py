@@ -0,0 +1,96 @@
+"""
+Compact session storage for the shopping bag.
+
+In memory the bag keeps its nested shape::
+
+    {"12": {"items_by_size": {"m": 2}}, "13": 1}
+
+In the session it is stored as flat ``id:size:qty`` entries joined by ``;``
+(``"12:m:2;13::1"``), which keeps the session row small. Bags saved in the
+old nested format are still read. Sizes are validated by the views; an
+entry whose size contains a separator is never written.
+"""
+
+BAG_SESSION_KEY = "bag"
+SEPARATORS = frozenset(":;")
+
+
+def encode_bag(bag: dict) -> str:
+    """Flatten a bag into ``id:size:qty`` entries."""
+    entries = []
+    for item_id, item_data in bag.items():
+        if isinstance(item_data, int):
+            entries.append(f"{item_id}::{item_data}")
+        else:
+            for size, quantity in item_data.get("items_by_size", {}).items():
+                if SEPARATORS.isdisjoint(str(size)):
+                    entries.append(f"{item_id}:{size}:{quantity}")
+    return ";".join(entries)
+
+
+def decode_bag(value) -> dict:
+    """Rebuild the nested bag, skipping malformed entries."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str) or not value:
+        return {}
+
+    bag = {}
+    for entry in value.split(";"):
+        parts = entry.split(":")
+        if len(parts) != 3 or not parts[0].isdigit() or not parts[2].isdigit():
+            continue
+
+        item_id, size, quantity = parts[0], parts[1], int(parts[2])
+        if size:
+            item_data = bag.setdefault(item_id, {"items_by_size": {}})
+            if isinstance(item_data, dict):
+                item_data["items_by_size"][size] = quantity
+        else:
+            bag[item_id] = quantity
+    return bag
+
+
+def get_bag(request) -> dict:
+    """Return the bag stored in the session."""
+    return decode_bag(request.session.get(BAG_SESSION_KEY))
+
+
+async def aget_bag(request) -> dict:
+    """Async version of get_bag."""
+    return decode_bag(await request.session.aget(BAG_SESSION_KEY))
+
+
+def save_bag(request, bag: dict) -> bool:
+    """
+    Store the bag in the session if it changed.
+
+    Assigning a session key always marks the session as modified, so an
+    unchanged bag is not written back. Returns True if the session changed.
+    """
+    encoded = encode_bag(bag)
+    if request.session.get(BAG_SESSION_KEY) == encoded:
+        return False
+
+    if encoded:
+        request.session[BAG_SESSION_KEY] = encoded
+    elif BAG_SESSION_KEY in request.session:
+        del request.session[BAG_SESSION_KEY]
+    else:
+        return False
+    return True
+
+
+async def asave_bag(request, bag: dict) -> bool:
+    """Async version of save_bag."""
+    encoded = encode_bag(bag)
+    if await request.session.aget(BAG_SESSION_KEY) == encoded:
+        return False
+
+    if encoded:
+        await request.session.aset(BAG_SESSION_KEY, encoded)
+    elif await request.session.ahas_key(BAG_SESSION_KEY):
+        await request.session.apop(BAG_SESSION_KEY)
+    else:
+        return False
+    return True
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Category, Product
+
+from .contexts import BagContents, bag_contents
+from .storage import decode_bag, encode_bag
+
+
+class BagContentsTests(TestCase):
+    """Tests for the bag context processor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="shirts")
+        cls.products = [
+            Product.objects.create(
+                category=category,
+                name=f"Shirt {i}",
+                description="A shirt",
+                price=Decimal("10.00"),
+                has_sizes=bool(i % 2),
+            )
+            for i in range(10)
+        ]
+
+    def _request_with_bag(self, bag):
+        request = RequestFactory().get("/")
+        request.session = {"bag": bag}
+        return request
+
+    def test_bag_is_hydrated_with_one_query(self):
+        bag = {}
+        for product in self.products:
+            if product.has_sizes:
+                bag[str(product.pk)] = {"items_by_size": {"s": 1, "m": 2}}
+            else:
+                bag[str(product.pk)] = 1
+
+        with self.assertNumQueries(1):
+            context = BagContents(bag).summary
+
+        self.assertEqual(len(context["bag_items"]), 15)
+        self.assertEqual(context["product_count"], 20)
+        self.assertEqual(context["total"], Decimal("200.00"))
+
+    def test_missing_products_are_skipped(self):
+        bag = {str(self.products[0].pk): 2, "999999": 1, "not-an-id": 1}
+
+        context = BagContents(bag).summary
+
+        self.assertEqual(len(context["bag_items"]), 1)
+        self.assertEqual(context["total"], Decimal("20.00"))
+
+    def test_context_is_lazy_and_computed_once(self):
+        request = self._request_with_bag({str(self.products[0].pk): 3})
+
+        with self.assertNumQueries(0):
+            context = bag_contents(request)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(context["grand_total"](), Decimal("33.00"))
+            self.assertEqual(context["product_count"](), 3)
+            self.assertEqual(len(context["bag_items"]()), 1)
+
+
+class BagStorageTests(TestCase):
+    """Tests for the compact bag encoding and session writes."""
+
+    def test_round_trip(self):
+        bag = {"12": {"items_by_size": {"m": 2, "xl": 1}}, "13": 4}
+        encoded = encode_bag(bag)
+
+        self.assertEqual(encoded, "12:m:2;12:xl:1;13::4")
+        self.assertEqual(decode_bag(encoded), bag)
+        self.assertEqual(decode_bag("12:m:x;bad;14::2"), {"14": 2})
+
+    def test_hostile_sizes_cannot_add_entries(self):
+        hostile = "x:1;13::5000;14:"
+        bag = {"12": {"items_by_size": {hostile: 1, "a:b": 2, "m": 3}}}
+        self.assertEqual(decode_bag(encode_bag(bag)), {"12": {"items_by_size": {"m": 3}}})
+
+        product = Product.objects.create(
+            name="Shirt", description="x", price=Decimal("5.00"))
+        for name in ("add_to_bag", "update_bag"):
+            self.client.post(
+                reverse(name, args=[product.pk]), {"quantity": 1, "product_size": hostile})
+        response = self.client.post(
+            reverse("remove_from_bag", args=[product.pk]), {"product_size": hostile})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("bag", self.client.session)
+
+    def test_unchanged_bag_is_not_written(self):
+        product = Product.objects.create(
+            name="Shirt", description="x", price=Decimal("5.00"))
+        add_url = reverse("add_to_bag", args=[product.pk])
+        update_url = reverse("update_bag", args=[product.pk])
+
+        self.client.post(add_url, {"quantity": 2})
+        self.assertEqual(
+            self.client.session["bag"], f"{product.pk}::2")
+
+        def session_writes(data):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(update_url, data)
+            return [q for q in queries if q["sql"].startswith("UPDATE \"django_session\"")]
+
+        # Setting the same quantity leaves the session row alone.
+        self.assertEqual(session_writes({"quantity": 2}), [])
+        self.assertEqual(len(session_writes({"quantity": 3})), 1)
+
+
+class BatchUpdateBagTests(TestCase):
+    """Tests for the batch bag mutation endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = Product.objects.create(
+            name="Shirt", description="x", price=Decimal("10.00"), has_sizes=True)
+        cls.mug = Product.objects.create(
+            name="Mug", description="x", price=Decimal("4.00"))
+
+    def _post(self, operations):
+        return self.client.post(
+            reverse("batch_update_bag"),
+            data=json.dumps({"operations": operations}),
+            content_type="application/json",
+        )
+
+    def test_operations_are_applied_and_totals_returned(self):
+        self._post([{"op": "add", "product_id": self.mug.pk, "quantity": 5}])
+
+        # One product validation query and the session write (UPDATE inside
+        # a savepoint); hydration reuses the validated products.
+        with self.assertNumQueries(4):
+            response = self._post([
+                {"op": "add", "product_id": self.shirt.pk, "size": "m", "quantity": 2},
+                {"op": "add", "product_id": self.shirt.pk, "size": "l", "quantity": 1},
+                {"op": "set", "product_id": self.shirt.pk, "size": "l", "quantity": 3},
+                {"op": "remove", "product_id": self.mug.pk},
+            ])
+
+        self.assertEqual(response.status_code, 200)
+        bag = response.json()["bag"]
+        self.assertEqual(bag["product_count"], 5)
+        self.assertEqual(bag["total"], "50.00")
+        self.assertEqual(bag["grand_total"], "50.00")
+        self.assertEqual(self.client.session["bag"], f"{self.shirt.pk}:m:2;{self.shirt.pk}:l:3")
+
+    def test_only_products_outside_the_batch_are_loaded_again(self):
+        self._post([{"op": "add", "product_id": self.mug.pk, "quantity": 1}])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post([
+                {"op": "add", "product_id": self.shirt.pk, "size": "m", "quantity": 2}])
+
+        self.assertEqual(response.json()["bag"]["total"], "24.00")
+        product_queries = [q["sql"] for q in queries if '"products_product"' in q["sql"]]
+        self.assertEqual(len(product_queries), 2)
+        self.assertIn(f"IN ({self.mug.pk})", product_queries[1])
+
+    def test_invalid_batch_changes_nothing(self):
+        self._post([{"op": "add", "product_id": self.mug.pk, "quantity": 1}])
+
+        response = self._post([
+            {"op": "set", "product_id": self.mug.pk, "quantity": 9},
+            {"op": "add", "product_id": 999999, "quantity": 1},
+            {"op": "explode", "product_id": self.mug.pk},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.json()["errors"]], [1, 2])
+        self.assertEqual(self.client.session["bag"], f"{self.mug.pk}::1")
+
+    def test_sized_and_unsized_lines_of_a_product_are_not_mixed(self):
+        self._post([{"op": "add", "product_id": self.mug.pk, "quantity": 2}])
+        self._post([{"op": "add", "product_id": self.shirt.pk, "size": "m", "quantity": 1}])
+
+        response = self._post([
+            {"op": "add", "product_id": self.mug.pk, "quantity": 1},
+            {"op": "add", "product_id": self.mug.pk, "size": "m", "quantity": 1},
+            {"op": "set", "product_id": self.shirt.pk, "quantity": 4},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.json()["errors"]], [1, 2])
+        self.assertEqual(
+            self.client.session["bag"], f"{self.mug.pk}::2;{self.shirt.pk}:m:1")
+
+
+@override_settings(ROOT_URLCONF="boutique_ado.asgi_urls")
+class AsyncBagViewTests(TestCase):
+    """The async bag views keep the sync views' behaviour."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = Product.objects.create(
+            name="Shirt", description="x", price=Decimal("10.00"), has_sizes=True)
+        cls.mug = Product.objects.create(
+            name="Mug", description="x", price=Decimal("4.00"))
+
+    async def _bag(self):
+        return await (await self.async_client.asession()).aget("bag")
+
+    async def test_add_update_remove_and_view(self):
+        response = await self.async_client.post(
+            reverse("add_to_bag", args=[self.shirt.pk]),
+            {"quantity": 2, "product_size": "m", "redirect_url": "/bag/"},
+        )
+        self.assertRedirects(response, "/bag/", fetch_redirect_response=False)
+        await self.async_client.post(reverse("add_to_bag", args=[self.mug.pk]), {"quantity": 1})
+        self.assertEqual(await self._bag(), f"{self.shirt.pk}:m:2;{self.mug.pk}::1")
+
+        await self.async_client.post(
+            reverse("update_bag", args=[self.shirt.pk]), {"quantity": 4, "product_size": "m"})
+        response = await self.async_client.get(reverse("view_bag"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total"](), Decimal("44.00"))
+        self.assertContains(response, "Shirt")
+
+        response = await self.async_client.post(
+            reverse("remove_from_bag", args=[self.mug.pk]))
+        self.assertEqual(response.json(), {"ok": True})
+        response = await self.async_client.post(
+            reverse("remove_from_bag", args=[self.mug.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(await self._bag(), f"{self.shirt.pk}:m:4")
+
+    async def test_batch_update(self):
+        response = await self.async_client.post(
+            reverse("batch_update_bag"),
+            data=json.dumps({"operations": [
+                {"op": "add", "product_id": self.shirt.pk, "size": "l", "quantity": 2},
+                {"op": "add", "product_id": self.mug.pk, "quantity": 3},
+            ]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["bag"]["total"], "32.00")
+
+        response = await self.async_client.post(
+            reverse("batch_update_bag"),
+            data=json.dumps({"operations": [{"op": "add", "product_id": 999999}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
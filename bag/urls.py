@@ -7,4 +7,5 @@ urlpatterns = [
     path("add/<int:item_id>/", views.add_to_bag, name="add_to_bag"),
     path("update/<int:item_id>/", views.update_bag, name="update_bag"),
     path("remove/<int:item_id>/", views.remove_from_bag, name="remove_from_bag"),
+    path("batch/", views.batch_update_bag, name="batch_update_bag"),
 ]
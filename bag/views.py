@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+
 from django.contrib import messages
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -8,6 +10,9 @@ from django.views.decorators.http import require_POST
 
 from products.models import Product
 
+from .contexts import BagContents, clear_bag_contents, load_bag_contents
+from .storage import get_bag, save_bag
+
 
 def view_bag(request):
     """Render the shopping bag page."""
@@ -27,31 +32,34 @@ def _clamp_quantity(quantity: int, minimum: int = 1, maximum: int = 99) -> int:
     return max(minimum, min(maximum, quantity))
 
 
+def _clean_size(size):
+    """
+    Return a size code, None for no size, or False when it is invalid.
+
+    Sizes are short alphanumeric codes; anything else could not be stored
+    safely in the compact session format (see bag.storage).
+    """
+    if size is None or size == "":
+        return None
+    if isinstance(size, str) and size.isalnum():
+        return size
+    return False
+
+
 def _get_bag(request) -> dict:
     """Return the bag session dict."""
-    bag = request.session.get("bag", {})
-    if not isinstance(bag, dict):
-        bag = {}
-    return bag
+    return get_bag(request)
 
 
 def _save_bag(request, bag: dict) -> None:
     """Save the bag back to the session."""
-    request.session["bag"] = bag
-
-
-@require_POST
-def add_to_bag(request, item_id: int):
-    """Add a quantity of the specified product to the shopping bag."""
-    product = get_object_or_404(Product, pk=item_id)
+    if save_bag(request, bag):
+        clear_bag_contents(request)
 
-    quantity = _clamp_quantity(
-        _safe_int(request.POST.get("quantity"), default=1))
-    redirect_url = request.POST.get("redirect_url") or reverse("products")
-    size = request.POST.get("product_size")
 
-    bag = _get_bag(request)
-    item_id_str = str(item_id)
+def _add_item(request, bag: dict, product, size, quantity: int) -> None:
+    """Add ``quantity`` of a product (or one of its sizes) to the bag."""
+    item_id_str = str(product.pk)
 
     if size:
         bag.setdefault(item_id_str, {"items_by_size": {}})
@@ -74,6 +82,61 @@ def add_to_bag(request, item_id: int):
             extra_tags="bag",
         )
 
+
+def _set_item(bag: dict, item_id_str: str, size, quantity: int) -> None:
+    """Set the quantity of a bag line."""
+    if size:
+        item_data = bag.get(item_id_str, {})
+        items_by_size = item_data.get("items_by_size", {})
+
+        if not isinstance(items_by_size, dict):
+            items_by_size = {}
+
+        items_by_size[size] = quantity
+        bag[item_id_str] = {"items_by_size": items_by_size}
+    else:
+        bag[item_id_str] = quantity
+
+
+def _remove_item(bag: dict, item_id_str: str, size):
+    """Remove a bag line; returns an error response if it is not there."""
+    if item_id_str not in bag:
+        return JsonResponse({"ok": False, "error": "Item not found in bag."}, status=404)
+
+    if size:
+        item_data = bag.get(item_id_str, {})
+        items_by_size = item_data.get("items_by_size", {})
+
+        if not isinstance(items_by_size, dict) or size not in items_by_size:
+            return JsonResponse({"ok": False, "error": "Size not found in bag."}, status=404)
+
+        items_by_size.pop(size, None)
+
+        if items_by_size:
+            bag[item_id_str] = {"items_by_size": items_by_size}
+        else:
+            bag.pop(item_id_str, None)
+    else:
+        bag.pop(item_id_str, None)
+    return None
+
+
+@require_POST
+def add_to_bag(request, item_id: int):
+    """Add a quantity of the specified product to the shopping bag."""
+    product = get_object_or_404(Product, pk=item_id)
+
+    quantity = _clamp_quantity(
+        _safe_int(request.POST.get("quantity"), default=1))
+    redirect_url = request.POST.get("redirect_url") or reverse("products")
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        messages.error(request, "That size is not available.")
+        return redirect(redirect_url)
+
+    bag = _get_bag(request)
+    _add_item(request, bag, product, size, quantity)
+
     _save_bag(request, bag)
     return redirect(redirect_url)
 
@@ -85,7 +148,10 @@ def update_bag(request, item_id: int):
 
     quantity = _clamp_quantity(
         _safe_int(request.POST.get("quantity"), default=1))
-    size = request.POST.get("product_size")
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        messages.error(request, "That size is not available.")
+        return redirect(reverse("view_bag"))
 
     bag = _get_bag(request)
     item_id_str = str(item_id)
@@ -94,18 +160,7 @@ def update_bag(request, item_id: int):
         messages.error(request, "That item is not in your bag.")
         return redirect(reverse("view_bag"))
 
-    if size:
-        item_data = bag.get(item_id_str, {})
-        items_by_size = item_data.get("items_by_size", {})
-
-        if not isinstance(items_by_size, dict):
-            items_by_size = {}
-
-        items_by_size[size] = quantity
-        bag[item_id_str] = {"items_by_size": items_by_size}
-    else:
-        bag[item_id_str] = quantity
-
+    _set_item(bag, item_id_str, size, quantity)
     _save_bag(request, bag)
 
     messages.success(
@@ -121,34 +176,203 @@ def remove_from_bag(request, item_id: int):
     """Remove an item (or a size variant) from the shopping bag."""
     product = get_object_or_404(Product, pk=item_id)
 
-    size = request.POST.get("product_size")
+    size = _clean_size(request.POST.get("product_size"))
+    if size is False:
+        return JsonResponse({"ok": False, "error": "Invalid size."}, status=400)
     bag = _get_bag(request)
-    item_id_str = str(item_id)
 
-    if item_id_str not in bag:
-        return JsonResponse({"ok": False, "error": "Item not found in bag."}, status=404)
+    error = _remove_item(bag, str(item_id), size)
+    if error is not None:
+        return error
 
-    if size:
-        item_data = bag.get(item_id_str, {})
-        items_by_size = item_data.get("items_by_size", {})
+    _save_bag(request, bag)
 
-        if not isinstance(items_by_size, dict) or size not in items_by_size:
-            return JsonResponse({"ok": False, "error": "Size not found in bag."}, status=404)
+    messages.success(
+        request,
+        f"Removed {product.name} from your bag",
+        extra_tags="bag",
+    )
+    return JsonResponse({"ok": True}, status=200)
+
+
+BATCH_OPERATIONS = {"add", "set", "remove"}
+MAX_BATCH_OPERATIONS = 100
 
-        items_by_size.pop(size, None)
+
+def _apply_operation(bag: dict, op: str, item_id_str: str, size, quantity: int):
+    """
+    Apply one validated batch operation to the bag in place.
+
+    A bag line holds a product either by size or without one, so an
+    operation that would mix the two is refused: returns an error message
+    and leaves the bag alone.
+    """
+    item_data = bag.get(item_id_str)
+    if size and isinstance(item_data, int):
+        return "This product is in the bag without a size."
+    if not size and isinstance(item_data, dict) and op != "remove":
+        return "This product is in the bag by size; give a size."
+
+    if size:
+        if not isinstance(item_data, dict):
+            item_data = {"items_by_size": {}}
+        items_by_size = item_data.setdefault("items_by_size", {})
+
+        if op == "add":
+            items_by_size[size] = _clamp_quantity(items_by_size.get(size, 0) + quantity)
+        elif op == "set" and quantity > 0:
+            items_by_size[size] = _clamp_quantity(quantity)
+        else:
+            items_by_size.pop(size, None)
 
         if items_by_size:
             bag[item_id_str] = {"items_by_size": items_by_size}
         else:
             bag.pop(item_id_str, None)
     else:
-        bag.pop(item_id_str, None)
+        current = bag.get(item_id_str)
+        current = current if isinstance(current, int) else 0
+
+        if op == "add":
+            bag[item_id_str] = _clamp_quantity(current + quantity)
+        elif op == "set" and quantity > 0:
+            bag[item_id_str] = _clamp_quantity(quantity)
+        else:
+            bag.pop(item_id_str, None)
+    return None
+
+
+def _bag_summary_json(contents: BagContents) -> dict:
+    """Serialise the recomputed bag totals for a JSON response."""
+    summary = contents.summary
+    return {
+        "items": [
+            {
+                "item_id": item["item_id"],
+                "size": item.get("size"),
+                "quantity": item["quantity"],
+                "subtotal": str(item["subtotal"]),
+            }
+            for item in summary["bag_items"]
+        ],
+        "product_count": summary["product_count"],
+        "total": str(summary["total"]),
+        "delivery": str(summary["delivery"]),
+        "free_delivery_delta": str(summary["free_delivery_delta"]),
+        "grand_total": str(summary["grand_total"]),
+    }
+
+
+def _read_operations(request):
+    """Return the operations in a batch request body, or an error response."""
+    try:
+        payload = json.loads(request.body or b"{}")
+        operations = payload["operations"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"ok": False, "error": "Invalid JSON payload."}, status=400)
+
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({"ok": False, "error": "No operations given."}, status=400)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return JsonResponse(
+            {"ok": False, "error": f"At most {MAX_BATCH_OPERATIONS} operations are allowed."},
+            status=400,
+        )
+    return operations
+
+
+def _parse_operations(operations: list) -> tuple:
+    """
+    Validate batch operations without touching the database.
+
+    Returns the valid ones as ``(index, op, product_id, size, quantity)``
+    tuples, and a list of errors for the rest.
+    """
+    errors = []
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            errors.append({"index": index, "error": "Operation must be an object."})
+            continue
+
+        op = operation.get("op")
+        product_id = _safe_int(operation.get("product_id"), default=0)
+        size = _clean_size(operation.get("size"))
+        quantity = _safe_int(operation.get("quantity"), default=1)
+
+        if op not in BATCH_OPERATIONS:
+            errors.append({"index": index, "error": "Unknown operation."})
+        elif product_id < 1:
+            errors.append({"index": index, "error": "Invalid product id."})
+        elif size is False:
+            errors.append({"index": index, "error": "Invalid size."})
+        elif op == "add" and quantity < 1:
+            errors.append({"index": index, "error": "Quantity must be at least 1."})
+        else:
+            parsed.append((index, op, product_id, size, quantity))
+
+    return parsed, errors
+
+
+def _batch_product_ids(parsed) -> set:
+    return {product_id for _, _, product_id, _, _ in parsed}
 
+
+def _batch_errors(parsed, errors: list, products: dict):
+    """Return an error response if any operation was invalid, else None."""
+    for index, _, product_id, _, _ in parsed:
+        if product_id not in products:
+            errors.append({"index": index, "error": "Product not found."})
+
+    if errors:
+        errors.sort(key=lambda error: error["index"])
+        return JsonResponse({"ok": False, "errors": errors}, status=400)
+    return None
+
+
+def _apply_batch(bag: dict, parsed):
+    """Apply the operations in order; returns an error response if any was refused."""
+    errors = []
+    for index, op, product_id, size, quantity in parsed:
+        error = _apply_operation(bag, op, str(product_id), size, quantity)
+        if error is not None:
+            errors.append({"index": index, "error": error})
+    if errors:
+        return JsonResponse({"ok": False, "errors": errors}, status=400)
+    return None
+
+
+@require_POST
+def batch_update_bag(request):
+    """
+    Apply a list of bag operations in one request.
+
+    Expects a JSON body like::
+
+        {"operations": [
+            {"op": "add", "product_id": 12, "size": "m", "quantity": 2},
+            {"op": "set", "product_id": 13, "quantity": 1},
+            {"op": "remove", "product_id": 14}
+        ]}
+
+    All products are validated with one query and either every operation is
+    applied or none is. Returns the recomputed bag totals.
+    """
+    operations = _read_operations(request)
+    if isinstance(operations, JsonResponse):
+        return operations
+
+    parsed, errors = _parse_operations(operations)
+    products = Product.objects.in_bulk(_batch_product_ids(parsed))
+    error = _batch_errors(parsed, errors, products)
+    if error is not None:
+        return error
+
+    bag = _get_bag(request)
+    error = _apply_batch(bag, parsed)
+    if error is not None:
+        return error
     _save_bag(request, bag)
 
-    messages.success(
-        request,
-        f"Removed {product.name} from your bag",
-        extra_tags="bag",
-    )
-    return JsonResponse({"ok": True}, status=200)
+    contents = load_bag_contents(bag, products)
+    return JsonResponse({"ok": True, "bag": _bag_summary_json(contents)}, status=200)
@@ -0,0 +1,109 @@
+"""
+Query budgets for tests.
+
+A budget is the maximum number of queries a scenario (a view under given
+conditions) may run. ``QueryBudgetMixin.assertQueryBudget`` runs a scenario
+against seeded catalogues of several sizes. It checks the budget at each
+size and that the statements run do not change with the catalogue size, so
+an N+1 shows up even while it still fits the budget. Failures print the SQL
+that ran, with repeated statement shapes counted, or a diff between sizes.
+"""
+
+import difflib
+import re
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .catalog import seed_catalog
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"IN \((?:\?, )*\?\)")
+_VALUES_RE = re.compile(r"VALUES \([^()]*\)(?:, \([^()]*\))*")
+_SAVEPOINT_RE = re.compile(r'"s\w+_x\d+"')
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduce a statement to its shape.
+
+    Literals become ``?``, and IN lists and multi-row VALUES become ``(...)``.
+    """
+    sql = _SAVEPOINT_RE.sub('"savepoint"', sql)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _VALUES_RE.sub("VALUES (...)", sql)
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+def format_queries(queries: list) -> str:
+    """Number the statements and flag shapes that ran more than once."""
+    shapes = Counter(normalize_sql(sql) for sql in queries)
+    lines = []
+    for number, sql in enumerate(queries, 1):
+        repeats = shapes[normalize_sql(sql)]
+        marker = f"  [x{repeats}]" if repeats > 1 else ""
+        lines.append(f"{number:>3}. {sql}{marker}")
+    return "\n".join(lines)
+
+
+def query_diff(expected: list, actual: list, expected_label: str, actual_label: str) -> str:
+    """Unified diff of two runs' statement shapes."""
+    return "\n".join(
+        difflib.unified_diff(
+            [normalize_sql(sql) for sql in expected],
+            [normalize_sql(sql) for sql in actual],
+            fromfile=expected_label,
+            tofile=actual_label,
+            lineterm="",
+        )
+    )
+
+
+def capture_queries(action, using: str = DEFAULT_DB_ALIAS) -> list:
+    """Run ``action`` and return the SQL it executed."""
+    with CaptureQueriesContext(connections[using]) as captured:
+        action()
+    return [query["sql"] for query in captured.captured_queries]
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for checking query budgets across catalogue sizes.
+
+    Scenarios are callables that take the seeded ``(pk, has_sizes)`` product
+    list, prepare any state they need (the bag, the client session) and
+    return the action to measure.
+    """
+
+    catalog_sizes = (20, 400)
+
+    def assertQueryBudget(self, budget: int, scenario, name: str = ""):
+        runs = []
+        for size in self.catalog_sizes:
+            products = seed_catalog(size)
+            for cache in caches.all():
+                cache.clear()
+            action = scenario(products)
+
+            queries = capture_queries(action)
+            label = f"{name or scenario.__name__} with {size} products"
+            if len(queries) > budget:
+                self.fail(
+                    f"{label} ran {len(queries)} queries, over its budget of "
+                    f"{budget}:\n{format_queries(queries)}"
+                )
+            runs.append((label, queries))
+
+        (base_label, base), *others = runs
+        for label, queries in others:
+            if [normalize_sql(sql) for sql in queries] != [normalize_sql(sql) for sql in base]:
+                self.fail(
+                    f"Queries change with catalogue size ({len(base)} -> "
+                    f"{len(queries)}):\n{query_diff(base, queries, base_label, label)}"
+                )
+        return runs
@@ -0,0 +1,96 @@
+"""
+Seeded synthetic data for benchmarks.
+
+The same seed always produces the same catalogue, so runs are comparable.
+"""
+
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from checkout.models import Order, OrderLineItem
+from checkout.services import create_order
+from products.cache import bump_catalog_version
+from products.models import Category, Product
+from products.search import create_index, search_available
+
+CATEGORY_NAMES = (
+    "activewear", "bed_bath", "clearance", "deals", "essentials",
+    "jeans", "kitchen_dining", "new_arrivals", "shirts",
+)
+WORDS = (
+    "cotton", "linen", "denim", "classic", "slim", "relaxed", "bootcut",
+    "oxford", "striped", "organic", "woven", "knit", "vintage", "soft",
+    "stretch", "heavyweight", "everyday", "premium", "shirt", "jeans",
+    "towel", "mug", "blanket", "jacket", "hoodie", "sneaker",
+)
+
+
+@transaction.atomic
+def seed_catalog(size: int, seed: int = 42, batch_size: int = 5000) -> list:
+    """Replace the catalogue with ``size`` synthetic products."""
+    rng = random.Random(seed)
+
+    OrderLineItem.objects.all().delete()
+    Order.objects.all().delete()
+    Product.objects.all().delete()
+    Category.objects.all().delete()
+
+    categories = Category.objects.bulk_create(
+        Category(name=name, friendly_name=name.replace("_", " ").title())
+        for name in CATEGORY_NAMES
+    )
+
+    for start in range(0, size, batch_size):
+        Product.objects.bulk_create(
+            Product(
+                category=rng.choice(categories + [None]),
+                sku=f"bench{i:08d}",
+                name=" ".join(rng.choices(WORDS, k=3)).title(),
+                description=" ".join(rng.choices(WORDS, k=40)),
+                has_sizes=rng.random() < 0.3,
+                price=Decimal(rng.randint(199, 19999)) / 100,
+                rating=None if rng.random() < 0.1 else Decimal(rng.randint(0, 500)) / 100,
+            )
+            for i in range(start, min(start + batch_size, size))
+        )
+
+    if search_available():
+        with connection.cursor() as cursor:
+            create_index(cursor)
+    bump_catalog_version()
+
+    return list(Product.objects.order_by("pk").values_list("pk", "has_sizes"))
+
+
+def make_bag(products: list, lines: int, seed: int = 42) -> dict:
+    """Build a session bag with ``lines`` lines from the seeded products."""
+    rng = random.Random(seed)
+    bag = {}
+    for pk, has_sizes in rng.sample(products, min(lines, len(products))):
+        if has_sizes:
+            bag[str(pk)] = {"items_by_size": {"m": rng.randint(1, 5)}}
+        else:
+            bag[str(pk)] = rng.randint(1, 5)
+    return bag
+
+
+def make_order(products: list, lines: int, seed: int = 42) -> Order:
+    """Create an order with ``lines`` line items."""
+    rng = random.Random(seed)
+    order = Order(
+        full_name="Bench Mark",
+        email="bench@example.com",
+        phone_number="000",
+        country="IE",
+        town_or_city="Dublin",
+        street_address1="1 Bench Street",
+    )
+    return create_order(
+        order,
+        [
+            {"product": pk, "quantity": rng.randint(1, 3)}
+            for pk, _ in rng.sample(products, min(lines, len(products)))
+        ],
+    )
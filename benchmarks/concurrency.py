@@ -0,0 +1,197 @@
+"""
+Load comparison of the sync (WSGI) and async (ASGI) view stacks.
+
+Both stacks are driven in-process, without a server. The sync stack is a
+pool of threads, each a client making one request at a time through the
+WSGI handler, as in a threaded WSGI worker. The async stack is a set of
+coroutines sharing one event loop through the ASGI handler, as in a single
+ASGI worker. Every client requests the same mix of pages.
+
+SQLite answers in microseconds, so by default nothing waits on I/O and the
+GIL decides the result. ``query_latency`` adds a fixed wait to every query
+to model a database server across the network, which is where serving many
+requests per worker matters.
+
+Django's async ORM still runs queries in a thread: by default all of a
+worker's queries share one. The results show what that means for a given
+page mix: throughput, latency and the threads each stack needed.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+STACKS = {
+    "sync": "boutique_ado.urls",
+    "async": "boutique_ado.asgi_urls",
+}
+
+
+def page_mix(products: list, details: int = 5) -> list:
+    """The URLs every client cycles through: listings, details and the bag."""
+    listing = reverse("products")
+    step = max(1, len(products) // details)
+    return [
+        listing,
+        f"{listing}?sort=price&direction=desc",
+        *(reverse("product_detail", args=[pk]) for pk, _ in products[::step][:details]),
+        reverse("view_bag"),
+    ]
+
+
+class _Recorder:
+    """Latencies, failures and the peak thread count of one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.peak_threads = threading.active_count()
+
+    def record(self, started: float, status: int) -> None:
+        elapsed = perf_counter() - started
+        threads = threading.active_count()
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.errors += status != 200
+            self.peak_threads = max(self.peak_threads, threads)
+
+
+def _latency_wrapper(seconds: float):
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+class _QueryLatency:
+    """Add a fixed delay to every query on connections opened while active."""
+
+    def __init__(self, seconds: float):
+        self.wrapper = _latency_wrapper(seconds) if seconds else None
+
+    def _add(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self.wrapper)
+
+    def attach(self) -> None:
+        """Add the delay to this thread's connections."""
+        if self.wrapper is None:
+            return
+        for connection in connections.all(initialized_only=True):
+            if self.wrapper not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self.wrapper)
+        connection_created.connect(self._add)
+
+    def detach(self) -> None:
+        """Remove the delay from this thread's connections."""
+        if self.wrapper is None:
+            return
+        for connection in connections.all(initialized_only=True):
+            if self.wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self.wrapper)
+
+
+def _sync_client(urls: list, count: int, recorder: _Recorder, latency: _QueryLatency):
+    client = Client()
+    latency.attach()
+    try:
+        for i in range(count):
+            started = perf_counter()
+            response = client.get(urls[i % len(urls)])
+            recorder.record(started, response.status_code)
+    finally:
+        latency.detach()
+        connections.close_all()
+
+
+def _run_sync(urls: list, concurrency: int, count: int, latency: _QueryLatency) -> _Recorder:
+    recorder = _Recorder()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(_sync_client, urls, count, recorder, latency)
+            for _ in range(concurrency)
+        ]
+        for future in futures:
+            future.result()
+    return recorder
+
+
+async def _async_client(urls: list, count: int, recorder: _Recorder):
+    client = AsyncClient()
+    for i in range(count):
+        started = perf_counter()
+        response = await client.get(urls[i % len(urls)])
+        recorder.record(started, response.status_code)
+
+
+async def _run_async_clients(urls, concurrency, count, latency) -> _Recorder:
+    recorder = _Recorder()
+    # The async ORM's queries run in the worker's sync thread.
+    await sync_to_async(latency.attach)()
+    try:
+        await asyncio.gather(*(
+            _async_client(urls, count, recorder) for _ in range(concurrency)
+        ))
+    finally:
+        await sync_to_async(latency.detach)()
+    return recorder
+
+
+def _run_async(urls: list, concurrency: int, count: int, latency: _QueryLatency) -> _Recorder:
+    return asyncio.run(_run_async_clients(urls, concurrency, count, latency))
+
+
+RUNNERS = {"sync": _run_sync, "async": _run_async}
+
+
+def _percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def compare_stacks(urls: list, levels, requests_per_client: int = 20,
+                   query_latency_ms: float = 0.0, stacks=("sync", "async"),
+                   progress=None) -> list:
+    """
+    Run every stack at every concurrency level and summarise each run.
+
+    Each page is requested once per stack before timing, so both measure
+    warm caches.
+    """
+    latency = _QueryLatency(query_latency_ms / 1000)
+    results = []
+    try:
+        for stack in stacks:
+            with override_settings(ROOT_URLCONF=STACKS[stack]):
+                RUNNERS[stack](urls, 1, len(urls), _QueryLatency(0))
+                for concurrency in levels:
+                    started = perf_counter()
+                    recorder = RUNNERS[stack](urls, concurrency, requests_per_client, latency)
+                    elapsed = perf_counter() - started
+
+                    result = {
+                        "stack": stack,
+                        "concurrency": concurrency,
+                        "requests": len(recorder.latencies),
+                        "errors": recorder.errors,
+                        "seconds": round(elapsed, 3),
+                        "throughput": round(len(recorder.latencies) / elapsed, 1),
+                        "p50_ms": round(statistics.median(recorder.latencies) * 1000, 2),
+                        "p95_ms": round(_percentile(recorder.latencies, 0.95) * 1000, 2),
+                        "peak_threads": recorder.peak_threads,
+                    }
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    finally:
+        connection_created.disconnect(latency._add)
+    return results
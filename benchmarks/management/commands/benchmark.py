@@ -0,0 +1,112 @@
+import json
+import platform
+import sys
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from benchmarks.runner import compare, run_benchmarks, throwaway_database
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(value: str) -> int:
+    """Parse catalogue sizes such as 500, 10k or 1m."""
+    value = value.strip().lower()
+    multiplier = SIZE_SUFFIXES.get(value[-1:], 1)
+    digits = value[:-1] if value[-1:] in SIZE_SUFFIXES else value
+    if not digits.isdigit():
+        raise CommandError(f"Invalid catalogue size: {value!r}")
+    return int(digits) * multiplier
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the shop's hot paths against seeded synthetic catalogues "
+        "in a throwaway test database, and compare with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1k,10k,100k",
+            help="Comma-separated catalogue sizes (default: 1k,10k,100k).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed runs per case (default: 5).",
+        )
+        parser.add_argument(
+            "--only",
+            help="Only run cases whose name contains this text.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results to this JSON file.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Compare the results with a JSON file from an earlier run.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown against the baseline (default: 0.25 = 25%%).",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if any regression is flagged.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(size) for size in options["sizes"].split(",") if size.strip()]
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        baseline = None
+        if options["baseline"]:
+            try:
+                baseline = json.loads(Path(options["baseline"]).read_text())["results"]
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Could not read baseline: {error}") from error
+
+        def report(result):
+            self.stdout.write(
+                f"{result['catalog_size']:>8}  {result['name']:<70} "
+                f"{result['wall_ms']['median']:>9.2f}ms  "
+                f"{result['queries']:>4}q  {result['peak_kb']:>9.1f}KB"
+            )
+
+        with throwaway_database():
+            results = run_benchmarks(
+                sizes, repeat=options["repeat"], only=options["only"], progress=report)
+
+        if options["output"]:
+            payload = {
+                "meta": {
+                    "created": timezone.now().isoformat(),
+                    "python": sys.version.split()[0],
+                    "django": django.get_version(),
+                    "platform": platform.platform(),
+                    "sizes": sizes,
+                    "repeat": options["repeat"],
+                },
+                "results": results,
+            }
+            Path(options["output"]).write_text(json.dumps(payload, indent=2))
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options["tolerance"])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+            elif options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} regressions found.")
@@ -0,0 +1,91 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.catalog import seed_catalog
+from benchmarks.concurrency import STACKS, compare_stacks, page_mix
+from benchmarks.runner import throwaway_database
+
+from .benchmark import parse_size
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent requests one worker serves with the sync "
+        "(WSGI) and the async (ASGI) views, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            default="1k",
+            help="Catalogue size to seed (default: 1k).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32",
+            help="Comma-separated numbers of concurrent clients (default: 1,8,32).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=20,
+            help="Requests made by each client (default: 20).",
+        )
+        parser.add_argument(
+            "--query-latency",
+            type=float,
+            default=0.0,
+            help="Milliseconds added to every query, to model a networked database.",
+        )
+        parser.add_argument(
+            "--stacks",
+            default="sync,async",
+            help="Comma-separated stacks to run (default: sync,async).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results to this JSON file.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency takes comma-separated integers.")
+        if not levels or min(levels) < 1 or options["requests"] < 1:
+            raise CommandError("Concurrency and --requests must be at least 1.")
+
+        stacks = [stack.strip() for stack in options["stacks"].split(",") if stack.strip()]
+        unknown = set(stacks) - STACKS.keys()
+        if unknown:
+            raise CommandError(f"Unknown stacks: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{'stack':<6} {'clients':>7} {'req/s':>9} {'p50':>9} {'p95':>9} "
+            f"{'threads':>7} {'errors':>6}"
+        )
+
+        def report(result):
+            self.stdout.write(
+                f"{result['stack']:<6} {result['concurrency']:>7} "
+                f"{result['throughput']:>9.1f} {result['p50_ms']:>7.2f}ms "
+                f"{result['p95_ms']:>7.2f}ms {result['peak_threads']:>7} "
+                f"{result['errors']:>6}"
+            )
+
+        with throwaway_database():
+            products = seed_catalog(parse_size(options["size"]))
+            results = compare_stacks(
+                page_mix(products),
+                levels,
+                requests_per_client=options["requests"],
+                query_latency_ms=options["query_latency"],
+                stacks=stacks,
+                progress=report,
+            )
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({"results": results}, indent=2))
+            self.stdout.write(f"Results written to {options['output']}.")
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.sqlite_stress import profiles, stress_sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent session, checkout and catalogue traffic against "
+        "throwaway SQLite files with SQLite's defaults and with the tuned "
+        "settings, and count the 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Concurrent threads, each with its own connection (default: 8).",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="Session save, catalogue read and checkout rounds per worker (default: 50).",
+        )
+        parser.add_argument(
+            "--profiles",
+            default="default,wal,tuned",
+            help="Comma-separated profiles to run (default: default,wal,tuned).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results to this JSON file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["iterations"] < 1:
+            raise CommandError("--workers and --iterations must be at least 1.")
+
+        names = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        unknown = set(names) - profiles().keys()
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{'profile':<8} {'journal':>7} {'ops':>6} {'locked':>6} {'orders':>6} "
+            f"{'ops/s':>9} {'p95':>9}"
+        )
+
+        def report(result):
+            p95 = f"{result['p95_ms']:>7.2f}ms" if result["p95_ms"] is not None else f"{'-':>9}"
+            self.stdout.write(
+                f"{result['profile']:<8} {result['journal_mode']:>7} "
+                f"{result['operations']:>6} {result['lock_errors']:>6} "
+                f"{result['orders']:>6} {result['ops_per_second']:>9.1f} {p95}"
+            )
+
+        results = stress_sqlite(
+            workers=options["workers"],
+            iterations=options["iterations"],
+            names=names,
+            progress=report,
+        )
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({"results": results}, indent=2))
+            self.stdout.write(f"Results written to {options['output']}.")
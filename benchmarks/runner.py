@@ -0,0 +1,219 @@
+"""
+Benchmark cases for the shop's hot paths and the code that times them.
+
+Every case records wall time, the number of queries and peak Python memory,
+and the results are plain dicts so they can be written to JSON and compared
+with a stored baseline.
+"""
+
+import gc
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from bag.contexts import BagContents
+from checkout.models import OrderLineItem
+
+from .catalog import make_bag, make_order, seed_catalog
+
+BAG_SIZES = (1, 10, 50)
+ORDER_SIZES = (1, 20)
+LISTING_SORTS = ("price", "rating", "name", "category")
+LISTING_QUERIES = (
+    {},
+    {"category": "jeans,shirts"},
+    {"q": "cotton"},
+    {"q": "slim denim", "category": "jeans"},
+)
+
+
+@dataclass
+class Case:
+    """One benchmark: a callable, plus optional untimed setup per run."""
+
+    name: str
+    run: Callable
+    setup: Callable | None = None
+
+
+@contextmanager
+def throwaway_database():
+    """Never touch the real database: run against a fresh test database."""
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def _clear_caches() -> None:
+    for alias in ("default", "fragments"):
+        caches[alias].clear()
+
+
+def measure(case: Case, repeat: int) -> dict:
+    """
+    Run a case ``repeat`` times and summarise the measurements.
+
+    Timed runs do not trace memory, since tracemalloc slows Python code
+    down; one extra run captures the query count and peak memory.
+    """
+    timings = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        gc.collect()
+        started = time.perf_counter()
+        case.run()
+        timings.append(time.perf_counter() - started)
+
+    if case.setup:
+        case.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as captured:
+            case.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": case.name,
+        "wall_ms": {
+            "min": round(min(timings) * 1000, 3),
+            "median": round(statistics.median(timings) * 1000, 3),
+            "mean": round(statistics.fmean(timings) * 1000, 3),
+        },
+        "queries": len(captured),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def _get(client, url, params=None):
+    """Request a page and refuse to time error responses."""
+    response = client.get(url, params or {})
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} {params} returned {response.status_code}")
+    return response
+
+
+def build_cases(products: list) -> list:
+    """Create the benchmark cases for a seeded catalogue."""
+    client = Client()
+    cases = []
+
+    for lines in BAG_SIZES:
+        bag = make_bag(products, lines)
+        cases.append(Case(
+            f"bag_contents[{lines} lines]",
+            lambda bag=bag: BagContents(bag).summary,
+        ))
+
+    listing_url = reverse("products")
+    for params in LISTING_QUERIES:
+        # Without a sort parameter the listing uses its default order, or
+        # relevance for searches.
+        unsorted = {**params, "sort": "relevance" if "q" in params else "default"}
+        queries = [(params, unsorted)]
+        for sort in LISTING_SORTS:
+            for direction in ("asc", "desc"):
+                query = {**params, "sort": sort, "direction": direction}
+                queries.append((query, query))
+
+        for query, labelled in queries:
+            label = "&".join(f"{k}={v}" for k, v in sorted(labelled.items()))
+            cases.append(Case(
+                f"all_products[{label}]",
+                lambda query=query: _get(client, listing_url, query),
+                setup=_clear_caches,
+            ))
+
+    detail_url = reverse("product_detail", args=[products[len(products) // 2][0]])
+    cases.append(Case(
+        "product_detail",
+        lambda: _get(client, detail_url),
+        setup=_clear_caches,
+    ))
+
+    for lines in ORDER_SIZES:
+        order = make_order(products, lines)
+        cases.append(Case(f"Order.update_total[{lines} lines]", order.update_total))
+
+    line_order = make_order(products, 1)
+    product_pk = products[0][0]
+    cases.append(Case(
+        "OrderLineItem.create",
+        lambda: OrderLineItem.objects.create(
+            order=line_order, product_id=product_pk, quantity=2),
+    ))
+
+    for lines in ORDER_SIZES:
+        cases.append(Case(
+            f"create_order[{lines} lines]",
+            lambda lines=lines: make_order(products, lines),
+        ))
+
+    return cases
+
+
+def run_benchmarks(sizes, repeat: int = 5, only=None, progress=None) -> list:
+    """
+    Seed a catalogue of each size and run every case against it.
+
+    ``only`` is an optional substring filter on case names.
+    """
+    results = []
+    for size in sizes:
+        products = seed_catalog(size)
+        for case in build_cases(products):
+            if only and only not in case.name:
+                continue
+            result = measure(case, repeat)
+            result["catalog_size"] = size
+            results.append(result)
+            if progress:
+                progress(result)
+    return results
+
+
+def compare(results: list, baseline: list, tolerance: float = 0.25) -> list:
+    """
+    Flag cases that got slower than ``tolerance`` allows or run more queries.
+
+    Returns a list of human-readable regression descriptions.
+    """
+    previous = {(r["name"], r["catalog_size"]): r for r in baseline}
+    regressions = []
+
+    for result in results:
+        before = previous.get((result["name"], result["catalog_size"]))
+        if before is None:
+            continue
+
+        label = f"{result['name']} @ {result['catalog_size']}"
+        old_ms = before["wall_ms"]["median"]
+        new_ms = result["wall_ms"]["median"]
+        if old_ms and new_ms > old_ms * (1 + tolerance):
+            regressions.append(f"{label}: {old_ms:.2f}ms -> {new_ms:.2f}ms")
+        if result["queries"] > before["queries"]:
+            regressions.append(
+                f"{label}: {before['queries']} -> {result['queries']} queries")
+
+    return regressions
@@ -0,0 +1,209 @@
+"""
+Concurrent write stress test for the SQLite settings.
+
+Worker threads, each with its own connection as in a threaded server, mix
+the shop's write transactions with catalogue reads:
+
+- a session save: read the session row, then update it;
+- a checkout: read the products, insert an order and its lines, then update
+  the order total.
+
+Both writes read before they write. In SQLite's default (DEFERRED)
+transactions the read takes a shared lock and the first write must upgrade
+it; when another connection is already writing, SQLite cannot wait for
+the upgrade and fails at once with "database is locked", whatever the
+timeout. Readers in the default rollback journal are also blocked while
+a writer commits.
+
+Every profile runs on a fresh database file: ``default`` uses SQLite's
+defaults, ``wal`` adds the pragmas from settings.DATABASES and ``tuned``
+uses all of its options (IMMEDIATE transactions) with lock retries.
+"""
+
+import statistics
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from boutique_ado.db import is_lock_error, retry_on_locked, temporary_database
+
+PRODUCTS = 50
+LINES_PER_ORDER = 3
+
+SCHEMA = (
+    "CREATE TABLE session (session_key TEXT PRIMARY KEY, session_data TEXT NOT NULL)",
+    "CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT NOT NULL, price REAL NOT NULL)",
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "email TEXT NOT NULL, total REAL NOT NULL DEFAULT 0)",
+    "CREATE TABLE line (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER NOT NULL, "
+    "product_id INTEGER NOT NULL, quantity INTEGER NOT NULL, total REAL NOT NULL)",
+)
+
+
+def profiles() -> dict:
+    """Map each profile to its connection OPTIONS and whether writes retry."""
+    tuned = settings.DATABASES["default"].get("OPTIONS", {})
+    return {
+        "default": ({}, False),
+        "wal": ({"init_command": tuned.get("init_command", "")}, False),
+        "tuned": (tuned, True),
+    }
+
+
+@contextmanager
+def stress_database(alias: str, options: dict):
+    """Register ``alias`` for a new SQLite file with the given options."""
+    with tempfile.TemporaryDirectory() as directory:
+        settings_dict = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(Path(directory, "stress.sqlite3")),
+            "OPTIONS": dict(options),
+        }
+        with temporary_database(alias, settings_dict) as connection:
+            with connection.cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                cursor.executemany(
+                    "INSERT INTO product (id, name, price) VALUES (%s, %s, %s)",
+                    [(pk, f"Product {pk}", 10.0 + pk) for pk in range(1, PRODUCTS + 1)],
+                )
+            yield connection
+
+
+def _save_session(alias: str, key: str, counter: int) -> None:
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.execute("SELECT session_data FROM session WHERE session_key = %s", [key])
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "INSERT INTO session (session_key, session_data) VALUES (%s, %s)",
+                [key, str(counter)],
+            )
+        else:
+            cursor.execute(
+                "UPDATE session SET session_data = %s WHERE session_key = %s",
+                [str(counter), key],
+            )
+
+
+def _place_order(alias: str, worker: int, counter: int) -> None:
+    product_ids = [(worker * 7 + counter + i) % PRODUCTS + 1 for i in range(LINES_PER_ORDER)]
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, price FROM product WHERE id IN ({', '.join(['%s'] * len(product_ids))})",
+            product_ids,
+        )
+        prices = dict(cursor.fetchall())
+        cursor.execute(
+            "INSERT INTO orders (email, total) VALUES (%s, 0)", [f"worker{worker}@example.com"])
+        order_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO line (order_id, product_id, quantity, total) VALUES (%s, %s, %s, %s)",
+            [(order_id, pk, 2, prices[pk] * 2) for pk in product_ids],
+        )
+        cursor.execute(
+            "UPDATE orders SET total = (SELECT SUM(total) FROM line WHERE order_id = %s) "
+            "WHERE id = %s",
+            [order_id, order_id],
+        )
+
+
+def _browse(alias: str, counter: int) -> None:
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT id, name, price FROM product ORDER BY price DESC LIMIT 20 OFFSET %s",
+            [counter % PRODUCTS],
+        )
+        cursor.fetchall()
+
+
+class _Tally:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.failures = []
+
+    def run(self, operation, *args) -> None:
+        started = perf_counter()
+        try:
+            operation(*args)
+        except Exception as exc:
+            with self._lock:
+                if is_lock_error(exc):
+                    self.errors += 1
+                else:
+                    self.failures.append(exc)
+            return
+        with self._lock:
+            self.latencies.append(perf_counter() - started)
+
+
+def _worker(alias: str, worker: int, iterations: int, retry: bool, tally: _Tally,
+            start: threading.Barrier) -> None:
+    wrap = retry_on_locked(using=alias) if retry else (lambda func: func)
+    save_session, place_order = wrap(_save_session), wrap(_place_order)
+    try:
+        start.wait()
+        for counter in range(iterations):
+            tally.run(save_session, alias, f"session-{worker}", counter)
+            tally.run(_browse, alias, counter)
+            tally.run(place_order, alias, worker, counter)
+    finally:
+        connections[alias].close()
+
+
+def stress_sqlite(workers: int = 8, iterations: int = 50, names=("default", "wal", "tuned"),
+                  progress=None) -> list:
+    """Run the workload once per profile and summarise each run."""
+    available = profiles()
+    results = []
+    for name in names:
+        options, retry = available[name]
+        alias = f"stress_{name}"
+        with stress_database(alias, options) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+
+            tally = _Tally()
+            start = threading.Barrier(workers)
+            threads = [
+                threading.Thread(
+                    target=_worker, args=(alias, worker, iterations, retry, tally, start))
+                for worker in range(workers)
+            ]
+            started = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - started
+
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM orders")
+                orders = cursor.fetchone()[0]
+
+        if tally.failures:
+            raise tally.failures[0]
+        result = {
+            "profile": name,
+            "journal_mode": journal_mode,
+            "workers": workers,
+            "operations": workers * iterations * 3,
+            "lock_errors": tally.errors,
+            "orders": orders,
+            "seconds": round(elapsed, 3),
+            "ops_per_second": round(len(tally.latencies) / elapsed, 1),
+            "p95_ms": round(
+                statistics.quantiles(tally.latencies, n=20)[-1] * 1000, 2
+            ) if len(tally.latencies) > 1 else None,
+        }
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
@@ -0,0 +1,304 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.db import OperationalError, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path, reverse
+
+from bag.storage import encode_bag
+from boutique_ado.db import is_lock_error, retry_on_locked
+from boutique_ado.urls import urlpatterns as site_urlpatterns
+from checkout import views as checkout_views
+from checkout.models import Order
+from checkout.services import create_order, lines_from_bag
+
+from .budgets import QueryBudgetMixin, format_queries, normalize_sql, query_diff
+from .catalog import make_bag, seed_catalog
+from .concurrency import compare_stacks, page_mix
+from .runner import compare, run_benchmarks
+from .sqlite_stress import stress_sqlite
+
+
+# Maximum queries per scenario. Lower a budget when a change saves queries;
+# raising one should come with a reason in the commit.
+QUERY_BUDGETS = {
+    "listing": 4,
+    "sorted_filtered_listing": 5,
+    "search_listing": 5,
+    "relevance_search_listing": 4,
+    "product_detail": 4,
+    "empty_bag": 1,
+    "full_bag": 2,
+    "add_to_bag": 4,
+    "checkout": 2,
+    "create_order": 12,
+}
+
+# The checkout page is not on the site yet and has no template. Its budget
+# runs against this URLconf and a stand-in template that reads what the
+# real page would: the bag lines and the order form.
+urlpatterns = [
+    *site_urlpatterns,
+    path("checkout/", checkout_views.checkout, name="checkout"),
+]
+
+CHECKOUT_TEMPLATE = """{% extends "base.html" %}
+{% block content %}
+  {% for item in bag_items %}{{ item.product.name }} {{ item.subtotal }}{% endfor %}
+  {{ grand_total }} {{ order_form }}
+{% endblock content %}"""
+
+CHECKOUT_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    "APP_DIRS": False,
+    "OPTIONS": {
+        **settings.TEMPLATES[0]["OPTIONS"],
+        "loaders": [
+            ("django.template.loaders.locmem.Loader",
+             {"checkout/checkout.html": CHECKOUT_TEMPLATE}),
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ],
+    },
+}]
+
+
+class BenchmarkRunnerTests(TestCase):
+    """Smoke tests for the benchmark runner on a tiny catalogue."""
+
+    def test_results_are_recorded_and_compared(self):
+        results = run_benchmarks([30], repeat=1, only="bag_contents")
+
+        self.assertEqual(
+            [r["name"] for r in results],
+            ["bag_contents[1 lines]", "bag_contents[10 lines]", "bag_contents[50 lines]"],
+        )
+        self.assertEqual({r["queries"] for r in results}, {1})
+
+        slower = [
+            {**r, "wall_ms": {**r["wall_ms"], "median": r["wall_ms"]["median"] * 2 + 1},
+             "queries": r["queries"] + 1}
+            for r in results
+        ]
+        self.assertEqual(compare(results, results), [])
+        self.assertEqual(len(compare(slower, results)), 6)
+
+    def test_every_case_runs(self):
+        results = run_benchmarks([30], repeat=1)
+        self.assertGreater(len(results), 40)
+
+        names = {r["name"] for r in results}
+        self.assertIn("all_products[sort=default]", names)
+        self.assertIn("all_products[q=cotton&sort=relevance]", names)
+
+
+class StackComparisonTests(TransactionTestCase):
+    """
+    Smoke test for the sync/async load comparison.
+
+    The clients run in other threads, which only see committed data.
+    """
+
+    def tearDown(self):
+        seed_catalog(0)
+
+    def test_both_stacks_serve_the_page_mix(self):
+        urls = page_mix(seed_catalog(30))
+        results = compare_stacks(urls, [1, 3], requests_per_client=len(urls),
+                                 query_latency_ms=1)
+
+        self.assertEqual(
+            [(r["stack"], r["concurrency"]) for r in results],
+            [("sync", 1), ("sync", 3), ("async", 1), ("async", 3)],
+        )
+        self.assertEqual({r["errors"] for r in results}, {0})
+        self.assertEqual([r["requests"] for r in results], [len(urls) * n for n in (1, 3) * 2])
+
+
+class SqliteStressTests(SimpleTestCase):
+    """
+    The stress test runs on its own database files, through aliases the
+    test framework does not know about, so their connections are allowed.
+    """
+
+    @classmethod
+    def ensure_connection_patch_method(cls):
+        return BaseDatabaseWrapper.ensure_connection
+
+    def test_tuned_settings_have_no_lock_errors(self):
+        results = stress_sqlite(workers=6, iterations=15, names=("default", "tuned"))
+
+        default, tuned = results
+        self.assertEqual(default["journal_mode"], "delete")
+        self.assertEqual(tuned["journal_mode"], "wal")
+        self.assertEqual(tuned["lock_errors"], 0)
+        self.assertEqual(tuned["orders"], 6 * 15)
+
+
+@mock.patch("boutique_ado.db.time.sleep")
+class LockRetryTests(SimpleTestCase):
+    databases = {"default"}
+
+    def test_lock_errors_are_retried(self, sleep):
+        work = mock.Mock(side_effect=[OperationalError("database is locked"), "done"])
+        self.assertEqual(retry_on_locked(work)(), "done")
+        self.assertEqual(work.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_retries_are_limited(self, sleep):
+        work = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(attempts=3)(work)()
+        self.assertEqual(work.call_count, 3)
+
+    def test_other_errors_and_nested_transactions_are_not_retried(self, sleep):
+        work = mock.Mock(side_effect=OperationalError("no such table: x"))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(work)()
+        self.assertEqual(work.call_count, 1)
+
+        work = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            retry_on_locked(work)()
+        self.assertEqual(work.call_count, 1)
+
+    def test_wrapped_lock_errors_are_recognised(self, sleep):
+        try:
+            try:
+                raise OperationalError("database is locked")
+            except OperationalError:
+                raise UpdateError
+        except UpdateError as exc:
+            self.assertTrue(is_lock_error(exc))
+        self.assertFalse(is_lock_error(UpdateError()))
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Query budgets for the shop's main pages.
+
+    Every scenario runs against a small and a larger catalogue, so the query
+    count must not grow with the number of products.
+    """
+
+    def _with_bag(self, products, lines):
+        session = self.client.session
+        session["bag"] = encode_bag(make_bag(products, lines))
+        session.save()
+
+    def _get(self, url, data=None):
+        def action():
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+        return action
+
+    def test_listing_with_empty_bag(self):
+        def listing(products):
+            return self._get(reverse("products"))
+
+        self.assertQueryBudget(QUERY_BUDGETS["listing"], listing)
+
+    def test_sorted_and_filtered_listing(self):
+        def sorted_filtered_listing(products):
+            return self._get(reverse("products"), {
+                "sort": "price", "direction": "desc", "category": "jeans,shirts"})
+
+        self.assertQueryBudget(
+            QUERY_BUDGETS["sorted_filtered_listing"], sorted_filtered_listing)
+
+    def test_search_listing(self):
+        def search_listing(products):
+            return self._get(reverse("products"), {"q": "cotton", "sort": "rating"})
+
+        self.assertQueryBudget(QUERY_BUDGETS["search_listing"], search_listing)
+
+    def test_search_listing_in_relevance_order(self):
+        def relevance_search_listing(products):
+            return self._get(reverse("products"), {"q": "cotton"})
+
+        self.assertQueryBudget(
+            QUERY_BUDGETS["relevance_search_listing"], relevance_search_listing)
+
+    def test_product_detail(self):
+        def product_detail(products):
+            self._with_bag(products, 50)
+            return self._get(reverse("product_detail", args=[products[0][0]]))
+
+        self.assertQueryBudget(QUERY_BUDGETS["product_detail"], product_detail)
+
+    def test_empty_bag_page(self):
+        def empty_bag(products):
+            return self._get(reverse("view_bag"))
+
+        self.assertQueryBudget(QUERY_BUDGETS["empty_bag"], empty_bag)
+
+    def test_50_line_bag_page(self):
+        def full_bag(products):
+            self._with_bag(products, 50)
+            return self._get(reverse("view_bag"))
+
+        self.assertQueryBudget(QUERY_BUDGETS["full_bag"], full_bag)
+
+    def test_add_to_50_line_bag(self):
+        def add_to_full_bag(products):
+            self._with_bag(products, 50)
+            pk = next(pk for pk, has_sizes in reversed(products) if has_sizes)
+
+            def action():
+                response = self.client.post(
+                    reverse("add_to_bag", args=[pk]), {"quantity": 1, "product_size": "m"})
+                self.assertEqual(response.status_code, 302)
+            return action
+
+        self.assertQueryBudget(QUERY_BUDGETS["add_to_bag"], add_to_full_bag)
+
+    @override_settings(ROOT_URLCONF=__name__, TEMPLATES=CHECKOUT_TEMPLATES)
+    def test_checkout_with_50_line_bag(self):
+        def checkout(products):
+            self._with_bag(products, 50)
+            return self._get(reverse("checkout"))
+
+        self.assertQueryBudget(QUERY_BUDGETS["checkout"], checkout)
+
+    def test_create_order_from_50_line_bag(self):
+        def create_order_from_bag(products):
+            lines = lines_from_bag(make_bag(products, 50))
+
+            def action():
+                order = Order(
+                    full_name="Budget", email="budget@example.com", phone_number="0",
+                    country="IE", town_or_city="Dublin", street_address1="1 Main St",
+                )
+                create_order(order, lines)
+            return action
+
+        self.assertQueryBudget(QUERY_BUDGETS["create_order"], create_order_from_bag)
+
+
+class QueryBudgetReportTests(TestCase):
+    """Tests for the failure output of query budgets."""
+
+    def test_statements_are_reduced_to_their_shape(self):
+        self.assertEqual(
+            normalize_sql('''SELECT * FROM p WHERE id IN (1, 2, 3) AND name = 'it''s' LIMIT 25'''),
+            "SELECT * FROM p WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+
+    def test_repeated_statements_are_flagged(self):
+        report = format_queries([
+            "SELECT 1 FROM p WHERE id = 1",
+            "SELECT 1 FROM p WHERE id = 2",
+            "SELECT 1 FROM c",
+        ])
+        self.assertIn("1. SELECT 1 FROM p WHERE id = 1  [x2]", report)
+        self.assertIn("3. SELECT 1 FROM c\n", report + "\n")
+
+    def test_diff_shows_extra_queries(self):
+        diff = query_diff(
+            ["SELECT 1 FROM p"],
+            ["SELECT 1 FROM p", "SELECT 1 FROM c WHERE id = 7"],
+            "small", "large",
+        )
+        self.assertIn("+SELECT ? FROM c WHERE id = ?", diff)
@@ -0,0 +1,21 @@
+"""
+URLs for ASGI deployments.
+
+The catalogue and the bag are served by their async views; everything else
+is routed as in boutique_ado.urls.
+"""
+
+from django.urls import include, path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_APPS = {
+    "products/": "products.async_urls",
+    "bag/": "bag.async_urls",
+}
+
+urlpatterns = [
+    path(route, include(module)) for route, module in ASYNC_APPS.items()
+] + [
+    pattern for pattern in sync_urlpatterns if str(pattern.pattern) not in ASYNC_APPS
+]
@@ -0,0 +1,132 @@
+"""
+Database helpers: lock retries, database copies and temporary aliases.
+
+SQLite allows one writer at a time. With ``transaction_mode: IMMEDIATE`` a
+write transaction takes the write lock at BEGIN, waiting up to the
+connection ``timeout`` for it. A lock error therefore comes before any of
+the transaction's work, so running the whole unit again is safe.
+retry_on_locked does that, with capped exponential backoff and jitter.
+"""
+
+import asyncio
+import functools
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+LOCK_RETRY_ATTEMPTS = 5
+LOCK_RETRY_BASE_DELAY = 0.05
+LOCK_RETRY_MAX_DELAY = 1.0
+
+
+def is_lock_error(exc: BaseException) -> bool:
+    """
+    True for SQLite's "database is locked" errors, including ones another
+    exception was raised from (the session backend re-raises them as
+    UpdateError).
+    """
+    while exc is not None:
+        if isinstance(exc, OperationalError) and "locked" in str(exc):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def backoff_delays(attempts: int | None = None):
+    """Yield the pause before each retry: full jitter, doubling up to a cap."""
+    attempts = attempts or getattr(settings, "DATABASE_LOCK_RETRIES", LOCK_RETRY_ATTEMPTS)
+    for attempt in range(attempts - 1):
+        yield random.uniform(0, min(LOCK_RETRY_MAX_DELAY, LOCK_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _can_retry(using) -> bool:
+    # Inside an outer transaction the work done so far is already lost;
+    # only the outermost block can start again.
+    return not transaction.get_connection(using).in_atomic_block
+
+
+def retry_on_locked(func=None, *, using=DEFAULT_DB_ALIAS, attempts=None):
+    """
+    Decorator: call ``func`` again when it fails with a lock error.
+
+    Apply it outside ``transaction.atomic`` so every attempt is a new
+    transaction. Works on coroutine functions too.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, using=using, attempts=attempts)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            for delay in backoff_delays(attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as exc:
+                    if not is_lock_error(exc) or not _can_retry(using):
+                        raise
+                await asyncio.sleep(delay)
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for delay in backoff_delays(attempts):
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:
+                if not is_lock_error(exc) or not _can_retry(using):
+                    raise
+            time.sleep(delay)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def copy_database(target, using=DEFAULT_DB_ALIAS) -> Path:
+    """
+    Copy an SQLite database to the file ``target``.
+
+    The copy is made with SQLite's online backup, so writers are not
+    blocked for long, and is moved into place in one step: a connection
+    opened during the copy still sees the previous file. The copy uses a
+    rollback journal, so read-only connections need no -wal or -shm files.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        raise ValueError(f"Database {using!r} is not SQLite.")
+
+    target = Path(target)
+    partial = target.with_name(f".{target.name}.partial")
+    partial.unlink(missing_ok=True)
+
+    connection.ensure_connection()
+    destination = sqlite3.connect(partial)
+    try:
+        connection.connection.backup(destination)
+        destination.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        destination.close()
+    os.replace(partial, target)
+    return target
+
+
+@contextmanager
+def temporary_database(alias: str, settings_dict: dict):
+    """Make ``alias`` a usable database connection inside the block."""
+    connections.settings[alias] = connections.configure_settings({
+        **connections.settings, alias: settings_dict,
+    })[alias]
+    try:
+        yield connections[alias]
+    finally:
+        connections[alias].close()
+        # Drop this thread's wrapper too, or reusing the alias would reuse it.
+        del connections[alias]
+        del connections.settings[alias]
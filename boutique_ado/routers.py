@@ -0,0 +1,157 @@
+"""
+Send catalogue reads to a read-only replica of the database.
+
+Inside a request (CatalogReplicaMiddleware) or a ``replica_reads()`` block,
+reads of Product and Category go to the CATALOG_REPLICA_ALIAS database.
+Everything else, and every write, goes to the primary. Once a request has
+written anything, its later catalogue reads also go to the primary, so it
+always sees its own writes whatever the replica's lag.
+
+The replica is checked before it is first used and then at most every
+REPLICA_RECHECK_SECONDS; while it cannot be opened or does not have the
+catalogue tables, reads stay on the primary. A replica that fails in the
+middle of a query is not retried.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+REPLICA_RECHECK_SECONDS = 30
+REPLICATED_MODELS = frozenset({"products.product", "products.category"})
+
+_current = ContextVar("replica_reads", default=None)
+
+
+class ReplicaReads:
+    """Whether the current unit of work has written to the primary."""
+
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+@contextmanager
+def replica_reads():
+    """Route catalogue reads to the replica until the block writes."""
+    token = _current.set(ReplicaReads())
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class _Health:
+    """When each replica was last checked, and the outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def available(self, alias: str, table: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            checked_at, ok = self._checked.get(alias, (None, False))
+            if checked_at is not None and now - checked_at < REPLICA_RECHECK_SECONDS:
+                return ok
+            # Claim the check so concurrent requests keep the old answer.
+            self._checked[alias] = (now, ok)
+
+        ok = _probe(alias, table)
+        with self._lock:
+            self._checked[alias] = (now, ok)
+        return ok
+
+    def reset(self) -> None:
+        with self._lock:
+            self._checked.clear()
+
+
+health = _Health()
+
+
+def _probe(alias: str, table: str) -> bool:
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM {connection.ops.quote_name(table)} LIMIT 1")
+            cursor.fetchall()
+    except DatabaseError:
+        connection.close()
+        return False
+    return True
+
+
+def replica_alias():
+    """The configured replica alias, or None when there is none."""
+    alias = getattr(settings, "CATALOG_REPLICA_ALIAS", None)
+    return alias if alias and alias in connections else None
+
+
+class CatalogReplicaRouter:
+    """Route Product and Category reads to the replica; see the module docstring."""
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (
+            state is None
+            or state.wrote
+            or model._meta.label_lower not in REPLICATED_MODELS
+        ):
+            return None
+        alias = replica_alias()
+        if alias is None or not health.available(alias, model._meta.db_table):
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, not migrated on its own.
+        if db == replica_alias():
+            return False
+        return None
+
+
+class CatalogReplicaMiddleware:
+    """
+    Let each request read the catalogue from the replica until it writes.
+
+    Place it before any middleware that writes (sessions, authentication),
+    so those writes count as the request's own.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with replica_reads():
+            return await self.get_response(request)
@@ -2,6 +2,7 @@
 Django settings for boutique_ado project.
 """
 
+import os
 from pathlib import Path
 
 
@@ -49,6 +50,9 @@ DJANGO_APPS = [
     "products",
     "bag",
     "checkout",
+    "benchmarks",
+    "metrics",
+    "assets",
 ]
 
 INSTALLED_APPS = DJANGO_APPS
@@ -59,6 +63,9 @@ INSTALLED_APPS = DJANGO_APPS
 # ------------------------------------------------------------
 
 MIDDLEWARE = [
+    "assets.middleware.StaticFilesMiddleware",
+    "metrics.middleware.MetricsMiddleware",
+    "boutique_ado.routers.CatalogReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,7 +81,11 @@ MIDDLEWARE = [
 # URLS / WSGI
 # ------------------------------------------------------------
 
-ROOT_URLCONF = "boutique_ado.urls"
+# ASGI deployments serve the catalogue and the bag with async views
+# (boutique_ado.asgi sets ASYNC_VIEWS=1). Under WSGI every async view would
+# need an event loop of its own, so the sync views stay the default.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS") == "1"
+ROOT_URLCONF = "boutique_ado.asgi_urls" if ASYNC_VIEWS else "boutique_ado.urls"
 WSGI_APPLICATION = "boutique_ado.wsgi.application"
 
 
@@ -97,6 +108,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "bag.contexts.bag_contents",
+                "products.contexts.catalog_navigation",
             ],
         },
     },
@@ -107,12 +119,109 @@ TEMPLATES = [
 # DATABASE
 # ------------------------------------------------------------
 
+# WAL lets readers carry on while one connection writes; synchronous=NORMAL
+# is durable in WAL mode except for the last commits on power loss. The
+# pragmas run on every new connection (journal_mode persists in the file).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,  # KiB
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep each WSGI worker thread's connection open between requests.
+        # Under ASGI a request's queries may run on any thread, so a
+        # connection is opened per request instead.
+        "CONN_MAX_AGE": 0 if ASYNC_VIEWS else int(os.environ.get("CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock at BEGIN, waiting up to ``timeout`` seconds
+            # for it, instead of failing when a read upgrades to a write.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 5,
+        },
     }
 }
+# Attempts for writes that still find the database locked (boutique_ado.db).
+DATABASE_LOCK_RETRIES = 5
+
+# A read-only copy of the database for catalogue reads, refreshed by
+# ``manage.py refresh_catalog_replica``. Unset, everything reads from the
+# primary (see boutique_ado.routers).
+CATALOG_REPLICA_PATH = os.environ.get("CATALOG_REPLICA_PATH")
+CATALOG_REPLICA_ALIAS = "replica"
+if CATALOG_REPLICA_PATH:
+    DATABASES[CATALOG_REPLICA_ALIAS] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": Path(CATALOG_REPLICA_PATH).resolve().as_uri() + "?mode=ro",
+        # Connect per request, so a refreshed copy is used straight away.
+        "CONN_MAX_AGE": 0,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["boutique_ado.routers.CatalogReplicaRouter"]
+
+
+# ------------------------------------------------------------
+# CACHES
+# ------------------------------------------------------------
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    # Rendered catalogue fragments. LocMemCache evicts least recently used
+    # entries once MAX_ENTRIES is reached, which bounds memory per worker.
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "TIMEOUT": 600,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+            "CULL_FREQUENCY": 10,
+        },
+    },
+}
+
+
+# ------------------------------------------------------------
+# SESSIONS / MESSAGES
+# ------------------------------------------------------------
+
+# Sessions are read from the cache and only written to the database when
+# their data changes (see bag.sessions). With several worker processes the
+# default cache must be shared (e.g. Redis) so workers never read a stale bag.
+SESSION_ENGINE = "bag.sessions"
+
+# Keep flash messages in a cookie so showing one never writes the session.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+
+# ------------------------------------------------------------
+# METRICS
+# ------------------------------------------------------------
+
+# With several worker processes, point METRICS_DIR at a directory shared by
+# all of them (and emptied on restart) so /metrics reports every worker.
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = 5
+
+# Who may read /metrics: staff users, these client addresses, or requests
+# with "Authorization: Bearer <METRICS_TOKEN>". Behind a proxy REMOTE_ADDR
+# is the proxy's address, so prefer the token there.
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+# Template render time is measured by wrapping the template backend's
+# render(), which adds a little overhead to every render; off by default.
+METRICS_TEMPLATE_TIMING = os.environ.get("METRICS_TEMPLATE_TIMING") == "1"
 
 
 # ------------------------------------------------------------
@@ -145,6 +254,19 @@ STATIC_URL = "/static/"
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# collectstatic fingerprints every asset and writes gzip (and, with the
+# optional brotli package, brotli) variants next to it; the
+# StaticFilesMiddleware serves them with long-lived cache headers.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "assets.storage.CompressedManifestStaticFilesStorage",
+    },
+}
 
 
 # ------------------------------------------------------------
@@ -154,6 +276,13 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Leave the byte transfer of media files to the front-end server:
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd). Unset, the
+# files are streamed by Django (see assets.views).
+MEDIA_OFFLOAD = os.environ.get("MEDIA_OFFLOAD") or None
+# The nginx "internal" location that aliases MEDIA_ROOT.
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
 
 # ------------------------------------------------------------
 # DEFAULTS
@@ -211,3 +340,7 @@ LOGIN_REDIRECT_URL = "/"
 
 FREE_DELIVERY_THRESHOLD = 50
 STANDARD_DELIVERY_PERCENTAGE = 10
+
+PRODUCTS_PER_PAGE = 24
+PRODUCTS_COUNT_CAP = 1000
+ORDERS_PER_PAGE = 10
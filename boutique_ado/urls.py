@@ -1,16 +1,16 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from checkout.urls import history_urlpatterns as checkout_history_urlpatterns
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("allauth.urls")),
     path("", include("home.urls")),
     path("products/", include("products.urls")),
     path("bag/", include("bag.urls")),
+    path("checkout/", include(checkout_history_urlpatterns)),
+    path("metrics", include("metrics.urls")),
+    path(settings.MEDIA_URL.lstrip("/"), include("assets.urls")),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
@@ -1,6 +1,27 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from products.pagination import EstimatedCountPaginator
+
+from .models import DailyCountrySales, Order, OrderLineItem
+from .rollups import sales_report
+from .signals import deferred_order_totals
+
+REPORT_DEFAULT_DAYS = 30
+
 
-from .models import Order, OrderLineItem
+def _report_day(value):
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
 
 
 class OrderLineItemAdminInline(admin.TabularInline):
@@ -8,8 +29,38 @@ class OrderLineItemAdminInline(admin.TabularInline):
 
     model = OrderLineItem
     readonly_fields = ("lineitem_total",)
+    autocomplete_fields = ("product",)
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+
+class CountryListFilter(admin.SimpleListFilter):
+    """
+    Filter orders by country.
+
+    The choices come from the small per-country sales rollup rather than a
+    DISTINCT over every order.
+    """
+
+    title = "country"
+    parameter_name = "country"
+
+    def lookups(self, request, model_admin):
+        countries = (
+            DailyCountrySales.objects.filter(order_count__gt=0)
+            .order_by("country")
+            .values_list("country", flat=True)
+            .distinct()
+        )
+        return [(country, country) for country in countries]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(country=self.value())
+        return queryset
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -52,5 +103,59 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
     ordering = ("-date",)
-    search_fields = ("order_number", "full_name", "email")
-    list_filter = ("date", "country")
+    # Only used to show the search box; see get_search_results.
+    search_fields = ("order_number", "email", "full_name")
+    list_filter = ("date", CountryListFilter)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search with indexed lookups only.
+
+        An order number or an email (in any case) is matched exactly first;
+        otherwise the term is a prefix of the full name, as a range on its
+        index. The admin's default OR of ``icontains`` lookups scans every
+        order.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        exact = Order.with_email_key(queryset).filter(
+            Q(order_number=term.upper()) | Q(email_key=term.lower()))
+        if exact.exists():
+            return exact, False
+        return queryset.filter(full_name__gte=term, full_name__lt=term + "\U0010ffff"), False
+
+    def save_related(self, request, form, formsets, change):
+        """Save the inline line items, then update the order totals once."""
+        with deferred_order_totals():
+            super().save_related(request, form, formsets, change)
+
+    def get_urls(self):
+        urls = [
+            path(
+                "sales-report/",
+                self.admin_site.admin_view(self.sales_report_view),
+                name="checkout_order_sales_report",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def sales_report_view(self, request):
+        """Show sales for a range of days, read from the rollup tables only."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        until = _report_day(request.GET.get("until")) or timezone.localdate()
+        since = _report_day(request.GET.get("since")) or (
+            until - timedelta(days=REPORT_DEFAULT_DAYS - 1))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Sales report",
+            "report": sales_report(since, until),
+        }
+        return TemplateResponse(request, "admin/checkout/sales_report.html", context)
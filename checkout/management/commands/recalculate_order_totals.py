@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from checkout.models import Order
+from checkout.services import TOTAL_FIELDS, recalculate_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate order_total, delivery_cost and grand_total for all orders "
+        "(or a date range) from their line items, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Only orders placed on or after this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--until",
+            help="Only orders placed on or before this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Orders processed per batch (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes without writing them.",
+        )
+
+    def _parse_day(self, value, option):
+        day = parse_date(value) if value else None
+        if value and day is None:
+            raise CommandError(f"{option} must be a date in YYYY-MM-DD format.")
+        return day
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        since = self._parse_day(options["since"], "--since")
+        until = self._parse_day(options["until"], "--until")
+
+        orders = Order.objects.all()
+        if since:
+            orders = orders.filter(
+                date__gte=timezone.make_aware(datetime.combine(since, dt_time.min)))
+        if until:
+            orders = orders.filter(
+                date__lte=timezone.make_aware(datetime.combine(until, dt_time.max)))
+
+        dry_run = options["dry_run"]
+        started = time.perf_counter()
+        scanned = changed = 0
+
+        for batch_scanned, changes in recalculate_orders(
+                orders, batch_size=options["batch_size"], dry_run=dry_run):
+            scanned += batch_scanned
+            changed += len(changes)
+
+            if dry_run or options["verbosity"] > 1:
+                for change in changes:
+                    diff = ", ".join(
+                        f"{field} {old} -> {new}"
+                        for field, old, new in zip(
+                            TOTAL_FIELDS, change.stored, change.calculated)
+                        if old != new
+                    )
+                    self.stdout.write(f"{change.order_number}: {diff}")
+
+        elapsed = time.perf_counter() - started
+        verb = "would change" if dry_run else "updated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} orders, {verb} {changed} in {elapsed:.1f}s."
+            )
+        )
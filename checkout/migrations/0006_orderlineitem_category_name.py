@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def record_current_categories(apps, schema_editor):
+    # Existing lines get their product's category as it is now, the best
+    # record there is of the category at the time of the order.
+    OrderLineItem = apps.get_model("checkout", "OrderLineItem")
+    Product = apps.get_model("products", "Product")
+    OrderLineItem.objects.update(category_name=Coalesce(
+        Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("category__name")),
+        models.Value(""),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0005_order_full_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderlineitem',
+            name='category_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.RunPython(record_current_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0006_orderlineitem_category_name'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='checkout_order_email_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.text.Lower('email'), models.OrderBy(models.F('date'), descending=True), name='checkout_order_email_date_idx'),
+        ),
+    ]
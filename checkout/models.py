@@ -5,7 +5,8 @@ from typing import TYPE_CHECKING
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import Sum
+from django.db.models import F, Sum
+from django.db.models.functions import Lower
 
 from products.models import Product
 
@@ -16,7 +17,8 @@ if TYPE_CHECKING:
 class Order(models.Model):
     """Store an order and calculated totals."""
 
-    order_number = models.CharField(max_length=32, null=False, editable=False)
+    order_number = models.CharField(
+        max_length=32, null=False, editable=False, unique=True)
     full_name = models.CharField(max_length=50, null=False, blank=False)
     email = models.EmailField(max_length=254, null=False, blank=False)
     phone_number = models.CharField(max_length=20, null=False, blank=False)
@@ -35,33 +37,59 @@ class Order(models.Model):
     grand_total = models.DecimalField(
         max_digits=10, decimal_places=2, null=False, default=Decimal("0.00"))
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"]),
+            models.Index(fields=["country", "date"]),
+            # Emails are matched without regard to case (see for_email).
+            models.Index(
+                Lower("email"), F("date").desc(), name="checkout_order_email_date_idx"),
+            models.Index(fields=["full_name"]),
+        ]
+
     if TYPE_CHECKING:
         lineitems: "RelatedManager[OrderLineItem]"
 
+    @classmethod
+    def with_email_key(cls, queryset=None):
+        """Annotate ``email_key``, the lowercased email the index is built on."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.alias(email_key=Lower("email"))
+
+    @classmethod
+    def for_email(cls, email: str, queryset=None):
+        """Orders placed with ``email`` in any letter case, using its index."""
+        return cls.with_email_key(queryset).filter(email_key=email.lower())
+
     def _generate_order_number(self) -> str:
         """Generate a unique order number."""
         return uuid.uuid4().hex.upper()
 
-    def update_total(self) -> None:
-        """Recalculate totals from line items and delivery rules."""
-        total = self.lineitems.aggregate(
-            total=Sum("lineitem_total")).get("total") or Decimal("0.00")
-        total = Decimal(total).quantize(Decimal("0.01"))
-        self.order_total = total
+    @staticmethod
+    def calculate_totals(order_total) -> tuple:
+        """Return (order_total, delivery_cost, grand_total) for a line sum."""
+        order_total = Decimal(order_total or 0).quantize(Decimal("0.01"))
 
         threshold = Decimal(
             str(getattr(settings, "FREE_DELIVERY_THRESHOLD", 0)))
         percentage = Decimal(
             str(getattr(settings, "STANDARD_DELIVERY_PERCENTAGE", 0)))
 
-        if self.order_total < threshold:
-            self.delivery_cost = (
-                self.order_total * percentage / Decimal("100")).quantize(Decimal("0.01"))
+        if order_total < threshold:
+            delivery_cost = (
+                order_total * percentage / Decimal("100")).quantize(Decimal("0.01"))
         else:
-            self.delivery_cost = Decimal("0.00")
+            delivery_cost = Decimal("0.00")
+
+        grand_total = (order_total + delivery_cost).quantize(Decimal("0.01"))
+        return order_total, delivery_cost, grand_total
 
-        self.grand_total = (self.order_total +
-                            self.delivery_cost).quantize(Decimal("0.01"))
+    def update_total(self) -> None:
+        """Recalculate totals from line items and delivery rules."""
+        total = self.lineitems.aggregate(
+            total=Sum("lineitem_total")).get("total")
+        self.order_total, self.delivery_cost, self.grand_total = (
+            self.calculate_totals(total))
         self.save(update_fields=["order_total",
                   "delivery_cost", "grand_total"])
 
@@ -76,6 +104,11 @@ class Order(models.Model):
         return self.order_number
 
 
+def category_name_of(product: Product) -> str:
+    """The name a line item records for its product's category."""
+    return product.category.name if product.category_id else ""
+
+
 class OrderLineItem(models.Model):
     """Store a product line within an order."""
 
@@ -93,15 +126,115 @@ class OrderLineItem(models.Model):
         default=1, validators=[MinValueValidator(1)])
     lineitem_total = models.DecimalField(
         max_digits=6, decimal_places=2, null=False, blank=False, editable=False)
+    # The product's category when the line was created (or moved to another
+    # product), so sales rollups keep it if the category changes later.
+    category_name = models.CharField(
+        max_length=254, blank=True, default="", editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_product_id = instance.__dict__.get("product_id")
+        return instance
 
     def save(self, *args, **kwargs):
-        """Calculate the line total and update the order."""
+        """
+        Calculate the line total and record the product's category.
+
+        The order totals are refreshed by the post_save signal receiver.
+        """
         self.lineitem_total = (self.product.price *
                                self.quantity).quantize(Decimal("0.01"))
+        if self._state.adding or self.product_id != getattr(self, "_loaded_product_id", None):
+            self.category_name = category_name_of(self.product)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "category_name"}
         super().save(*args, **kwargs)
-        self.order.update_total()
+        self._loaded_product_id = self.product_id
 
     def __str__(self) -> str:
         """Return a readable line label."""
         sku = getattr(self.product, "sku", "")
         return f"SKU {sku} on order {self.order.order_number}"
+
+
+class DailySales(models.Model):
+    """
+    Orders, units sold and revenue (grand totals) per day.
+
+    This and the other Daily* tables are rollups kept up to date by
+    checkout.rollups; rebuild them with ``manage.py rebuild_sales_rollups``.
+    """
+
+    day = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        ordering = ("-day",)
+
+    def __str__(self) -> str:
+        return f"Sales on {self.day}"
+
+
+class DailyProductSales(models.Model):
+    """Units sold and line revenue per product per day."""
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales")
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="checkout_dailyproductsales_unique"),
+        ]
+
+
+class DailyCategorySales(models.Model):
+    """
+    Units sold and line revenue per category per day.
+
+    Categories are recorded by the name stored on each line item when it was
+    created ("" for uncategorised products), so the history survives
+    categories being renamed or deleted and products changing category.
+    """
+
+    day = models.DateField()
+    category_name = models.CharField(max_length=254, blank=True)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name_plural = "Daily category sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category_name"],
+                name="checkout_dailycategorysales_unique"),
+        ]
+
+
+class DailyCountrySales(models.Model):
+    """Orders and revenue (grand totals) per country per day."""
+
+    day = models.DateField()
+    country = models.CharField(max_length=40)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name_plural = "Daily country sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "country"], name="checkout_dailycountrysales_unique"),
+        ]
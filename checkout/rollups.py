@@ -0,0 +1,400 @@
+"""
+Daily sales rollups, maintained incrementally.
+
+Each change to an order or a line item becomes a set of deltas for the
+Daily* tables. The deltas are applied with one ``INSERT ... ON CONFLICT DO
+UPDATE`` per table, which adds them to the stored values, so concurrent
+writers never overwrite each other's counts. SQLite and PostgreSQL share
+this syntax.
+
+The receivers in checkout.signals record single saves and deletes. Bulk
+paths that skip signals, such as create_order and the batched totals
+recalculation, record their changes explicitly. Inside
+``batched_sales_rollups()`` deltas are merged in memory and written when the
+outermost block exits.
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    DailyCategorySales,
+    DailyCountrySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderLineItem,
+)
+
+# model -> (key fields, summed fields)
+ROLLUPS = {
+    DailySales: (("day",), ("order_count", "units", "revenue")),
+    DailyProductSales: (("day", "product_id"), ("units", "revenue")),
+    DailyCategorySales: (("day", "category_name"), ("units", "revenue")),
+    DailyCountrySales: (("day", "country"), ("order_count", "revenue")),
+}
+
+ORDER_FIELDS = frozenset({"date", "country", "grand_total"})
+LINE_FIELDS = frozenset(
+    {"order", "product", "category_name", "quantity", "lineitem_total"})
+
+UPSERT_BATCH_SIZE = 500
+REBUILD_BATCH_SIZE = 2000
+
+_batch = threading.local()
+
+
+@dataclass(frozen=True)
+class OrderState:
+    """What an order contributes to the rollups."""
+
+    day: date
+    country: str
+    grand_total: Decimal
+
+
+@dataclass(frozen=True)
+class LineState:
+    """What a line item contributes to the rollups."""
+
+    day: date
+    product_id: int
+    category_name: str
+    quantity: int
+    total: Decimal
+
+
+def _day(value: datetime) -> date:
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def order_state(order: Order, grand_total: Decimal | None = None) -> OrderState:
+    if grand_total is None:
+        grand_total = order.grand_total
+    return OrderState(_day(order.date), order.country, grand_total)
+
+
+def stored_order_state(pk) -> OrderState | None:
+    """Read an order's contribution as currently stored."""
+    row = Order.objects.filter(pk=pk).values_list(
+        "date", "country", "grand_total").first()
+    return OrderState(_day(row[0]), row[1], row[2]) if row else None
+
+
+def line_states(lines) -> list:
+    """
+    The contributions of many line items, in order.
+
+    Orders already loaded on the lines are used as they are; the rest are
+    read with one query, however many lines there are.
+    """
+    lines = list(lines)
+    order_ids = {
+        line.order_id for line in lines if not OrderLineItem.order.is_cached(line)}
+    order_dates = dict(
+        Order.objects.filter(pk__in=order_ids).values_list("pk", "date")
+    ) if order_ids else {}
+
+    states = []
+    for line in lines:
+        if line.order_id in order_dates:
+            order_date = order_dates[line.order_id]
+        else:
+            order_date = line.order.date
+        states.append(LineState(
+            _day(order_date), line.product_id, line.category_name,
+            line.quantity, line.lineitem_total,
+        ))
+    return states
+
+
+def line_state(line: OrderLineItem) -> LineState:
+    return line_states([line])[0]
+
+
+def stored_line_state(pk) -> LineState | None:
+    """Read a line item's contribution as currently stored."""
+    row = OrderLineItem.objects.filter(pk=pk).values_list(
+        "order__date", "product_id", "category_name", "quantity", "lineitem_total",
+    ).first()
+    if not row:
+        return None
+    order_date, product_id, category_name, quantity, total = row
+    return LineState(_day(order_date), product_id, category_name, quantity, total)
+
+
+class SalesDeltas:
+    """Pending changes to the rollup tables, merged by row key."""
+
+    def __init__(self):
+        self.rows = {model: {} for model in ROLLUPS}
+
+    def __bool__(self) -> bool:
+        return any(self.rows.values())
+
+    def add(self, model, key: tuple, **values) -> None:
+        row = self.rows[model].get(key)
+        if row is None:
+            row = self.rows[model][key] = dict.fromkeys(ROLLUPS[model][1], 0)
+        for field, value in values.items():
+            row[field] += value
+
+    def order(self, state: OrderState, sign: int) -> None:
+        revenue = sign * state.grand_total
+        self.add(DailySales, (state.day,), order_count=sign, revenue=revenue)
+        self.add(DailyCountrySales, (state.day, state.country),
+                 order_count=sign, revenue=revenue)
+
+    def line(self, state: LineState, sign: int, per_product: bool = True) -> None:
+        units = sign * state.quantity
+        revenue = sign * state.total
+        self.add(DailySales, (state.day,), units=units)
+        if per_product:
+            self.add(DailyProductSales, (state.day, state.product_id),
+                     units=units, revenue=revenue)
+        self.add(DailyCategorySales, (state.day, state.category_name),
+                 units=units, revenue=revenue)
+
+    def change(self, record, old, new) -> None:
+        """Replace an old contribution (or None) with a new one (or None)."""
+        if old == new:
+            return
+        if old is not None:
+            record(old, -1)
+        if new is not None:
+            record(new, 1)
+
+
+def _upsert(model, rows: dict) -> None:
+    """Add summed deltas to the stored rows, creating missing ones."""
+    key_fields, value_fields = ROLLUPS[model]
+    opts = model._meta
+    fields = [opts.get_field(name) for name in (*key_fields, *value_fields)]
+
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    conflict = ", ".join(quote(field.column) for field in fields[:len(key_fields)])
+    updates = ", ".join(
+        f"{quote(field.column)} = {table}.{quote(field.column)} + excluded.{quote(field.column)}"
+        for field in fields[len(key_fields):]
+    )
+    row_placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    items = list(rows.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            batch = items[start:start + UPSERT_BATCH_SIZE]
+            params = [
+                field.get_db_prep_value(value, connection)
+                for key, values in batch
+                for field, value in zip(
+                    fields, (*key, *(values[name] for name in value_fields)))
+            ]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "
+                f"VALUES {', '.join([row_placeholder] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}",
+                params,
+            )
+
+
+def apply_deltas(deltas: SalesDeltas) -> None:
+    """Write pending deltas, one statement per table touched."""
+    for model, rows in deltas.rows.items():
+        rows = {key: values for key, values in rows.items() if any(values.values())}
+        if rows:
+            _upsert(model, rows)
+
+
+@contextmanager
+def batched_sales_rollups():
+    """
+    Merge rollup changes and write them once at the end.
+
+    Blocks nest; only the outermost one writes. As with
+    deferred_order_totals, nothing is written if the surrounding transaction
+    is already marked for rollback.
+    """
+    outermost = getattr(_batch, "deltas", None) is None
+    if outermost:
+        _batch.deltas = SalesDeltas()
+
+    try:
+        yield _batch.deltas
+    finally:
+        if outermost:
+            deltas = _batch.deltas
+            _batch.deltas = None
+            if deltas and not connections[router.db_for_write(DailySales)].needs_rollback:
+                apply_deltas(deltas)
+
+
+def _record(callback) -> None:
+    deltas = getattr(_batch, "deltas", None)
+    if deltas is not None:
+        callback(deltas)
+        return
+    deltas = SalesDeltas()
+    callback(deltas)
+    apply_deltas(deltas)
+
+
+def record_order_change(old: OrderState | None, new: OrderState | None) -> None:
+    """Move an order's contribution from ``old`` to ``new``."""
+    _record(lambda deltas: deltas.change(deltas.order, old, new))
+
+
+def record_line_change(old: LineState | None, new: LineState | None,
+                       per_product: bool = True) -> None:
+    """
+    Move a line item's contribution from ``old`` to ``new``.
+
+    ``per_product=False`` leaves DailyProductSales alone, for lines removed
+    along with their product, whose rows are deleted with it.
+    """
+    _record(lambda deltas: deltas.change(
+        partial(deltas.line, per_product=per_product), old, new))
+
+
+def record_new_lines(lines) -> None:
+    """Add line items created without signals (e.g. by bulk_create)."""
+    def add(deltas):
+        for state in line_states(lines):
+            deltas.line(state, 1)
+    _record(add)
+
+
+def _bounds(since: date | None, until: date | None):
+    """Aware datetime bounds covering whole days."""
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since else None
+    end = (
+        timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+        if until else None
+    )
+    return start, end
+
+
+def _in_range(queryset, field: str, start, end):
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lt": end})
+    return queryset
+
+
+def _days(queryset, since, until):
+    if since:
+        queryset = queryset.filter(day__gte=since)
+    if until:
+        queryset = queryset.filter(day__lte=until)
+    return queryset
+
+
+def _bulk_create(model, objects) -> int:
+    """Insert rows from an iterator in batches; returns the number inserted."""
+    created = 0
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            created += len(model.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(model.objects.bulk_create(batch))
+    return created
+
+
+@transaction.atomic
+def rebuild_sales_rollups(since: date | None = None, until: date | None = None) -> dict:
+    """
+    Recompute the rollups from orders and line items, optionally for a range
+    of days only. Returns the number of rows written per table.
+    """
+    start, end = _bounds(since, until)
+    orders = _in_range(Order.objects.order_by(), "date", start, end).annotate(
+        day=TruncDate("date"))
+    lines = _in_range(OrderLineItem.objects.order_by(), "order__date", start, end).annotate(
+        day=TruncDate("order__date"))
+
+    for model in ROLLUPS:
+        _days(model.objects.all(), since, until).delete()
+
+    daily = {
+        row["day"]: DailySales(day=row["day"], order_count=row["orders"],
+                               revenue=row["revenue"] or 0)
+        for row in orders.values("day").annotate(
+            orders=Count("pk"), revenue=Sum("grand_total"))
+    }
+    for row in lines.values("day").annotate(units=Sum("quantity")):
+        daily.setdefault(row["day"], DailySales(day=row["day"])).units = row["units"]
+
+    written = {DailySales: _bulk_create(DailySales, daily.values())}
+    written[DailyCountrySales] = _bulk_create(DailyCountrySales, (
+        DailyCountrySales(day=row["day"], country=row["country"],
+                          order_count=row["orders"], revenue=row["revenue"] or 0)
+        for row in orders.values("day", "country").annotate(
+            orders=Count("pk"), revenue=Sum("grand_total")).iterator()
+    ))
+    written[DailyProductSales] = _bulk_create(DailyProductSales, (
+        DailyProductSales(day=row["day"], product_id=row["product_id"],
+                          units=row["units"], revenue=row["revenue"])
+        for row in lines.values("day", "product_id").annotate(
+            units=Sum("quantity"), revenue=Sum("lineitem_total")).iterator()
+    ))
+    written[DailyCategorySales] = _bulk_create(DailyCategorySales, (
+        DailyCategorySales(day=row["day"], category_name=row["category_name"],
+                           units=row["units"], revenue=row["revenue"])
+        for row in lines.values("day", "category_name").annotate(
+            units=Sum("quantity"), revenue=Sum("lineitem_total")).iterator()
+    ))
+    return {model._meta.verbose_name_plural: count for model, count in written.items()}
+
+
+def sales_report(since: date, until: date, top: int = 10) -> dict:
+    """Summarise a range of days, reading only the rollup tables."""
+    days = list(_days(DailySales.objects.all(), since, until).order_by("day"))
+    totals = {
+        "order_count": sum(day.order_count for day in days),
+        "units": sum(day.units for day in days),
+        "revenue": sum((day.revenue for day in days), Decimal("0.00")),
+    }
+
+    top_products = (
+        _days(DailyProductSales.objects.all(), since, until)
+        .values("product_id", "product__name", "product__sku")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-revenue", "product_id")[:top]
+    )
+    categories = (
+        _days(DailyCategorySales.objects.all(), since, until)
+        .values("category_name")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-revenue", "category_name")
+    )
+    countries = (
+        _days(DailyCountrySales.objects.all(), since, until)
+        .values("country")
+        .annotate(order_count=Sum("order_count"), revenue=Sum("revenue"))
+        .order_by("-revenue", "country")
+    )
+
+    return {
+        "since": since,
+        "until": until,
+        "days": days,
+        "totals": totals,
+        "top_products": list(top_products),
+        "categories": list(categories),
+        "countries": list(countries),
+    }
@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from boutique_ado.db import retry_on_locked
+from products.models import Product
+
+from .models import Order, OrderLineItem, category_name_of
+from .rollups import (
+    batched_sales_rollups,
+    order_state,
+    record_new_lines,
+    record_order_change,
+)
+
+
+def lines_from_bag(bag: dict) -> list:
+    """Turn the session bag into line specs for create_order."""
+    lines = []
+    for item_id, item_data in bag.items():
+        if isinstance(item_data, int):
+            lines.append({"product": item_id, "quantity": item_data})
+        else:
+            for size, quantity in item_data.get("items_by_size", {}).items():
+                lines.append(
+                    {"product": item_id, "quantity": quantity, "product_size": size})
+    return lines
+
+
+def _product_id(value) -> int:
+    """Accept either a Product or its primary key."""
+    return value.pk if isinstance(value, Product) else int(value)
+
+
+@retry_on_locked
+@transaction.atomic
+def create_order(order: Order, lines) -> Order:
+    """
+    Save an order and all of its line items in one transaction.
+
+    ``lines`` is an iterable of dicts with ``product`` (a Product or its id),
+    ``quantity`` and an optional ``product_size``. Products are loaded in one
+    query, line totals are computed in Python, the lines are inserted with a
+    single bulk_create (which skips the per-line save and signals), the
+    order totals are recalculated exactly once, and the sales rollups are
+    updated with one statement per rollup table. A transaction that finds
+    the database locked is retried.
+    """
+    lines = list(lines)
+    product_ids = {_product_id(line["product"]) for line in lines}
+    products = Product.objects.select_related("category").in_bulk(product_ids)
+
+    missing = product_ids - products.keys()
+    if missing:
+        raise Product.DoesNotExist(
+            f"Products {sorted(missing)} are no longer available.")
+
+    with batched_sales_rollups():
+        order.save()
+
+        line_items = []
+        for line in lines:
+            product = products[_product_id(line["product"])]
+            quantity = int(line["quantity"])
+            line_items.append(
+                OrderLineItem(
+                    order=order,
+                    product=product,
+                    product_size=line.get("product_size"),
+                    category_name=category_name_of(product),
+                    quantity=quantity,
+                    lineitem_total=(product.price * quantity).quantize(Decimal("0.01")),
+                )
+            )
+
+        OrderLineItem.objects.bulk_create(line_items)
+        record_new_lines(line_items)
+        order.update_total()
+
+    return order
+
+
+TOTAL_FIELDS = ("order_total", "delivery_cost", "grand_total")
+
+
+@dataclass
+class OrderTotalsChange:
+    """Stored and recalculated totals of one order."""
+
+    order_id: int
+    order_number: str
+    date: datetime
+    country: str
+    stored: tuple
+    calculated: tuple
+
+
+def _order_rows(queryset):
+    """Select only what a totals comparison needs."""
+    return queryset.values_list("pk", "order_number", "date", "country", *TOTAL_FIELDS)
+
+
+def _total_changes(rows) -> list:
+    """
+    Compare stored totals with totals recalculated from the line items.
+
+    Costs one grouped SUM over the line items of the given order rows.
+    """
+    line_sums = dict(
+        OrderLineItem.objects.filter(order_id__in=[row[0] for row in rows])
+        .order_by()
+        .values("order_id")
+        .annotate(total=Sum("lineitem_total"))
+        .values_list("order_id", "total")
+    )
+
+    changes = []
+    for order_id, order_number, date, country, *stored in rows:
+        calculated = Order.calculate_totals(line_sums.get(order_id))
+        if tuple(stored) != calculated:
+            changes.append(OrderTotalsChange(
+                order_id, order_number, date, country, tuple(stored), calculated))
+    return changes
+
+
+def _apply_total_changes(changes) -> None:
+    """
+    Write recalculated totals with a single CASE-based UPDATE.
+
+    bulk_update skips signals, so the sales rollups are adjusted here.
+    """
+    orders = []
+    with batched_sales_rollups():
+        for change in changes:
+            order = Order(pk=change.order_id, date=change.date, country=change.country)
+            before = order_state(order, grand_total=change.stored[-1])
+            order.order_total, order.delivery_cost, order.grand_total = change.calculated
+            orders.append(order)
+            record_order_change(before, order_state(order))
+        Order.objects.bulk_update(orders, TOTAL_FIELDS)
+
+
+def recalculate_order_totals(order_ids, batch_size: int = 500) -> int:
+    """
+    Recalculate the totals of many orders at once.
+
+    Each batch costs one SELECT of the stored totals, one grouped SUM over
+    the line items and, if anything changed, one UPDATE (a CASE per column),
+    however many orders it holds. The delivery rules are the ones
+    Order.update_total applies. Returns the number of orders updated.
+    """
+    order_ids = sorted(set(order_ids))
+    updated = 0
+
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start:start + batch_size]
+        changes = _total_changes(list(_order_rows(Order.objects.filter(pk__in=batch))))
+        if changes:
+            _apply_total_changes(changes)
+            updated += len(changes)
+
+    return updated
+
+
+def recalculate_orders(queryset, batch_size: int = 1000, dry_run: bool = False):
+    """
+    Recalculate the totals of every order in a queryset, batch by batch.
+
+    Batches are walked by primary key, so each one is an indexed range scan.
+    Yields ``(scanned, changes)`` per batch; with ``dry_run`` nothing is
+    written.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = 0
+
+    while True:
+        rows = list(_order_rows(queryset.filter(pk__gt=last_pk))[:batch_size])
+        if not rows:
+            return
+
+        changes = _total_changes(rows)
+        if changes and not dry_run:
+            with transaction.atomic():
+                _apply_total_changes(changes)
+
+        yield len(rows), changes
+        last_pk = rows[-1][0]
@@ -1,16 +1,173 @@
-from django.db.models.signals import post_delete, post_save
+import threading
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import OrderLineItem
+from products.models import Product
+
+from .models import Order, OrderLineItem
+from .rollups import (
+    LINE_FIELDS,
+    ORDER_FIELDS,
+    batched_sales_rollups,
+    line_state,
+    line_states,
+    order_state,
+    record_line_change,
+    record_order_change,
+    stored_line_state,
+    stored_order_state,
+)
+from .services import recalculate_order_totals
+
+_deferred = threading.local()
+_deleting = threading.local()
+
+
+@contextmanager
+def deferred_order_totals():
+    """
+    Collect the orders touched by line item changes and update them once.
+
+    While active, the line item receivers only record the affected order ids.
+    When the outermost block exits, every dirty order is recalculated with a
+    single set-based pass. Blocks nest, and work inside transaction.atomic;
+    if the surrounding transaction is already marked for rollback the
+    recalculation is skipped, since the changes will be discarded anyway.
+    Sales rollup changes made inside the block are batched too.
+    """
+    outermost = getattr(_deferred, "order_ids", None) is None
+    if outermost:
+        _deferred.order_ids = set()
+
+    with batched_sales_rollups():
+        try:
+            yield
+        finally:
+            if outermost:
+                order_ids = _deferred.order_ids
+                _deferred.order_ids = None
+                if order_ids and not connection.needs_rollback:
+                    recalculate_order_totals(order_ids)
+
+
+def _defer(order_id) -> bool:
+    """Record an order for later recalculation if totals are deferred."""
+    order_ids = getattr(_deferred, "order_ids", None)
+    if order_ids is None:
+        return False
+    order_ids.add(order_id)
+    return True
 
 
 @receiver(post_save, sender=OrderLineItem)
 def update_order_total_on_save(sender, instance, **kwargs):
     """Update order totals when a line item is saved."""
-    instance.order.update_total()
+    if not _defer(instance.order_id):
+        instance.order.update_total()
+
+
+def _deleting_order(origin) -> bool:
+    """True when a deletion started from orders, so they are going too."""
+    return isinstance(origin, Order) or (
+        isinstance(origin, QuerySet) and origin.model is Order)
 
 
 @receiver(post_delete, sender=OrderLineItem)
-def update_order_total_on_delete(sender, instance, **kwargs):
+def update_order_total_on_delete(sender, instance, origin=None, **kwargs):
     """Update order totals when a line item is deleted."""
-    instance.order.update_total()
+    if _deleting_order(origin):
+        return
+    if not _defer(instance.order_id):
+        instance.order.update_total()
+
+
+_UNCHANGED = object()
+
+
+def _state_before(instance, fields, update_fields, load):
+    """Read the stored contribution of an instance about to be saved."""
+    if update_fields is not None and not fields.intersection(update_fields):
+        return _UNCHANGED
+    if instance._state.adding:
+        return None
+    return load(instance.pk)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_sales(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Remember what a saved order contributed to the sales rollups."""
+    if not raw:
+        instance._sales_before = _state_before(
+            instance, ORDER_FIELDS, update_fields, stored_order_state)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_on_order_save(sender, instance, raw=False, **kwargs):
+    """Apply an order's change to the sales rollups."""
+    before = instance.__dict__.pop("_sales_before", _UNCHANGED)
+    if not raw and before is not _UNCHANGED:
+        record_order_change(before, order_state(instance))
+
+
+@receiver(post_delete, sender=Order)
+def update_sales_on_order_delete(sender, instance, **kwargs):
+    """Remove a deleted order from the sales rollups."""
+    record_order_change(order_state(instance), None)
+
+
+@receiver(pre_save, sender=OrderLineItem)
+def remember_line_sales(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Remember what a saved line item contributed to the sales rollups."""
+    if not raw:
+        instance._sales_before = _state_before(
+            instance, LINE_FIELDS, update_fields, stored_line_state)
+
+
+@receiver(post_save, sender=OrderLineItem)
+def update_sales_on_line_save(sender, instance, raw=False, **kwargs):
+    """Apply a line item's change to the sales rollups."""
+    before = instance.__dict__.pop("_sales_before", _UNCHANGED)
+    if not raw and before is not _UNCHANGED:
+        record_line_change(before, line_state(instance))
+
+
+def _deleting_products(origin) -> bool:
+    """True when a deletion started from products, so they are going too."""
+    return isinstance(origin, Product) or (
+        isinstance(origin, QuerySet) and origin.model is Product)
+
+
+@receiver(pre_delete, sender=OrderLineItem)
+def remember_deleted_line(sender, instance, origin=None, **kwargs):
+    """Queue a line item so a deletion's lines leave the rollups together."""
+    if not hasattr(_deleting, "lines"):
+        _deleting.lines = []
+    _deleting.lines.append((origin, instance))
+
+
+@receiver(post_delete, sender=OrderLineItem)
+def update_sales_on_line_delete(sender, instance, origin=None, **kwargs):
+    """Remove deleted line items from the sales rollups."""
+    if instance.__dict__.pop("_sales_removed", False):
+        return
+
+    # Every pre_delete of a deletion runs before its first post_delete, so
+    # the first deleted line removes the whole deletion's lines: one read of
+    # their orders and one write per rollup table. Entries left by a
+    # deletion that failed have another origin and are dropped.
+    queued = getattr(_deleting, "lines", [])
+    _deleting.lines = []
+    lines = [line for line_origin, line in queued if line_origin is origin]
+    if not any(line is instance for line in lines):
+        lines.append(instance)
+
+    per_product = not _deleting_products(origin)
+    with batched_sales_rollups():
+        for line, state in zip(lines, line_states(lines)):
+            record_line_change(state, None, per_product=per_product)
+            if line is not instance:
+                line._sales_removed = True
@@ -1,3 +1,482 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bag.storage import BAG_SESSION_KEY, encode_bag
+from products.models import Category, Product
+
+from .models import (
+    DailyCategorySales,
+    DailyCountrySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderLineItem,
+)
+from .rollups import ROLLUPS
+from .services import create_order, lines_from_bag
+from .signals import deferred_order_totals
+
+
+def make_order(**kwargs) -> Order:
+    """Return an unsaved order with the required address fields."""
+    fields = {
+        "full_name": "Test Buyer",
+        "email": "buyer@example.com",
+        "phone_number": "0123456789",
+        "country": "IE",
+        "town_or_city": "Dublin",
+        "street_address1": "1 Main Street",
+    }
+    fields.update(kwargs)
+    return Order(**fields)
+
+
+class CreateOrderTests(TestCase):
+    """Tests for the bulk order creation service."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name=f"Product {i}", description="x", price=Decimal("2.50"))
+            for i in range(20)
+        ]
+
+    def test_order_is_created_with_constant_queries(self):
+        bag = {str(p.pk): 2 for p in self.products}
+        bag[str(self.products[0].pk)] = {"items_by_size": {"s": 1, "m": 3}}
+
+        # SAVEPOINT, product lookup, order insert, bulk insert, aggregate,
+        # stored totals read, order update, one upsert per sales rollup
+        # table (4), RELEASE.
+        with self.assertNumQueries(12):
+            order = create_order(make_order(), lines_from_bag(bag))
+
+        self.assertEqual(order.lineitems.count(), 21)
+        self.assertEqual(order.order_total, Decimal("105.00"))
+        self.assertEqual(order.delivery_cost, Decimal("0.00"))
+        self.assertEqual(order.grand_total, Decimal("105.00"))
+
+    def test_unknown_product_rolls_back(self):
+        with self.assertRaises(Product.DoesNotExist):
+            create_order(make_order(), [{"product": 999999, "quantity": 1}])
+
+        self.assertFalse(Order.objects.exists())
+
+    def test_single_line_save_still_updates_totals(self):
+        order = make_order()
+        order.save()
+
+        line = OrderLineItem.objects.create(
+            order=order, product=self.products[0], quantity=4)
+        order.refresh_from_db()
+        self.assertEqual(order.order_total, Decimal("10.00"))
+        self.assertEqual(order.grand_total, Decimal("11.00"))
+
+        line.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.grand_total, Decimal("0.00"))
+
+
+class DeferredOrderTotalsTests(TestCase):
+    """Tests for deferring order total updates during bulk changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name="Product", description="x", price=Decimal("10.00"))
+
+    def setUp(self):
+        self.orders = [make_order() for _ in range(3)]
+        for order in self.orders:
+            order.save()
+
+    def test_totals_are_updated_once_on_exit(self):
+        # One INSERT per line inside the block, then one SELECT, one SUM and
+        # one UPDATE for all dirty orders and one upsert per sales rollup
+        # table on exit.
+        with self.assertNumQueries(6 + 3 + 4):
+            with deferred_order_totals():
+                for order in self.orders:
+                    for _ in range(2):
+                        OrderLineItem.objects.create(
+                            order=order, product=self.product, quantity=3)
+
+        for order in self.orders:
+            order.refresh_from_db()
+            self.assertEqual(order.order_total, Decimal("60.00"))
+            self.assertEqual(order.grand_total, Decimal("60.00"))
+
+    def test_nested_blocks_defer_to_the_outermost(self):
+        order = self.orders[0]
+        with deferred_order_totals():
+            with deferred_order_totals():
+                OrderLineItem.objects.create(
+                    order=order, product=self.product, quantity=1)
+            order.refresh_from_db()
+            self.assertEqual(order.order_total, Decimal("0.00"))
+
+        order.refresh_from_db()
+        self.assertEqual(order.order_total, Decimal("10.00"))
+        self.assertEqual(order.delivery_cost, Decimal("1.00"))
+
+    def test_bulk_delete_is_recalculated_once(self):
+        for order in self.orders:
+            OrderLineItem.objects.create(order=order, product=self.product, quantity=1)
+
+        with deferred_order_totals():
+            OrderLineItem.objects.all().delete()
+
+        for order in self.orders:
+            order.refresh_from_db()
+            self.assertEqual(order.grand_total, Decimal("0.00"))
+
+
+class RecalculateOrderTotalsCommandTests(TestCase):
+    """Tests for the bulk order totals recalculation command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(
+            name="Product", description="x", price=Decimal("20.00"))
+        cls.orders = [
+            create_order(make_order(), [{"product": product, "quantity": quantity}])
+            for quantity in (1, 2, 3)
+        ]
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("recalculate_order_totals", "--batch-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    @override_settings(FREE_DELIVERY_THRESHOLD=100)
+    def test_dry_run_reports_without_writing(self):
+        output = self._run("--dry-run")
+
+        self.assertIn(
+            f"{self.orders[2].order_number}: delivery_cost 0.00 -> 6.00, "
+            "grand_total 60.00 -> 66.00",
+            output,
+        )
+        self.assertIn("Scanned 3 orders, would change 1", output)
+        self.orders[2].refresh_from_db()
+        self.assertEqual(self.orders[2].grand_total, Decimal("60.00"))
+
+    @override_settings(FREE_DELIVERY_THRESHOLD=100)
+    def test_totals_are_rewritten(self):
+        self.assertIn("updated 1", self._run())
+        self.assertIn("updated 0", self._run())
+
+        self.orders[2].refresh_from_db()
+        self.assertEqual(self.orders[2].delivery_cost, Decimal("6.00"))
+        self.assertEqual(self.orders[2].grand_total, Decimal("66.00"))
+
+    def test_date_filter(self):
+        self.assertIn("Scanned 0 orders", self._run("--until", "2000-01-01"))
+
+
+def rollup_rows() -> dict:
+    """Every rollup row with a non-zero value, for comparisons."""
+    rows = {}
+    for model, (keys, values) in ROLLUPS.items():
+        for row in model.objects.values_list(*keys, *values):
+            if any(row[len(keys):]):
+                rows[(model.__name__, *row[:len(keys)])] = tuple(
+                    Decimal(value) for value in row[len(keys):])
+    return rows
+
+
+class SalesRollupTests(TestCase):
+    """Tests for the incrementally maintained daily sales rollups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(name="shirts")
+        cls.shirt = Product.objects.create(
+            category=shirts, sku="S1", name="Shirt", description="x",
+            price=Decimal("20.00"))
+        cls.mug = Product.objects.create(
+            sku="M1", name="Mug", description="x", price=Decimal("5.00"))
+
+    def setUp(self):
+        self.today = timezone.localdate()
+
+    def test_create_order_updates_every_rollup(self):
+        create_order(make_order(country="IE"), [
+            {"product": self.shirt, "quantity": 2},
+            {"product": self.mug, "quantity": 1},
+        ])
+        create_order(make_order(country="FR"), [{"product": self.mug, "quantity": 3}])
+
+        daily = DailySales.objects.get(day=self.today)
+        self.assertEqual(daily.order_count, 2)
+        self.assertEqual(daily.units, 6)
+        # 45.00 + 4.50 delivery, plus 15.00 + 1.50 delivery.
+        self.assertEqual(daily.revenue, Decimal("66.00"))
+
+        mug = DailyProductSales.objects.get(day=self.today, product=self.mug)
+        self.assertEqual((mug.units, mug.revenue), (4, Decimal("20.00")))
+        self.assertEqual(
+            DailyCategorySales.objects.get(day=self.today, category_name="shirts").units, 2)
+        self.assertEqual(
+            DailyCategorySales.objects.get(day=self.today, category_name="").units, 4)
+        france = DailyCountrySales.objects.get(day=self.today, country="FR")
+        self.assertEqual((france.order_count, france.revenue), (1, Decimal("16.50")))
+
+    def test_line_and_order_changes_are_applied(self):
+        order = create_order(make_order(), [{"product": self.shirt, "quantity": 1}])
+        line = order.lineitems.get()
+
+        line.quantity = 3
+        line.save()
+        OrderLineItem.objects.create(order=order, product=self.mug, quantity=2)
+        order.refresh_from_db()
+        order.country = "DE"
+        order.save()
+
+        self.assertEqual(rollup_rows(), {
+            ("DailySales", self.today): (1, 5, Decimal("70.00")),
+            ("DailyProductSales", self.today, self.shirt.pk): (3, Decimal("60.00")),
+            ("DailyProductSales", self.today, self.mug.pk): (2, Decimal("10.00")),
+            ("DailyCategorySales", self.today, "shirts"): (3, Decimal("60.00")),
+            ("DailyCategorySales", self.today, ""): (2, Decimal("10.00")),
+            ("DailyCountrySales", self.today, "DE"): (1, Decimal("70.00")),
+        })
+
+        order.delete()
+        self.assertEqual(rollup_rows(), {})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for quantity in (1, 2, 5):
+            create_order(make_order(), [
+                {"product": self.shirt, "quantity": quantity},
+                {"product": self.mug, "quantity": quantity},
+            ])
+        Order.objects.first().lineitems.filter(product=self.mug).delete()
+        incremental = rollup_rows()
+
+        for model in ROLLUPS:
+            model.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_sales_rollups", stdout=out)
+
+        self.assertIn("Rebuilt sales rollups", out.getvalue())
+        self.assertEqual(rollup_rows(), incremental)
+
+    def test_ordered_product_can_be_deleted(self):
+        create_order(make_order(), [
+            {"product": self.shirt, "quantity": 2},
+            {"product": self.mug, "quantity": 1},
+        ])
+        create_order(make_order(), [{"product": self.shirt, "quantity": 1}])
+
+        self.shirt.delete()
+        # Foreign keys are checked at commit, which a TestCase never reaches.
+        connection.check_constraints()
+
+        self.assertFalse(DailyProductSales.objects.filter(product_id=self.shirt.pk).exists())
+        incremental = rollup_rows()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(rollup_rows(), incremental)
+
+    def test_lines_keep_the_category_they_were_ordered_in(self):
+        order = create_order(make_order(), [{"product": self.shirt, "quantity": 2}])
+        created = order.lineitems.create(product=self.shirt, quantity=1)
+        self.assertEqual(created.category_name, "shirts")
+
+        category = self.shirt.category
+        category.name = "tops"
+        category.save()
+        self.shirt.category = Category.objects.create(name="sale")
+        self.shirt.save()
+
+        line = order.lineitems.order_by("pk").first()
+        line.quantity = 3
+        line.save()
+        created.delete()
+
+        self.assertEqual(
+            list(DailyCategorySales.objects.values_list("category_name", "units")),
+            [("shirts", 3)],
+        )
+        incremental = rollup_rows()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(rollup_rows(), incremental)
+
+        line.product = self.mug
+        line.save()
+        self.assertEqual(line.category_name, "")
+        self.assertEqual(
+            list(DailyCategorySales.objects.order_by("category_name")
+                 .values_list("category_name", "units")),
+            [("", 3), ("shirts", 0)],
+        )
+
+    def test_deleting_lines_reads_orders_once(self):
+        def delete_queries(lines):
+            order = create_order(make_order(), [
+                {"product": product, "quantity": 1}
+                for product in [self.shirt, self.mug] * lines
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                order.delete()
+            return len(queries)
+
+        self.assertEqual(delete_queries(1), delete_queries(10))
+        self.assertEqual(rollup_rows(), {})
+
+    def test_report_reads_only_rollups(self):
+        create_order(make_order(), [{"product": self.shirt, "quantity": 2}])
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        url = reverse("admin:checkout_order_sales_report")
+
+        # The user, then one query per rollup table.
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        report = response.context["report"]
+        self.assertEqual(report["totals"]["units"], 2)
+        self.assertEqual(report["top_products"][0]["revenue"], Decimal("40.00"))
+        self.assertContains(response, "Shirt")
+
+
+class OrderAdminTests(TestCase):
+    """Tests for the order changelist and change form."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            sku="P1", name="Product", description="x", price=Decimal("10.00"))
+        for country in ("IE", "FR", "IE"):
+            create_order(make_order(country=country), [{"product": cls.product, "quantity": 1}])
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        self.url = reverse("admin:checkout_order_changelist")
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        # User, country filter choices, capped count, page.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {"country": "IE"})
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+        for _ in range(10):
+            create_order(make_order(), [{"product": self.product, "quantity": 1}])
+        # Unfiltered lists also check for table statistics.
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+    def test_search_uses_indexed_lookups(self):
+        order = create_order(
+            make_order(full_name="Maeve Byrne", email="maeve@example.com"),
+            [{"product": self.product, "quantity": 1}])
+
+        for term in (order.order_number.lower(), "maeve@example.com", "Maeve B"):
+            response = self.client.get(self.url, {"q": term})
+            self.assertEqual(
+                [o.pk for o in response.context["cl"].result_list], [order.pk], term)
+
+            queryset, _ = response.context["cl"].model_admin.get_search_results(
+                None, Order.objects.all(), term)
+            self.assertNotIn("SCAN", queryset.explain(), term)
+
+    def test_country_choices_come_from_the_rollups(self):
+        response = self.client.get(self.url)
+        country_filter = next(
+            spec for spec in response.context["cl"].filter_specs
+            if getattr(spec, "parameter_name", None) == "country")
+        self.assertEqual(
+            [value for value, _ in country_filter.lookup_choices], ["FR", "IE"])
+
+    def test_change_form_uses_product_autocomplete(self):
+        order = Order.objects.first()
+        response = self.client.get(
+            reverse("admin:checkout_order_change", args=[order.pk]))
+        self.assertContains(response, "admin-autocomplete")
+
+
+@override_settings(ORDERS_PER_PAGE=10)
+class OrderHistoryTests(TestCase):
+    """Tests for the keyset-paginated order history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("buyer", "buyer@example.com", "pass")
+        products = [
+            Product.objects.create(
+                sku=f"H{i}", name=f"Product {i}", description="x", price=Decimal("5.00"))
+            for i in range(3)
+        ]
+        cls.orders = [
+            create_order(make_order(), [
+                {"product": product, "quantity": 1 + i % 2} for product in products])
+            for i in range(25)
+        ]
+        create_order(make_order(email="someone@example.com"),
+                     [{"product": products[0], "quantity": 1}])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_history_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse("order_history"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_only_the_history_is_routed(self):
+        session = self.client.session
+        session[BAG_SESSION_KEY] = encode_bag({str(Product.objects.first().pk): 1})
+        session.save()
+        self.assertEqual(self.client.get("/checkout/").status_code, 404)
+
+    def test_pages_walk_every_order_newest_first(self):
+        url = reverse("order_history")
+        self.client.get(url)  # Warm the cached category navigation.
+        seen = []
+        while url:
+            # User, orders, line items with products.
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            seen.extend(order.order_number for order in response.context["orders"])
+            url = response.context["next_page_url"]
+
+        expected = [
+            order.order_number
+            for order in sorted(self.orders, key=lambda o: (o.date, o.pk), reverse=True)
+        ]
+        self.assertEqual(seen, expected)
+
+    def test_emails_match_in_any_case_through_the_index(self):
+        order = create_order(make_order(email="Buyer@Example.com"),
+                             [{"product": Product.objects.first(), "quantity": 1}])
+
+        response = self.client.get(reverse("order_history"))
+        self.assertEqual(response.context["orders"][0].pk, order.pk)
+
+        plan = Order.for_email("BUYER@example.com").order_by("-date").explain()
+        self.assertIn("checkout_order_email_date_idx", plan)
+        self.assertNotIn("SCAN", plan)
+
+    def test_api_returns_orders_with_lines(self):
+        response = self.client.get(reverse("order_history_api"))
+        data = response.json()
+
+        self.assertEqual(len(data["orders"]), 10)
+        self.assertEqual(data["orders"][0]["order_number"], self.orders[-1].order_number)
+        self.assertEqual(len(data["orders"][0]["lines"]), 3)
+        self.assertIsNone(data["previous"])
+
+        older = self.client.get(data["next"]).json()
+        self.assertEqual(older["orders"][0]["order_number"], self.orders[14].order_number)
+        self.assertIsNotNone(older["previous"])
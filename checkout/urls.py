@@ -2,6 +2,14 @@ from django.urls import path
 
 from . import views
 
+# Only these are routed (boutique_ado.urls): the checkout page itself has
+# no template yet.
+history_urlpatterns = [
+    path("history/", views.order_history, name="order_history"),
+    path("api/history/", views.order_history_api, name="order_history_api"),
+]
+
 urlpatterns = [
     path("", views.checkout, name="checkout"),
+    *history_urlpatterns,
 ]
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from django.urls import reverse
+
+from bag.storage import get_bag
+from products.pagination import paginate_keyset
 
 from .forms import OrderForm
+from .models import Order, OrderLineItem
 
 
 def checkout(request):
     """Render the checkout page or redirect if bag is empty."""
-    bag = request.session.get("bag", {})
+    bag = get_bag(request)
 
     if not bag:
         messages.error(request, "There's nothing in your bag at the moment.")
@@ -19,3 +28,81 @@ def checkout(request):
     }
 
     return render(request, "checkout/checkout.html", context)
+
+
+def _order_history_page(request):
+    """
+    Return one keyset page of the user's orders, newest first.
+
+    Orders are matched by the account's email address, in any letter case,
+    using the (lower(email), -date) index. Line items and their products are prefetched, so
+    a page costs three queries however many orders the customer has.
+    """
+    email = request.user.email
+    orders = (
+        Order.for_email(email) if email else Order.objects.none()
+    ).prefetch_related(
+        Prefetch(
+            "lineitems",
+            queryset=OrderLineItem.objects.select_related("product").order_by("pk"),
+        )
+    )
+    return paginate_keyset(
+        orders,
+        "date",
+        descending=True,
+        cursor=request.GET.get("cursor"),
+        per_page=getattr(settings, "ORDERS_PER_PAGE", 10),
+    )
+
+
+def _cursor_url(name: str, cursor: str | None):
+    return f"{reverse(name)}?cursor={cursor}" if cursor else None
+
+
+@login_required
+def order_history(request):
+    """Show the signed-in customer's past orders."""
+    page = _order_history_page(request)
+
+    context = {
+        "orders": page.object_list,
+        "next_page_url": _cursor_url("order_history", page.next_cursor),
+        "previous_page_url": _cursor_url("order_history", page.previous_cursor),
+    }
+
+    return render(request, "checkout/order_history.html", context)
+
+
+@login_required
+def order_history_api(request):
+    """Return the signed-in customer's past orders as JSON."""
+    page = _order_history_page(request)
+
+    orders = [
+        {
+            "order_number": order.order_number,
+            "date": order.date.isoformat(),
+            "order_total": str(order.order_total),
+            "delivery_cost": str(order.delivery_cost),
+            "grand_total": str(order.grand_total),
+            "lines": [
+                {
+                    "product_id": line.product_id,
+                    "sku": line.product.sku,
+                    "name": line.product.name,
+                    "size": line.product_size,
+                    "quantity": line.quantity,
+                    "lineitem_total": str(line.lineitem_total),
+                }
+                for line in order.lineitems.all()
+            ],
+        }
+        for order in page.object_list
+    ]
+
+    return JsonResponse({
+        "orders": orders,
+        "next": _cursor_url("order_history_api", page.next_cursor),
+        "previous": _cursor_url("order_history_api", page.previous_cursor),
+    })
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "metrics"
+    verbose_name = "Metrics"
+
+    def ready(self):
+        """
+        Install the database and template timing hooks.
+        """
+        from .instrumentation import install
+
+        install()
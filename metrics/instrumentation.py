@@ -0,0 +1,89 @@
+"""
+Per-request measurements collected while a view runs.
+
+The state of the current request lives in a context variable, so it follows
+the request into ``sync_to_async`` threads. Database time is measured by an
+execute wrapper added to every connection when it opens. With
+METRICS_TEMPLATE_TIMING, template time is measured around the template
+backend's ``render``. Only the outermost render counts, so nested
+``render_to_string`` calls are not counted twice.
+"""
+
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+_current = ContextVar("metrics_request", default=None)
+
+
+class RequestMetrics:
+    """Counters for one request."""
+
+    __slots__ = ("queries", "query_time", "template_time", "rendering")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+
+def start_request() -> tuple:
+    """Begin measuring a request; returns (state, token for finish_request)."""
+    state = RequestMetrics()
+    return state, _current.set(state)
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that times queries run during a measured request."""
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state.queries += 1
+        state.query_time += perf_counter() - start
+
+
+def _add_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        # Put it first: connection.execute_wrapper() blocks pop the last
+        # wrapper on exit, and this one must outlive them.
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        state = _current.get()
+        if state is None or state.rendering:
+            return render(self, context, request)
+
+        state.rendering = True
+        start = perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            state.rendering = False
+            state.template_time += perf_counter() - start
+
+    wrapper.metrics_timed = True
+    return wrapper
+
+
+def install() -> None:
+    """Install the hooks; safe to call more than once."""
+    connection_created.connect(
+        _add_query_wrapper, dispatch_uid="metrics_query_wrapper")
+    if settings.METRICS_TEMPLATE_TIMING and not getattr(
+            Template.render, "metrics_timed", False):
+        Template.render = _timed_render(Template.render)
@@ -0,0 +1,79 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import finish_request, start_request
+from .registry import registry
+
+UNRESOLVED = "<unresolved>"
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database, template and response size metrics per view.
+    Template time is only recorded with METRICS_TEMPLATE_TIMING.
+
+    Views are labelled by URL name (e.g. ``products``, ``account_login``),
+    which keeps the number of series bounded. Place it first in MIDDLEWARE
+    so the latency covers the rest of the stack. It runs natively in both
+    the sync and the async stack, so it never adds a thread switch.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = start_request()
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._record(request, response, state, perf_counter() - start)
+
+    async def __acall__(self, request):
+        state, token = start_request()
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._record(request, response, state, perf_counter() - start)
+
+    def _record(self, request, response, state, duration):
+        match = getattr(request, "resolver_match", None)
+        view = (("view", match.view_name if match else UNRESOLVED),)
+
+        registry.inc(
+            "django_http_requests_total",
+            (*view, ("method", request.method), ("status", str(response.status_code))),
+        )
+        registry.observe("django_http_request_duration_seconds", view, duration)
+        registry.inc("django_db_queries_total", view, state.queries)
+        registry.inc("django_db_query_duration_seconds_total", view, state.query_time)
+        if settings.METRICS_TEMPLATE_TIMING:
+            registry.inc(
+                "django_template_render_duration_seconds_total", view, state.template_time)
+
+        size = _response_size(response)
+        if size is not None:
+            registry.observe("django_http_response_size_bytes", view, size)
+
+        registry.maybe_flush()
+        return response
+
+
+def _response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    length = response.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
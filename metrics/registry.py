@@ -0,0 +1,231 @@
+"""
+In-process metric storage and Prometheus text exposition.
+
+Each thread records into its own shard, so recording never takes a lock.
+A scrape adds the shards up. When ``METRICS_DIR`` is set, every process also
+writes its totals to a file in that directory, at most once per
+``METRICS_FLUSH_INTERVAL`` seconds and at exit. A scrape then merges the
+files of all worker processes, whichever worker answers it. Clear the
+directory when the application is deployed or restarted.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "django_http_requests_total": (
+        "counter", "Requests handled, by view, method and status.", None),
+    "django_http_request_duration_seconds": (
+        "histogram", "Time spent handling a request, by view.", LATENCY_BUCKETS),
+    "django_http_response_size_bytes": (
+        "histogram", "Size of response bodies, by view.", SIZE_BUCKETS),
+    "django_db_queries_total": (
+        "counter", "Database queries run while handling requests, by view.", None),
+    "django_db_query_duration_seconds_total": (
+        "counter", "Time spent in database queries, by view.", None),
+    "django_template_render_duration_seconds_total": (
+        "counter", "Time spent rendering templates, by view.", None),
+}
+
+
+class Registry:
+    """Counters and histograms, sharded per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._pid = None
+        self._file_name = None
+        self._last_flush = time.monotonic()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Only taken once per thread, never on the recording path.
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name: str, labels: tuple, amount: float = 1) -> None:
+        """Add to a counter."""
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        """
+        Record a histogram observation.
+
+        Histograms are stored as per-bucket (non-cumulative) counts, with the
+        overflow bucket last, followed by the sum of observed values.
+        """
+        shard = self._shard()
+        key = (name, labels)
+        buckets = METRICS[name][2]
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0] * (len(buckets) + 2)
+
+        index = len(buckets)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                index = i
+                break
+        series[index] += 1
+        series[-1] += value
+
+    def snapshot(self) -> dict:
+        """Return this process's totals, summed over all threads."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so it is safe while
+        # the owning thread keeps recording.
+        return merge(shard.copy() for shard in shards)
+
+    def reset(self) -> None:
+        """Forget everything recorded so far (used by tests)."""
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def _process_file_name(self) -> str:
+        # Named on first write, not at import: a server that imports the app
+        # and then forks its workers would otherwise give them all one file.
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._file_name = f"{pid}-{time.time_ns()}.json"
+        return self._file_name
+
+    def flush(self, directory=None) -> None:
+        """Write this process's totals to the metrics directory."""
+        directory = directory or metrics_dir()
+        if not directory:
+            return
+        self._last_flush = time.monotonic()
+        target = Path(directory) / self._process_file_name()
+        temporary = target.with_name(f".{target.name}.{threading.get_ident()}")
+        temporary.write_text(json.dumps(dump(self.snapshot())))
+        os.replace(temporary, target)
+
+    def maybe_flush(self) -> None:
+        """Flush if the flush interval has passed since the last write."""
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+        if time.monotonic() - self._last_flush >= interval and metrics_dir():
+            self.flush()
+
+    def collect(self) -> dict:
+        """Return the totals of every worker process, or just this one."""
+        directory = metrics_dir()
+        if not directory:
+            return self.snapshot()
+
+        self.flush(directory)
+        snapshots = []
+        for path in Path(directory).glob("*.json"):
+            try:
+                snapshots.append(load(json.loads(path.read_text())))
+            except (OSError, ValueError):
+                # A file replaced or removed mid-scrape; skip it this time.
+                continue
+        return merge(snapshots)
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", None)
+
+
+def merge(snapshots) -> dict:
+    """Add up several snapshots."""
+    totals = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if isinstance(value, list):
+                current = totals.get(key)
+                totals[key] = (
+                    list(value) if current is None
+                    else [a + b for a, b in zip(current, value)]
+                )
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def dump(snapshot: dict) -> list:
+    return [[name, list(labels), value] for (name, labels), value in snapshot.items()]
+
+
+def load(rows: list) -> dict:
+    return {
+        (name, tuple(tuple(pair) for pair in labels)): value
+        for name, labels, value in rows
+        if name in METRICS
+    }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot: dict) -> str:
+    """Format a snapshot in the Prometheus text exposition format."""
+    series = {}
+    for (name, labels), value in snapshot.items():
+        series.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.get(name, ())):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip((*buckets, float("inf")), value):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_labels(labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_at_exit():
+    # Settings may be unavailable this late; losing the last few seconds of
+    # metrics is better than a traceback at shutdown.
+    try:
+        registry.flush()
+    except Exception:
+        pass
@@ -0,0 +1,124 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.template.backends.django import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from products.models import Product
+
+from .instrumentation import _timed_render
+from .registry import dump, registry, render
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        Product.objects.create(sku="M1", name="Shirt", description="", price="10.00")
+
+    def _sample(self, name, view):
+        return registry.snapshot().get((name, (("view", view),)))
+
+    def test_request_is_recorded_by_url_name(self):
+        self.client.get(reverse("products"))
+
+        snapshot = registry.snapshot()
+        key = (
+            "django_http_requests_total",
+            (("view", "products"), ("method", "GET"), ("status", "200")),
+        )
+        self.assertEqual(snapshot[key], 1)
+        self.assertGreater(self._sample("django_db_queries_total", "products"), 0)
+        self.assertIsNone(
+            self._sample("django_template_render_duration_seconds_total", "products"))
+
+        latency = self._sample("django_http_request_duration_seconds", "products")
+        self.assertEqual(sum(latency[:-1]), 1)
+        size = self._sample("django_http_response_size_bytes", "products")
+        self.assertGreater(size[-1], 0)
+
+    @override_settings(METRICS_TEMPLATE_TIMING=True)
+    def test_template_time_is_recorded_when_enabled(self):
+        # What install() does with the setting on at startup.
+        with mock.patch.object(Template, "render", _timed_render(Template.render)):
+            self.client.get(reverse("products"))
+
+        self.assertGreater(
+            self._sample("django_template_render_duration_seconds_total", "products"), 0)
+
+    @override_settings(ROOT_URLCONF="boutique_ado.asgi_urls")
+    async def test_async_views_are_recorded(self):
+        await self.async_client.get(reverse("products"))
+
+        snapshot = registry.snapshot()
+        key = (
+            "django_http_requests_total",
+            (("view", "products"), ("method", "GET"), ("status", "200")),
+        )
+        self.assertEqual(snapshot[key], 1)
+        self.assertGreater(self._sample("django_db_queries_total", "products"), 0)
+
+    def test_unknown_urls_share_one_label(self):
+        self.client.get("/no-such-page/")
+        self.assertEqual(
+            self._sample("django_db_queries_total", "<unresolved>"), 0)
+
+    def test_endpoint_uses_exposition_format(self):
+        self.client.get(reverse("products"))
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE django_http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'django_http_request_duration_seconds_bucket{view="products",le="+Inf"} 1',
+            body,
+        )
+        self.assertIn('django_http_request_duration_seconds_count{view="products"} 1', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN="s3cret")
+    def test_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+        self.client.force_login(
+            User.objects.create_user("ops", "ops@example.com", "pw", is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_each_process_writes_its_own_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("metrics.registry.os.getpid", return_value=1001):
+                registry.flush(directory)
+            # A worker forked after the registry was created.
+            with mock.patch("metrics.registry.os.getpid", return_value=1002):
+                registry.flush(directory)
+                registry.flush(directory)
+
+            names = sorted(path.name.split("-")[0] for path in Path(directory).glob("*.json"))
+        self.assertEqual(names, ["1001", "1002"])
+
+    def test_worker_files_are_merged(self):
+        other_worker = {
+            (
+                "django_http_requests_total",
+                (("view", "products"), ("method", "GET"), ("status", "200")),
+            ): 4,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, "1-1.json").write_text(json.dumps(dump(other_worker)))
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(reverse("products"))
+                body = render(registry.collect())
+
+        self.assertIn(
+            'django_http_requests_total{view="products",method="GET",status="200"} 5',
+            body,
+        )
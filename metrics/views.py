@@ -0,0 +1,32 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from .registry import registry, render
+
+
+def _may_read_metrics(request) -> bool:
+    """Staff, METRICS_ALLOWED_IPS or the METRICS_TOKEN bearer token."""
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return True
+    return request.user.is_staff
+
+
+@require_GET
+@never_cache
+def metrics(request):
+    """Expose request metrics in the Prometheus text format."""
+    if not _may_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(registry.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
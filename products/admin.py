@@ -1,5 +1,8 @@
 from django.contrib import admin
+from .images import generate_derivatives
 from .models import Product, Category
+from .pagination import EstimatedCountPaginator
+from .search import search_products
 
 
 @admin.register(Category)
@@ -29,15 +32,19 @@ class ProductAdmin(admin.ModelAdmin):
         "price",
         "rating",
     )
+    list_select_related = ("category",)
     list_filter = (
         "category",
     )
+    # Searches go through the full-text index (see get_search_results), so
+    # descriptions are searchable without an icontains table scan.
     search_fields = (
         "name",
         "sku",
-        "description",
     )
     ordering = ("name",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (
@@ -78,3 +85,15 @@ class ProductAdmin(admin.ModelAdmin):
             },
         ),
     )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search name, SKU, description and category via the FTS index."""
+        if not search_term.strip():
+            return queryset, False
+        return search_products(queryset, search_term), False
+
+    def save_model(self, request, obj, form, change):
+        """Save the product and build image derivatives for a new upload."""
+        super().save_model(request, obj, form, change)
+        if "image" in form.changed_data and obj.image:
+            generate_derivatives([obj], workers=1)
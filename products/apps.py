@@ -10,4 +10,4 @@ class ProductsConfig(AppConfig):
         """
         Initialize application signals.
         """
-        pass
+        import products.signals  # noqa: F401
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path("", async_views.all_products, name="products"),
+    path("<int:product_id>/", async_views.product_detail, name="product_detail"),
+]
@@ -0,0 +1,208 @@
+"""
+Async versions of the catalogue views, for ASGI deployments.
+
+They do their database work with the async ORM and resolve everything the
+templates would otherwise load lazily (the user, the bag, the navigation)
+before rendering, since templates run synchronously on the event loop. The
+sync views in products.views remain the ones served under WSGI.
+"""
+
+import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+
+from bag.contexts import abag_fingerprint, aget_bag_contents
+from bag.storage import BAG_SESSION_KEY
+
+from .cache import (
+    afragment_key,
+    aget_catalog_modified,
+    aget_catalog_version,
+    aget_or_render_fragment,
+)
+from .facets import acategory_facets, navigation_groups
+from .models import Product
+from .pagination import acount_results, apaginate_keyset
+from .views import _grid_fragment, _listing_context, _make_etag, parse_listing_query
+
+
+async def page_context(request) -> dict:
+    """
+    Load what base.html reads on every page, with the async ORM.
+
+    Replaces the lazy ``request.user`` with the resolved user and fills the
+    per-request bag contents, so the context processors no longer need the
+    database. Returns the navigation for the template context.
+    """
+    request.user = await request.auser()
+    await aget_bag_contents(request)
+    return {"nav_groups": navigation_groups(await acategory_facets())}
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """
+    Django's ``condition`` decorator for validators that are coroutines.
+
+    ``condition`` calls its validator functions synchronously, which would
+    run their queries on the event loop.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            last_modified = None
+            if last_modified_func:
+                if dt := await last_modified_func(request, *args, **kwargs):
+                    if not timezone.is_aware(dt):
+                        dt = timezone.make_aware(dt, datetime.timezone.utc)
+                    last_modified = int(dt.timestamp())
+            etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ("GET", "HEAD"):
+                if last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+async def _viewer_state(request):
+    """Async version of products.views._viewer_state."""
+    if len(messages.get_messages(request)):
+        return None
+
+    user = await request.auser()
+    return ":".join(
+        (
+            str(user.pk or 0),
+            await abag_fingerprint(request),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        )
+    )
+
+
+async def _is_stateless_visitor(request) -> bool:
+    if len(messages.get_messages(request)):
+        return False
+    user = await request.auser()
+    return not user.is_authenticated and not await request.session.aget(BAG_SESSION_KEY)
+
+
+async def _products_etag(request):
+    viewer = await _viewer_state(request)
+    if viewer is None:
+        return None
+    query = sorted(request.GET.lists())
+    return _make_etag("products", await aget_catalog_version(), query, viewer)
+
+
+async def _products_last_modified(request):
+    if not await _is_stateless_visitor(request):
+        return None
+    return await aget_catalog_modified()
+
+
+async def _product_validators(request, product_id):
+    if not hasattr(request, "_product_validators"):
+        request._product_validators = await (
+            Product.objects.filter(pk=product_id)
+            .values("updated_at", "category__name", "category__friendly_name")
+            .afirst()
+        )
+    return request._product_validators
+
+
+async def _product_detail_etag(request, product_id):
+    viewer = await _viewer_state(request)
+    validators = await _product_validators(request, product_id)
+    if viewer is None or validators is None:
+        return None
+    return _make_etag(
+        "product",
+        product_id,
+        validators["updated_at"].isoformat(),
+        validators["category__name"],
+        validators["category__friendly_name"],
+        viewer,
+    )
+
+
+async def _product_detail_last_modified(request, product_id):
+    if not await _is_stateless_visitor(request):
+        return None
+    validators = await _product_validators(request, product_id)
+    return validators["updated_at"] if validators else None
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=_products_etag, last_modified_func=_products_last_modified)
+async def all_products(request):
+    """
+    Show all products with optional sorting, category filtering, and search.
+    """
+    query = parse_listing_query(request)
+    if query is None:
+        return redirect(reverse("products"))
+
+    async def render_grid():
+        return _grid_fragment(
+            await apaginate_keyset(query.products, **query.page_options()),
+            await acount_results(
+                query.products, cap=getattr(settings, "PRODUCTS_COUNT_CAP", 1000)),
+        )
+
+    grid = await aget_or_render_fragment(
+        await afragment_key("grid", **query.grid_params()),
+        render_grid,
+    )
+
+    current_categories = query.current_categories()
+    if current_categories is not None:
+        current_categories = [category async for category in current_categories]
+
+    context = await page_context(request)
+    context.update(_listing_context(
+        request,
+        query,
+        grid,
+        await acategory_facets(query.search_term),
+        current_categories,
+    ))
+
+    return render(request, "products/products.html", context)
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(
+    etag_func=_product_detail_etag,
+    last_modified_func=_product_detail_last_modified,
+)
+async def product_detail(request, product_id):
+    """
+    Show a single product detail page.
+    """
+    product = await aget_object_or_404(
+        Product.objects.select_related("category"), pk=product_id)
+
+    context = await page_context(request)
+    context["product"] = product
+
+    return render(request, "products/product_detail.html", context)
@@ -0,0 +1,156 @@
+"""
+Versioned fragment caching for catalogue pages.
+
+Every cached fragment key embeds the current catalogue version. Saving or
+deleting a product or category bumps the version, which makes every older
+fragment unreachable at once; the bounded LRU backend then evicts them. The
+bump also records when the catalogue last changed, for Last-Modified.
+
+The version lives in the ``default`` cache. With more than one worker process
+that cache has to be shared (Redis, Memcached, database) for invalidation to
+reach every worker; the fragment TIMEOUT bounds staleness otherwise.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+
+CATALOG_VERSION_KEY = "products:catalog-version"
+CATALOG_MODIFIED_KEY = "products:catalog-modified"
+FRAGMENT_CACHE_ALIAS = "fragments"
+
+
+class FragmentCacheStats:
+    """Per-process hit and miss counters for the fragment cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+fragment_stats = FragmentCacheStats()
+
+
+def get_catalog_version() -> int:
+    """Return the current catalogue version, initialising it if missing."""
+    cache = caches["default"]
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost key can never revive old fragments.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version() -> int:
+    """Async version of get_catalog_version."""
+    cache = caches["default"]
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def get_catalog_modified() -> datetime:
+    """Return when the catalogue last changed, initialising it if missing."""
+    cache = caches["default"]
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        # Unknown means "now": a later date only costs a full response.
+        cache.add(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return datetime.fromtimestamp(modified, timezone.utc)
+
+
+async def aget_catalog_modified() -> datetime:
+    """Async version of get_catalog_modified."""
+    cache = caches["default"]
+    modified = await cache.aget(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        await cache.aadd(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+        modified = await cache.aget(CATALOG_MODIFIED_KEY)
+    return datetime.fromtimestamp(modified, timezone.utc)
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every versioned fragment in O(1)."""
+    cache = caches["default"]
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+
+
+def _params_digest(params: dict) -> str:
+    return hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def fragment_key(name: str, **params) -> str:
+    """Build a cache key from a fragment name, its parameters and the version."""
+    return f"products:{name}:{get_catalog_version()}:{_params_digest(params)}"
+
+
+async def afragment_key(name: str, **params) -> str:
+    """Async version of fragment_key."""
+    return f"products:{name}:{await aget_catalog_version()}:{_params_digest(params)}"
+
+
+def get_or_render_fragment(key: str, render):
+    """
+    Return the cached fragment for ``key``, rendering and storing it on a miss.
+
+    ``render`` is called without arguments and must return a picklable value.
+    """
+    cache = caches[FRAGMENT_CACHE_ALIAS]
+    fragment = cache.get(key)
+    if fragment is not None:
+        fragment_stats.record(hit=True)
+        return fragment
+
+    fragment_stats.record(hit=False)
+    fragment = render()
+    cache.set(key, fragment)
+    return fragment
+
+
+async def aget_or_render_fragment(key: str, render):
+    """Async version of get_or_render_fragment; ``render`` is awaited."""
+    cache = caches[FRAGMENT_CACHE_ALIAS]
+    fragment = await cache.aget(key)
+    if fragment is not None:
+        fragment_stats.record(hit=True)
+        return fragment
+
+    fragment_stats.record(hit=False)
+    fragment = await render()
+    await cache.aset(key, fragment)
+    return fragment
@@ -0,0 +1,13 @@
+from .facets import navigation_groups
+
+
+def catalog_navigation(request):
+    """
+    Expose the category menus lazily.
+
+    The template engine calls ``nav_groups`` only when the navigation is
+    rendered, and the facets behind it are cached per catalogue version.
+    """
+    return {
+        "nav_groups": navigation_groups,
+    }
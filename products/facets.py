@@ -0,0 +1,146 @@
+"""
+Category facets: per-category product counts for navigation and filtering.
+
+Counts come from a single GROUP BY query and are cached per catalogue
+version, so a warm cache serves the navigation without touching the
+database.
+"""
+
+from django.core.cache import caches
+from django.db.models import Count
+
+from .cache import afragment_key, fragment_key
+from .models import Product
+from .search import search_products
+
+# Navigation menus in display order: (label, element id, label of the link
+# to the whole menu, links). Each link is a label and the categories it shows.
+CATEGORY_GROUPS = (
+    ("Clothing", "clothing", "All Clothing", (
+        ("Activewear & Essentials", ("activewear", "essentials")),
+        ("Jeans", ("jeans",)),
+        ("Shirts", ("shirts",)),
+    )),
+    ("Homeware", "homeware", "All Homeware", (
+        ("Bed & Bath", ("bed_bath",)),
+        ("Kitchen & Dining", ("kitchen_dining",)),
+    )),
+    ("Special Offers", "specials", "All Specials", (
+        ("New Arrivals", ("new_arrivals",)),
+        ("Deals", ("deals",)),
+        ("Clearance", ("clearance",)),
+    )),
+)
+
+FACET_TIMEOUT = 60 * 60
+
+
+def _facet_rows(queryset):
+    """One GROUP BY query over the queryset, ordered by category name."""
+    return (
+        queryset.filter(category__isnull=False)
+        .order_by()
+        .values("category__name", "category__friendly_name")
+        .annotate(count=Count("pk"))
+        .order_by("category__name")
+    )
+
+
+def _facet(row: dict) -> dict:
+    return {
+        "name": row["category__name"],
+        "friendly_name": row["category__friendly_name"] or row["category__name"],
+        "count": row["count"],
+    }
+
+
+def _facet_queryset(search_term: str | None):
+    queryset = Product.objects.all()
+    if search_term:
+        queryset = search_products(queryset, search_term)
+    return _facet_rows(queryset)
+
+
+def _facet_params(search_term: str | None) -> dict:
+    return {"q": " ".join(search_term.lower().split()) if search_term else None}
+
+
+def category_facets(search_term: str | None = None) -> list:
+    """
+    Return ``[{"name", "friendly_name", "count"}, ...]`` for every category
+    holding at least one product, optionally within a search.
+    """
+    key = fragment_key("facets", **_facet_params(search_term))
+    cache = caches["default"]
+    facets = cache.get(key)
+    if facets is None:
+        facets = [_facet(row) for row in _facet_queryset(search_term)]
+        cache.set(key, facets, FACET_TIMEOUT)
+    return facets
+
+
+async def acategory_facets(search_term: str | None = None) -> list:
+    """Async version of category_facets."""
+    key = await afragment_key("facets", **_facet_params(search_term))
+    cache = caches["default"]
+    facets = await cache.aget(key)
+    if facets is None:
+        facets = [_facet(row) async for row in _facet_queryset(search_term)]
+        await cache.aset(key, facets, FACET_TIMEOUT)
+    return facets
+
+
+def navigation_groups(facets: list | None = None) -> list:
+    """
+    Build the category menus from the cached facets.
+
+    Links whose categories have no products are left out, as are menus that
+    end up empty. Categories not listed in CATEGORY_GROUPS go to a "More"
+    menu under their friendly names. Async views pass in facets they have
+    already loaded.
+    """
+    if facets is None:
+        facets = category_facets()
+    facets = {facet["name"]: facet for facet in facets}
+    grouped = set()
+    groups = []
+
+    for label, slug, all_label, links in CATEGORY_GROUPS:
+        items = []
+        for link_label, names in links:
+            grouped.update(names)
+            if link := _link(link_label, [facets[n] for n in names if n in facets]):
+                items.append(link)
+        if items:
+            groups.append(_group(label, slug, all_label, items))
+
+    others = [
+        _link(facet["friendly_name"], [facet])
+        for name, facet in facets.items()
+        if name not in grouped
+    ]
+    if others:
+        groups.append(_group("More", "more", "All More", others))
+
+    return groups
+
+
+def _link(label: str, facets: list) -> dict | None:
+    if not facets:
+        return None
+    return {
+        "label": label,
+        "names": ",".join(facet["name"] for facet in facets),
+        "count": sum(facet["count"] for facet in facets),
+    }
+
+
+def _group(label: str, slug: str, all_label: str, links: list) -> dict:
+    return {
+        "label": label,
+        "slug": slug,
+        "all_label": all_label,
+        "links": links,
+        "all_names": ",".join(link["names"] for link in links),
+        "count": sum(link["count"] for link in links),
+    }
@@ -0,0 +1,163 @@
+"""
+Responsive image derivatives for product images.
+
+Each uploaded image gets resized copies in several widths, as WebP and JPEG.
+They sit next to the original and are named after a hash of its content:
+
+    products/shirt.jpg -> products/shirt.3f2a9c1be0d4.400w.webp
+
+The hash is stored on the product, so templates can build ``srcset`` values
+without touching the filesystem, and an image is only reprocessed when its
+content changes.
+"""
+
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice, repeat
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .cache import bump_catalog_version
+
+DERIVATIVE_WIDTHS = (200, 400, 800)
+DERIVATIVE_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 80, "optimize": True, "progressive": True},
+}
+HASH_LENGTH = 12
+JOB_BATCH_SIZE = 500
+DERIVATIVE_NAME_RE = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.\d+w\.[a-z]+$")
+
+
+def derivative_name(image_name: str, content_hash: str, width: int, extension: str) -> str:
+    """Return the storage name of one derivative."""
+    path = PurePosixPath(image_name)
+    return str(path.with_name(f"{path.stem}.{content_hash}.{width}w.{extension}"))
+
+
+def derivative_names(image_name: str, content_hash: str) -> list:
+    """Return every derivative name for an image version."""
+    return [
+        derivative_name(image_name, content_hash, width, extension)
+        for extension in DERIVATIVE_FORMATS
+        for width in DERIVATIVE_WIDTHS
+    ]
+
+
+def is_derivative(name: str) -> bool:
+    """Return True for derivative names, whose content never changes."""
+    return DERIVATIVE_NAME_RE.search(name) is not None
+
+
+def file_hash(path: str) -> str:
+    """Hash a file's content in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def render_derivatives(media_root: str, image_name: str, force: bool = False):
+    """
+    Write the derivatives of one image and return its content hash.
+
+    Runs in worker processes, so it only takes plain arguments and works on
+    the local filesystem below ``media_root``. Returns None when the original
+    is missing or unreadable.
+    """
+    root = Path(media_root)
+    source = root / image_name
+
+    try:
+        content_hash = file_hash(str(source))
+    except OSError:
+        return None
+
+    targets = derivative_names(image_name, content_hash)
+    if not force and all((root / name).exists() for name in targets):
+        return content_hash
+
+    try:
+        with Image.open(source) as original:
+            original.load()
+            image = original.convert("RGB")
+    except (OSError, UnidentifiedImageError):
+        return None
+
+    for width in DERIVATIVE_WIDTHS:
+        resized = image.copy()
+        # thumbnail() never upscales, so small originals keep their size.
+        resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        for extension, options in DERIVATIVE_FORMATS.items():
+            resized.save(
+                root / derivative_name(image_name, content_hash, width, extension),
+                **options,
+            )
+
+    return content_hash
+
+
+def _batches(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def generate_derivatives(products, workers: int | None = None, force: bool = False):
+    """
+    Generate derivatives for products with an uploaded image.
+
+    Products are read and saved in batches of JOB_BATCH_SIZE, so a large
+    queryset iterator is never held in memory at once. Images are processed
+    in a process pool (``workers`` processes; one process runs them inline)
+    and each product's ``image_hash`` is updated when it changes. Returns
+    (processed, failed) counts.
+    """
+    # Imported here so worker processes can load this module without an
+    # initialised app registry.
+    from .models import Product
+
+    media_root = str(settings.MEDIA_ROOT)
+    processed = failed = 0
+
+    with ExitStack() as stack:
+        pool = None
+        for batch in _batches((p for p in products if p.image), JOB_BATCH_SIZE):
+            names = [product.image.name for product in batch]
+            if workers == 1 or (pool is None and len(batch) <= 1):
+                hashes = [render_derivatives(media_root, name, force) for name in names]
+            else:
+                if pool is None:
+                    pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+                hashes = pool.map(
+                    render_derivatives,
+                    repeat(media_root),
+                    names,
+                    repeat(force),
+                    chunksize=8,
+                )
+
+            changed = []
+            now = timezone.now()
+            for product, content_hash in zip(batch, hashes):
+                if content_hash is None:
+                    failed += 1
+                    continue
+                processed += 1
+                if content_hash != product.image_hash:
+                    product.image_hash = content_hash
+                    # bulk_update() skips auto_now, and Last-Modified reads it.
+                    product.updated_at = now
+                    changed.append(product)
+
+            if changed:
+                Product.objects.bulk_update(changed, ["image_hash", "updated_at"])
+                bump_catalog_version()
+
+    return processed, failed
@@ -0,0 +1,231 @@
+"""
+Streaming catalogue import.
+
+Feeds are read one record at a time (JSON arrays, JSON Lines or CSV) and
+upserted by SKU in fixed-size batches, so memory use depends on the batch
+size rather than the size of the feed. Both Django fixture records
+(``{"model": ..., "pk": ..., "fields": {...}}``) and flat product rows are
+accepted.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+from .search import index_products
+
+PRODUCT_FIELDS = (
+    "category",
+    "name",
+    "description",
+    "has_sizes",
+    "price",
+    "rating",
+    "image_url",
+    "image",
+    "image_hash",
+    "updated_at",
+)
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+
+
+def iter_json_array(handle, chunk_size: int = 64 * 1024):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators between elements.
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array.")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A value that ends exactly at the buffer edge may be cut short.
+                if end < len(buffer) or eof:
+                    yield obj
+                    pos = end
+                    continue
+
+        if eof:
+            raise ValueError("Unexpected end of JSON array.")
+
+        chunk = handle.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_json_lines(handle):
+    """Yield one record per non-empty line."""
+    for line in handle:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path: Path, file_format: str | None = None):
+    """Open a feed and yield its records, picking the reader by format."""
+    file_format = file_format or path.suffix.lstrip(".").lower()
+
+    with path.open(encoding="utf-8", newline="") as handle:
+        if file_format == "json":
+            yield from iter_json_array(handle)
+        elif file_format in ("jsonl", "ndjson"):
+            yield from iter_json_lines(handle)
+        elif file_format == "csv":
+            yield from csv.DictReader(handle)
+        else:
+            raise ValueError(f"Unsupported feed format: {file_format!r}")
+
+
+def _to_decimal(value):
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _to_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in _TRUE_VALUES
+
+
+class CatalogImporter:
+    """
+    Upsert categories and products from streamed records.
+
+    Categories are resolved through in-memory maps: by name, and by the
+    primary keys used in fixture files imported earlier in the same run.
+    """
+
+    def __init__(self, batch_size: int = 1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.category_ids = dict(Category.objects.values_list("name", "pk"))
+        self.existing_category_ids = set(self.category_ids.values())
+        self.fixture_category_ids = {}
+        self.imported = 0
+        self.skipped = 0
+
+    def import_records(self, records) -> None:
+        """Consume records, flushing a batch whenever it fills up."""
+        batch = {}
+        for record in records:
+            if record.get("model") == "products.category":
+                self._import_category(record)
+                continue
+
+            product = self._build_product(record)
+            if product is None:
+                self.skipped += 1
+                continue
+
+            # Later rows for the same SKU win, as with sequential saves.
+            batch[product.sku] = product
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+
+        if batch:
+            self._flush(batch)
+
+        bump_catalog_version()
+
+    def _import_category(self, record) -> None:
+        fields = record.get("fields", record)
+        name = fields["name"]
+        category, _ = Category.objects.update_or_create(
+            name=name, defaults={"friendly_name": fields.get("friendly_name")})
+        self.category_ids[name] = category.pk
+        self.existing_category_ids.add(category.pk)
+        if "pk" in record:
+            self.fixture_category_ids[record["pk"]] = category.pk
+
+    def _resolve_category(self, value):
+        if value in (None, ""):
+            return None
+        if isinstance(value, int) or str(value).isdigit():
+            value = int(value)
+            if value in self.fixture_category_ids:
+                return self.fixture_category_ids[value]
+            return value if value in self.existing_category_ids else None
+
+        if value not in self.category_ids:
+            category, _ = Category.objects.get_or_create(name=value)
+            self.category_ids[value] = category.pk
+            self.existing_category_ids.add(category.pk)
+        return self.category_ids[value]
+
+    def _build_product(self, record):
+        fields = record.get("fields", record)
+        sku = (fields.get("sku") or "").strip()
+        price = _to_decimal(fields.get("price"))
+        if not sku or not fields.get("name") or price is None:
+            return None
+
+        return Product(
+            sku=sku,
+            category_id=self._resolve_category(fields.get("category")),
+            name=fields["name"],
+            description=fields.get("description") or "",
+            has_sizes=_to_bool(fields.get("has_sizes")),
+            price=price,
+            rating=_to_decimal(fields.get("rating")),
+            image_url=fields.get("image_url") or None,
+            image=fields.get("image") or None,
+        )
+
+    def _keep_unchanged_image_hashes(self, batch: dict) -> None:
+        # A changed image needs new derivatives: an empty hash makes
+        # generate_image_derivatives process it again.
+        stored = Product.objects.filter(sku__in=batch.keys()).values_list(
+            "sku", "image", "image_hash")
+        for sku, image, image_hash in stored:
+            product = batch[sku]
+            if (product.image.name or "") == (image or ""):
+                product.image_hash = image_hash
+
+    @transaction.atomic
+    def _flush(self, batch: dict) -> None:
+        self._keep_unchanged_image_hashes(batch)
+        Product.objects.bulk_create(
+            batch.values(),
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=PRODUCT_FIELDS,
+        )
+        # bulk_create skips signals, so refresh the search index here.
+        index_products(
+            Product.objects.filter(sku__in=batch.keys()).values_list("pk", flat=True))
+
+        self.imported += len(batch)
+        if self.progress:
+            self.progress(self.imported)
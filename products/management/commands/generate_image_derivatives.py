@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.images import generate_derivatives
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized WebP and JPEG derivatives for product images. "
+        "Images whose content has not changed are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes to use (default: one per CPU).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate derivatives even if they already exist.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] is not None and options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        products = Product.objects.exclude(image="").exclude(image=None).only(
+            "pk", "image", "image_hash")
+        processed, failed = generate_derivatives(
+            products.iterator(chunk_size=2000),
+            workers=options["workers"],
+            force=options["force"],
+        )
+
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f"{failed} images were missing or unreadable."))
+        self.stdout.write(self.style.SUCCESS(
+            f"Derivatives are up to date for {processed} images."))
@@ -0,0 +1,62 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importers import CatalogImporter, iter_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream categories and products from JSON, JSON Lines or CSV feeds "
+        "and upsert products by SKU in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="Feed files, imported in order (e.g. categories.json products.json).",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("json", "jsonl", "csv"),
+            help="Feed format; defaults to the file extension.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products upserted per query (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        started = time.perf_counter()
+
+        def report(imported):
+            elapsed = time.perf_counter() - started
+            rate = imported / elapsed if elapsed else 0
+            self.stdout.write(f"{imported} products imported ({rate:,.0f} rows/sec)")
+
+        importer = CatalogImporter(
+            batch_size=options["batch_size"], progress=report)
+
+        for path in options["paths"]:
+            path = Path(path)
+            if not path.exists():
+                raise CommandError(f"{path} does not exist.")
+            try:
+                importer.import_records(iter_records(path, options["format"]))
+            except ValueError as error:
+                raise CommandError(f"{path}: {error}") from error
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {importer.imported} products in {elapsed:.1f}s "
+                f"({importer.skipped} rows skipped)."
+            )
+        )
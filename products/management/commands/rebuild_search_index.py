@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from products.search import create_index, search_available
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from the catalogue."
+
+    def handle(self, *args, **options):
+        if not search_available():
+            raise CommandError(
+                "Full-text search needs an SQLite database with FTS5.")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            create_index(cursor)
+
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from boutique_ado.db import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the database to the catalogue replica file (CATALOG_REPLICA_PATH). "
+        "Run it on a schedule; the replica is as fresh as the last copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            help="Write the copy here instead of CATALOG_REPLICA_PATH.",
+        )
+
+    def handle(self, *args, **options):
+        target = options["target"] or getattr(settings, "CATALOG_REPLICA_PATH", None)
+        if not target:
+            raise CommandError("Set CATALOG_REPLICA_PATH or pass --target.")
+
+        try:
+            path = copy_database(target)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Catalogue replica written to {path}."))
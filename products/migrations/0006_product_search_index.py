@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from products.search import create_index, drop_index, search_available
+
+
+def create_search_index(apps, schema_editor):
+    if search_available(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            create_index(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    if search_available(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_listing_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
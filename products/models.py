@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import MaxValueValidator, MinValueValidator
 
+from .search import FTS_TABLE, SearchDocumentField
+
 
 class Category(models.Model):
     class Meta:
@@ -24,6 +27,14 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=["name"]),
             models.Index(fields=["category"]),
+            models.Index(fields=["price", "id"]),
+            models.Index(fields=["rating", "id"]),
+            models.Index(Lower("name"), "id", name="products_lower_name_id_idx"),
+            models.Index(fields=["updated_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sku"], name="products_product_unique_sku"),
         ]
 
     category = models.ForeignKey(
@@ -33,8 +44,8 @@ class Product(models.Model):
         on_delete=models.SET_NULL,
         related_name="products",
     )
-    sku = models.CharField(max_length=254, null=True,
-                           blank=True, db_index=True)
+    # Indexed by the products_product_unique_sku constraint.
+    sku = models.CharField(max_length=254, null=True, blank=True)
     name = models.CharField(max_length=254, db_index=True)
     description = models.TextField()
     has_sizes = models.BooleanField(default=False)
@@ -48,6 +59,8 @@ class Product(models.Model):
     )
     image_url = models.URLField(max_length=1024, null=True, blank=True)
     image = models.ImageField(upload_to="products/", null=True, blank=True)
+    image_hash = models.CharField(max_length=12, blank=True, default="", editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
@@ -62,3 +75,50 @@ class Product(models.Model):
         if self.image_url:
             return self.image_url
         return ""
+
+    def image_srcset(self, extension: str) -> str:
+        """
+        Return a srcset of resized derivatives in the given format.
+
+        Empty until derivatives have been generated for the current image.
+        """
+        from .images import DERIVATIVE_WIDTHS, derivative_name
+
+        if not self.image or not self.image_hash:
+            return ""
+
+        storage = self.image.storage
+        return ", ".join(
+            f"{storage.url(derivative_name(self.image.name, self.image_hash, width, extension))} {width}w"
+            for width in DERIVATIVE_WIDTHS
+        )
+
+    @property
+    def image_srcset_webp(self) -> str:
+        return self.image_srcset("webp")
+
+    @property
+    def image_srcset_jpeg(self) -> str:
+        return self.image_srcset("jpg")
+
+
+class ProductSearchIndex(models.Model):
+    """
+    Read-only mapping of the FTS5 search index, so searches can join it.
+
+    The table itself is created and kept in sync by ``products.search``.
+    """
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+    product = models.OneToOneField(
+        "Product",
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name="search_index",
+    )
+    document = SearchDocumentField(db_column=FTS_TABLE)
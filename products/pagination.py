@@ -0,0 +1,290 @@
+"""
+Keyset (cursor) pagination for the product listing and order history, and
+cheap counting for large tables.
+
+Pages are fetched with a WHERE clause on the last row of the previous page
+instead of an OFFSET, so page N costs the same as page 1.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+# sort name -> field the ordering and the keyset filter are built on
+SORT_FIELDS = {
+    "default": "name",
+    "price": "price",
+    "rating": "rating",
+    "name": "lower_name",
+    "category": "category__name",
+    "relevance": "search_rank",
+    "date": "date",
+}
+
+DECIMAL_SORTS = {"price", "rating"}
+FLOAT_SORTS = {"relevance"}
+DATETIME_SORTS = {"date"}
+
+
+@dataclass
+class KeysetPage:
+    """A single page of results with cursors to its neighbours."""
+
+    object_list: list
+    next_cursor: str | None
+    previous_cursor: str | None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+@dataclass
+class ResultCount:
+    """A product count that may be capped for large result sets."""
+
+    value: int
+    is_exact: bool
+
+    def __str__(self) -> str:
+        return str(self.value) if self.is_exact else f"{self.value}+"
+
+
+def encode_cursor(sort: str, value, pk: int, backwards: bool = False) -> str:
+    """Encode the position of a row as an opaque URL-safe token."""
+    if isinstance(value, Decimal):
+        value = str(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, pk, backwards], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str):
+    """
+    Decode a cursor token for the given sort.
+
+    Returns (value, pk, backwards) or None if the token is invalid or was
+    issued for a different sort.
+    """
+    if not token:
+        return None
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_sort, value, pk, backwards = json.loads(
+            base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+    if cursor_sort != sort or not isinstance(pk, int):
+        return None
+
+    if value is not None:
+        if sort in DECIMAL_SORTS:
+            try:
+                value = Decimal(str(value))
+            except InvalidOperation:
+                return None
+        elif sort in FLOAT_SORTS:
+            if not isinstance(value, (int, float)):
+                return None
+            value = float(value)
+        elif sort in DATETIME_SORTS:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+        elif not isinstance(value, str):
+            return None
+
+    return value, pk, bool(backwards)
+
+
+def _sort_value(obj, field: str):
+    """Read the sort value of a row, following relations."""
+    value = obj
+    for part in field.split("__"):
+        value = getattr(value, part, None)
+        if value is None:
+            return None
+    return value
+
+
+def _ordering(field: str, descending: bool) -> list:
+    """
+    Order by the sort field with an id tiebreak in the same direction.
+
+    NULLs come first ascending and last descending, which matches SQLite's
+    native behaviour and keeps the index usable.
+    """
+    if descending:
+        return [F(field).desc(nulls_last=True), F("pk").desc()]
+    return [F(field).asc(nulls_first=True), F("pk").asc()]
+
+
+def _after(field: str, value, pk: int, descending: bool) -> Q:
+    """Filter rows that come strictly after (value, pk) in the ordering."""
+    if descending:
+        if value is None:
+            return Q(**{f"{field}__isnull": True, "pk__lt": pk})
+        return (
+            Q(**{f"{field}__lt": value})
+            | Q(**{field: value, "pk__lt": pk})
+            | Q(**{f"{field}__isnull": True})
+        )
+
+    if value is None:
+        return (
+            Q(**{f"{field}__isnull": True, "pk__gt": pk})
+            | Q(**{f"{field}__isnull": False})
+        )
+    return Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk})
+
+
+def _keyset_queryset(queryset, sort: str, descending: bool,
+                     cursor: str | None, per_page: int):
+    """Return the page query (one row over ``per_page``) and the decoded cursor."""
+    field = SORT_FIELDS[sort]
+    position = decode_cursor(cursor, sort) if cursor else None
+    backwards = bool(position and position[2])
+
+    # Walking backwards means reading the reversed ordering from the cursor.
+    read_descending = descending != backwards
+    page_qs = queryset.order_by(*_ordering(field, read_descending))
+    if position:
+        value, pk, _ = position
+        page_qs = page_qs.filter(_after(field, value, pk, read_descending))
+
+    return page_qs[:per_page + 1], position
+
+
+def _keyset_page(rows: list, sort: str, position, per_page: int) -> KeysetPage:
+    """Trim the fetched rows to a page and work out its cursors."""
+    field = SORT_FIELDS[sort]
+    backwards = bool(position and position[2])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+
+    next_cursor = None
+    previous_cursor = None
+
+    if rows:
+        first, last = rows[0], rows[-1]
+        if has_more or backwards:
+            next_cursor = encode_cursor(sort, _sort_value(last, field), last.pk)
+        if position and (has_more or not backwards):
+            previous_cursor = encode_cursor(
+                sort, _sort_value(first, field), first.pk, backwards=True)
+
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(queryset, sort: str, descending: bool,
+                    cursor: str | None, per_page: int) -> KeysetPage:
+    """
+    Return one page of the queryset ordered by the given sort.
+
+    The queryset must already carry any annotation the sort relies on
+    (``lower_name`` for name sorting, ``search_rank`` for relevance).
+    """
+    page_qs, position = _keyset_queryset(queryset, sort, descending, cursor, per_page)
+    return _keyset_page(list(page_qs), sort, position, per_page)
+
+
+async def apaginate_keyset(queryset, sort: str, descending: bool,
+                           cursor: str | None, per_page: int) -> KeysetPage:
+    """Async version of paginate_keyset."""
+    page_qs, position = _keyset_queryset(queryset, sort, descending, cursor, per_page)
+    return _keyset_page([row async for row in page_qs], sort, position, per_page)
+
+
+def count_results(queryset, cap: int) -> ResultCount:
+    """
+    Count results exactly up to ``cap`` and report anything above as capped.
+
+    The count runs over a LIMITed subquery, so it never scans more than
+    ``cap + 1`` rows however large the catalogue is.
+    """
+    return _result_count(queryset.order_by()[:cap + 1].count(), cap)
+
+
+async def acount_results(queryset, cap: int) -> ResultCount:
+    """Async version of count_results."""
+    return _result_count(await queryset.order_by()[:cap + 1].acount(), cap)
+
+
+def _result_count(count: int, cap: int) -> ResultCount:
+    if count > cap:
+        return ResultCount(cap, is_exact=False)
+    return ResultCount(count, is_exact=True)
+
+
+def estimated_row_count(model, using: str) -> int | None:
+    """
+    Return the planner's estimate of a table's row count, if there is one.
+
+    Reads ``pg_class.reltuples`` on PostgreSQL and ``sqlite_stat1`` (filled
+    by ANALYZE) on SQLite. Returns None when no statistics are available.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(table)],
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables that were never analysed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over very large tables.
+
+    Unfiltered lists of large tables take the row count from the database's
+    statistics. Filtered lists are counted up to ``count_cap`` rows. Either
+    way no changelist has to scan a whole table just to number its pages.
+    """
+
+    estimate_threshold = 10000
+    count_cap = 10000
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return count_results(queryset, self.count_cap).value
@@ -0,0 +1,145 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+
+The index lives in the ``products_product_fts`` virtual table, keyed by the
+product id (its ``rowid``), and holds the product name, description, SKU and
+category friendly name. Signals in ``products.signals`` keep it in sync.
+"""
+
+import re
+
+from django.db import connection, models
+from django.db.models import FloatField, Lookup, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "products_product_fts"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+_INDEX_SELECT = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, description, sku, category)
+    SELECT p.id, p.name, p.description, COALESCE(p.sku, ''),
+           COALESCE(c.friendly_name, c.name, '')
+    FROM products_product p
+    LEFT OUTER JOIN products_category c ON c.id = p.category_id
+"""
+
+
+class SearchDocumentField(models.TextField):
+    """
+    The FTS5 hidden column named after the table, used as a MATCH target.
+    """
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+def search_available(using=None) -> bool:
+    """Return True when the database supports the FTS5 index."""
+    return (using or connection).vendor == "sqlite"
+
+
+def create_index(cursor) -> None:
+    """Create the FTS5 table and fill it from the catalogue."""
+    cursor.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            name, description, sku, category,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """
+    )
+    cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    cursor.execute(_INDEX_SELECT)
+
+
+def drop_index(cursor) -> None:
+    """Remove the FTS5 table."""
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def index_products(product_ids) -> None:
+    """Insert or refresh the index rows for the given products."""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not search_available():
+        return
+
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+            product_ids,
+        )
+        cursor.execute(
+            f"{_INDEX_SELECT} WHERE p.id IN ({placeholders})",
+            product_ids,
+        )
+
+
+def unindex_products(product_ids) -> None:
+    """Remove the index rows for the given products."""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not search_available():
+        return
+
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+            product_ids,
+        )
+
+
+def build_match_expression(search_term: str) -> str:
+    """
+    Turn free text into an FTS5 query.
+
+    Every word becomes a quoted prefix term and all terms must match, so
+    "bootcut je" finds "Bootcut Jeans" and user input can never inject FTS5
+    syntax.
+    """
+    terms = _TERM_RE.findall(search_term)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _constant_rank():
+    """Rank used when results are not ordered by relevance."""
+    return RawSQL("0", [], output_field=FloatField())
+
+
+def search_products(queryset, search_term: str):
+    """
+    Filter a product queryset by a search term.
+
+    Matching products are annotated with ``search_rank`` (BM25, lower is more
+    relevant). Without FTS5 support this falls back to icontains filtering
+    and a constant rank.
+    """
+    match = build_match_expression(search_term)
+
+    if not match:
+        return queryset.none().annotate(search_rank=_constant_rank())
+
+    if not search_available():
+        queries = Q(name__icontains=search_term) | Q(
+            description__icontains=search_term)
+        return queryset.filter(queries).annotate(search_rank=_constant_rank())
+
+    # Join the index rather than ranking in a correlated subquery: bm25()
+    # then reads the row the MATCH already produced instead of re-running
+    # the full-text query once per product.
+    return queryset.filter(search_index__document__match=match).annotate(
+        search_rank=RawSQL(
+            f"bm25({FTS_TABLE}, 10.0, 1.0, 5.0, 3.0)",
+            [],
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+from .search import index_products, unindex_products
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    """Refresh the search index row of a saved product."""
+    index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    """Drop the search index row of a deleted product."""
+    unindex_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_on_save(sender, instance, **kwargs):
+    """Refresh index rows whose category name may have changed."""
+    index_products(instance.products.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_products(sender, instance, **kwargs):
+    """Remember which products lose their category on delete."""
+    instance._indexed_product_ids = list(
+        instance.products.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_category_on_delete(sender, instance, **kwargs):
+    """Reindex products that no longer have a category."""
+    index_products(getattr(instance, "_indexed_product_ids", []))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def bump_catalog_version_on_change(sender, **kwargs):
+    """Invalidate cached catalogue fragments."""
+    bump_catalog_version()
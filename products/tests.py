@@ -1,3 +1,619 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models.functions import Lower
+from PIL import Image
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from boutique_ado.db import temporary_database
+from boutique_ado.routers import CatalogReplicaRouter, health, replica_reads
+from checkout.models import Order
+
+from .cache import CATALOG_MODIFIED_KEY, fragment_stats
+from .facets import category_facets, navigation_groups
+from .images import generate_derivatives
+from .importers import CatalogImporter, iter_json_array
+from .models import Category, Product
+from .pagination import (
+    EstimatedCountPaginator,
+    count_results,
+    estimated_row_count,
+    paginate_keyset,
+)
+from .search import search_products
+
+
+class ProductFixtureMixin:
+    """Create a small catalogue with ties and NULLs in every sort column."""
+
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(name="shirts", friendly_name="Shirts")
+        jeans = Category.objects.create(name="jeans", friendly_name="Jeans")
+        categories = [shirts, jeans, None]
+
+        for i in range(23):
+            Product.objects.create(
+                category=categories[i % 3],
+                name=f"{'ab'[i % 2]}Product {i % 5}",
+                description="Plain cotton",
+                price=Decimal(f"{10 + i % 4}.99"),
+                rating=None if i % 4 == 0 else Decimal(f"{i % 5}.5"),
+            )
+
+
+class KeysetPaginationTests(ProductFixtureMixin, TestCase):
+    """Walking the cursors must visit every product exactly once, in order."""
+
+    def _walk(self, queryset, sort, descending, per_page=5):
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_keyset(queryset, sort, descending, cursor, per_page)
+            seen.extend(p.pk for p in page.object_list)
+            if not page.has_next:
+                return seen, page
+            cursor = page.next_cursor
+
+    def test_every_sort_walks_forward_and_back(self):
+        queryset = Product.objects.select_related("category").annotate(
+            lower_name=Lower("name"))
+
+        for sort in ("default", "price", "rating", "name", "category"):
+            for descending in (False, True):
+                with self.subTest(sort=sort, descending=descending):
+                    seen, last_page = self._walk(queryset, sort, descending)
+                    self.assertEqual(len(seen), 23)
+                    self.assertEqual(len(set(seen)), 23)
+
+                    # Walk back from the last page to the first.
+                    backwards = [p.pk for p in last_page.object_list]
+                    page = last_page
+                    while page.has_previous:
+                        page = paginate_keyset(
+                            queryset, sort, descending, page.previous_cursor, 5)
+                        backwards = [p.pk for p in page.object_list] + backwards
+                    self.assertEqual(backwards, seen)
+
+    def test_invalid_cursor_returns_first_page(self):
+        queryset = Product.objects.all()
+        first = paginate_keyset(queryset, "price", False, None, 5)
+        bogus = paginate_keyset(queryset, "price", False, "not-a-cursor", 5)
+        self.assertEqual(first.object_list, bogus.object_list)
+
+    def test_count_is_capped(self):
+        self.assertEqual(str(count_results(Product.objects.all(), cap=100)), "23")
+        self.assertEqual(str(count_results(Product.objects.all(), cap=10)), "10+")
+
+
+@override_settings(PRODUCTS_PER_PAGE=10)
+class AllProductsViewTests(ProductFixtureMixin, TestCase):
+    """Tests for the product listing view."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        fragment_stats.reset()
+
+    def test_listing_is_paginated(self):
+        response = self.client.get(reverse("products"), {"sort": "price", "direction": "desc"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode().count("product-card"), 10)
+        self.assertEqual(str(response.context["result_count"]), "23")
+        self.assertIn("cursor=", response.context["next_page_url"])
+        self.assertIsNone(response.context["previous_page_url"])
+
+
+class ProductSearchTests(TestCase):
+    """Tests for the full-text product search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jeans = Category.objects.create(name="jeans", friendly_name="Jeans")
+        cls.bootcut = Product.objects.create(
+            category=cls.jeans,
+            sku="pp5001340155",
+            name="Arizona Original Bootcut Jeans",
+            description="Bootcut jeans in our original fit.",
+            price=Decimal("53.99"),
+        )
+        cls.shirt = Product.objects.create(
+            name="Oxford Shirt",
+            description="Goes well with bootcut jeans.",
+            price=Decimal("29.99"),
+        )
+
+    def _search(self, term):
+        results = search_products(Product.objects.all(), term)
+        return list(results.order_by("search_rank", "pk").values_list("pk", flat=True))
+
+    def test_prefix_terms_match_and_rank_by_relevance(self):
+        self.assertEqual(self._search("bootc"), [self.bootcut.pk, self.shirt.pk])
+        self.assertEqual(self._search("oxf shi"), [self.shirt.pk])
+
+    def test_listing_shows_search_results_in_relevance_order(self):
+        # Sorts first by name, but only mentions the term once.
+        belt = Product.objects.create(
+            name="Acme Belt", description="For bootcut jeans.", price=Decimal("9.99"))
+        caches["fragments"].clear()
+        response = self.client.get(reverse("products"), {"q": "bootc"})
+
+        content = response.content.decode()
+        positions = [
+            content.find(reverse("product_detail", args=[product.pk]))
+            for product in (self.bootcut, belt)
+        ]
+        self.assertEqual(str(response.context["result_count"]), "3")
+        self.assertNotIn(-1, positions)
+        self.assertEqual(positions, sorted(positions))
+
+    def test_sku_and_category_are_searchable(self):
+        self.assertEqual(self._search("pp500134"), [self.bootcut.pk])
+        self.assertEqual(self._search("jeans"), [self.bootcut.pk, self.shirt.pk])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.shirt.name = "Linen Blouse"
+        self.shirt.save()
+        self.assertEqual(self._search("linen"), [self.shirt.pk])
+
+        self.jeans.friendly_name = "Denim"
+        self.jeans.save()
+        self.assertEqual(self._search("denim"), [self.bootcut.pk])
+
+        self.jeans.delete()
+        self.assertEqual(self._search("denim"), [])
+
+        self.shirt.delete()
+        self.assertEqual(self._search("linen"), [])
+
+
+class ProductGridCacheTests(ProductFixtureMixin, TestCase):
+    """Tests for the versioned product grid fragment cache."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        fragment_stats.reset()
+
+    def test_equivalent_requests_share_a_fragment(self):
+        url = reverse("products")
+        self.client.get(url, {"category": "jeans,shirts", "sort": "price"})
+
+        with self.assertNumQueries(1):
+            # Only the current category lookup remains on a warm cache.
+            self.client.get(url, {"category": "shirts,jeans", "sort": "price", "direction": "asc"})
+
+        self.assertEqual(fragment_stats.hits, 1)
+        self.assertEqual(fragment_stats.misses, 1)
+
+    def test_catalog_changes_invalidate_fragments(self):
+        url = reverse("products")
+        self.client.get(url)
+
+        product = Product.objects.order_by("name", "pk").first()
+        product.name = "aaa Renamed product"
+        product.save()
+
+        response = self.client.get(url)
+        self.assertContains(response, "aaa Renamed product")
+        self.assertEqual(fragment_stats.misses, 2)
+
+
+class ConditionalGetTests(ProductFixtureMixin, TestCase):
+    """Tests for ETag and Last-Modified handling on catalogue pages."""
+
+    def setUp(self):
+        caches["fragments"].clear()
+        self.product = Product.objects.order_by("pk").first()
+        self.detail_url = reverse("product_detail", args=[self.product.pk])
+
+    def test_detail_answers_304_without_rendering(self):
+        # The first visit sets the CSRF cookie, which is part of the ETag.
+        self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_etag_follows_product_and_bag(self):
+        self.client.get(self.detail_url)
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        self.product.price = Decimal("99.00")
+        self.product.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        self.client.post(reverse("add_to_bag", args=[self.product.pk]), {"quantity": 1})
+        self.client.get(reverse("view_bag"))  # consume the bag message
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_listing_answers_304_until_catalogue_changes(self):
+        url = reverse("products")
+        self.client.get(url)
+        etag = self.client.get(url, {"sort": "rating"})["ETag"]
+
+        response = self.client.get(url, {"sort": "rating"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, {"sort": "price"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        Category.objects.filter(name="jeans").first().save()
+        response = self.client.get(url, {"sort": "rating"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_are_not_swallowed_by_a_304(self):
+        url = reverse("products")
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        self.client.get(url, {"q": ""})  # queues an error message
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["messages"]), 1)
+
+    def test_listing_last_modified_follows_categories_and_deletes(self):
+        url = reverse("products")
+        caches["default"].set(CATALOG_MODIFIED_KEY, time.time() - 60, timeout=None)
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        category = Category.objects.get(name="jeans")
+        category.friendly_name = "Denim"
+        category.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+        caches["default"].set(CATALOG_MODIFIED_KEY, time.time() - 60, timeout=None)
+        last_modified = self.client.get(url)["Last-Modified"]
+        Product.objects.order_by("pk").last().delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ROOT_URLCONF="boutique_ado.asgi_urls")
+class AsyncCatalogViewTests(ProductFixtureMixin, TestCase):
+    """
+    The async views run on the event loop, where any query outside the async
+    ORM raises SynchronousOnlyOperation, so rendering them proves the
+    templates no longer load anything lazily.
+    """
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    async def test_listing_matches_the_sync_view(self):
+        params = {"sort": "price", "direction": "desc", "category": "shirts,jeans"}
+        response = await self.async_client.get(reverse("products"), params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result_count"].value, 16)
+        self.assertEqual(
+            [c.name for c in response.context["current_categories"]], ["jeans", "shirts"])
+        self.assertIn("Cache-Control", response)
+
+        with self.settings(ROOT_URLCONF="boutique_ado.urls"):
+            for cache in caches.all():
+                cache.clear()
+            sync_response = await sync_to_async(self.client.get)(reverse("products"), params)
+        self.assertEqual(response.context["product_grid"], sync_response.context["product_grid"])
+
+    async def test_search_and_empty_search(self):
+        response = await self.async_client.get(reverse("products"), {"q": "cotton"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result_count"].value, 23)
+
+        response = await self.async_client.get(reverse("products"), {"q": " "})
+        self.assertRedirects(response, reverse("products"), fetch_redirect_response=False)
+
+    async def test_detail_answers_304_for_signed_in_users(self):
+        user = await User.objects.acreate_user("shopper", password="secret")
+        await self.async_client.aforce_login(user)
+        product = await Product.objects.order_by("pk").afirst()
+        url = reverse("product_detail", args=[product.pk])
+
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Order History")
+
+        response = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse("product_detail", args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogReplicaTests(TransactionTestCase):
+    """
+    The replica is a file copied from the test database by the
+    refresh_catalog_replica command, standing in for replication. The
+    primary is changed after the copy, so the two can be told apart.
+    """
+
+    @classmethod
+    def ensure_connection_patch_method(cls):
+        # The replica alias only exists while a test runs.
+        return BaseDatabaseWrapper.ensure_connection
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        health.reset()
+        self.addCleanup(health.reset)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name, "replica.sqlite3")
+
+        self.product = Product.objects.create(name="Linen shirt", price=Decimal("20.00"))
+        call_command("refresh_catalog_replica", target=str(self.path), stdout=io.StringIO())
+        Product.objects.filter(pk=self.product.pk).update(name="Linen shirt v2")
+
+        self.enterContext(temporary_database("replica", {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": self.path.as_uri() + "?mode=ro",
+        }))
+        self.router = CatalogReplicaRouter()
+
+    def test_requests_read_the_catalogue_from_the_replica(self):
+        response = self.client.get(reverse("product_detail", args=[self.product.pk]))
+        self.assertContains(response, "Linen shirt")
+        self.assertNotContains(response, "Linen shirt v2")
+
+        # Outside a request everything reads from the primary.
+        self.assertEqual(Product.objects.get(pk=self.product.pk).name, "Linen shirt v2")
+
+    def test_reads_after_a_write_use_the_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Product), "replica")
+            self.assertIsNone(self.router.db_for_read(Order))
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, "Linen shirt")
+
+            Category.objects.create(name="linen", friendly_name="Linen")
+
+            self.assertIsNone(self.router.db_for_read(Product))
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, "Linen shirt v2")
+
+    def test_unavailable_replica_falls_back_to_the_primary(self):
+        self.path.unlink()
+        response = self.client.get(reverse("product_detail", args=[self.product.pk]))
+        self.assertContains(response, "Linen shirt v2")
+
+        # The replica is checked again once REPLICA_RECHECK_SECONDS pass.
+        call_command("refresh_catalog_replica", target=str(self.path), stdout=io.StringIO())
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Product))
+            with mock.patch("boutique_ado.routers.REPLICA_RECHECK_SECONDS", 0):
+                self.assertEqual(self.router.db_for_read(Product), "replica")
+
+
+class CatalogImportTests(TestCase):
+    """Tests for the streaming catalogue importer."""
+
+    def test_json_array_is_streamed_in_small_chunks(self):
+        records = [{"sku": f"sku-{i}", "name": f"N {i}", "n": i * 1.5} for i in range(50)]
+        handle = io.StringIO(" [ " + ", ".join(json.dumps(r) for r in records) + " ] ")
+
+        self.assertEqual(list(iter_json_array(handle, chunk_size=7)), records)
+
+    def test_fixture_records_are_upserted_by_sku(self):
+        Product.objects.create(sku="dup", name="Old", description="x", price=Decimal("1.00"))
+        records = [
+            {"model": "products.category", "pk": 7, "fields": {"name": "jeans", "friendly_name": "Jeans"}},
+            {"model": "products.product", "fields": {
+                "sku": "dup", "name": "New", "description": "Denim", "price": 5, "category": 7}},
+            {"sku": "flat", "name": "Flat row", "price": "2.50", "category": "shirts", "has_sizes": "true"},
+            {"sku": "", "name": "No SKU", "price": "1.00"},
+        ]
+
+        importer = CatalogImporter(batch_size=2)
+        importer.import_records(records)
+
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(importer.skipped, 1)
+        updated = Product.objects.get(sku="dup")
+        self.assertEqual(updated.name, "New")
+        self.assertEqual(updated.category.name, "jeans")
+        flat = Product.objects.get(sku="flat")
+        self.assertTrue(flat.has_sizes)
+        self.assertEqual(flat.category.name, "shirts")
+        self.assertEqual(
+            list(search_products(Product.objects.all(), "denim").values_list("sku", flat=True)),
+            ["dup"],
+        )
+
+    def test_a_new_image_clears_the_derivative_hash(self):
+        Product.objects.create(
+            sku="same", name="Same", description="x", price=Decimal("1.00"),
+            image="products/same.jpg", image_hash="aaaaaaaaaaaa")
+        Product.objects.create(
+            sku="moved", name="Moved", description="x", price=Decimal("1.00"),
+            image="products/old.jpg", image_hash="bbbbbbbbbbbb")
+
+        CatalogImporter().import_records([
+            {"sku": "same", "name": "Same", "price": "1.00", "image": "products/same.jpg"},
+            {"sku": "moved", "name": "Moved", "price": "1.00", "image": "products/new.jpg"},
+        ])
+
+        self.assertEqual(Product.objects.get(sku="same").image_hash, "aaaaaaaaaaaa")
+        moved = Product.objects.get(sku="moved")
+        self.assertEqual(moved.image.name, "products/new.jpg")
+        self.assertEqual(moved.image_hash, "")
+        self.assertEqual(moved.image_srcset_webp, "")
+
+
+class ImageDerivativeTests(TestCase):
+    """Tests for responsive image derivatives."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = Path(media.name)
+        (self.media_root / "products").mkdir()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+        self.products = []
+        for i in range(2):
+            Image.new("RGB", (1000, 1000), (i * 100, 0, 0)).save(
+                self.media_root / "products" / f"shirt{i}.jpg")
+            self.products.append(Product.objects.create(
+                name=f"Shirt {i}", description="x", price=Decimal("1.00"),
+                image=f"products/shirt{i}.jpg"))
+
+    def test_derivatives_are_generated_once(self):
+        self.assertEqual(generate_derivatives(self.products, workers=2), (2, 0))
+
+        product = Product.objects.get(pk=self.products[0].pk)
+        self.assertEqual(len(product.image_hash), 12)
+        srcset = product.image_srcset_webp.split(", ")
+        self.assertEqual(len(srcset), 3)
+        self.assertTrue(srcset[0].endswith(".200w.webp 200w"))
+
+        derivatives = sorted(p.name for p in (self.media_root / "products").glob("shirt0.*w.*"))
+        self.assertEqual(len(derivatives), 6)
+        with Image.open(self.media_root / "products" / derivatives[0]) as image:
+            self.assertEqual(image.width, 200)
+
+        # A second run only hashes the originals and writes nothing.
+        mtimes = {p: p.stat().st_mtime_ns for p in (self.media_root / "products").iterdir()}
+        generate_derivatives(Product.objects.all(), workers=1)
+        self.assertEqual(
+            mtimes, {p: p.stat().st_mtime_ns for p in (self.media_root / "products").iterdir()})
+
+    def test_changed_hashes_are_saved_per_batch_with_a_new_timestamp(self):
+        before = {p.pk: p.updated_at for p in self.products}
+        with mock.patch("products.images.JOB_BATCH_SIZE", 1):
+            processed = generate_derivatives(Product.objects.iterator(), workers=1)
+
+        self.assertEqual(processed, (2, 0))
+        for product in Product.objects.all():
+            self.assertEqual(len(product.image_hash), 12)
+            self.assertGreater(product.updated_at, before[product.pk])
+
+    def test_missing_images_are_reported(self):
+        self.products[0].image = "products/missing.jpg"
+        self.assertEqual(generate_derivatives([self.products[0]], workers=1), (0, 1))
+
+
+class CategoryFacetTests(ProductFixtureMixin, TestCase):
+    """Tests for category facet counts and the navigation built on them."""
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_facets_come_from_one_query_and_are_cached(self):
+        with self.assertNumQueries(1):
+            facets = category_facets()
+        with self.assertNumQueries(0):
+            self.assertEqual(category_facets(), facets)
+
+        self.assertEqual(
+            [(f["name"], f["count"]) for f in facets], [("jeans", 8), ("shirts", 8)])
+
+    def test_facets_within_a_search(self):
+        Product.objects.create(
+            category=Category.objects.get(name="jeans"),
+            name="Bootcut", description="Denim", price=Decimal("1.00"))
+
+        facets = category_facets("denim")
+        self.assertEqual([(f["name"], f["count"]) for f in facets], [("jeans", 1)])
+
+    def test_navigation_groups_and_invalidation(self):
+        groups = navigation_groups()
+        self.assertEqual([g["label"] for g in groups], ["Clothing"])
+        self.assertEqual([link["label"] for link in groups[0]["links"]], ["Jeans", "Shirts"])
+        self.assertEqual(groups[0]["all_label"], "All Clothing")
+        self.assertEqual(groups[0]["all_names"], "jeans,shirts")
+        self.assertEqual(groups[0]["count"], 16)
+
+        Category.objects.create(name="essentials", friendly_name="Basics").products.create(
+            name="Vest", description="x", price=Decimal("1.00"))
+        link = navigation_groups()[0]["links"][0]
+        self.assertEqual(
+            (link["label"], link["names"], link["count"]),
+            ("Activewear & Essentials", "essentials", 1),
+        )
+
+        Category.objects.create(name="gadgets", friendly_name="Gadgets").products.create(
+            name="Gadget", description="x", price=Decimal("1.00"))
+        groups = navigation_groups()
+        self.assertEqual([g["label"] for g in groups], ["Clothing", "More"])
+        self.assertEqual([link["label"] for link in groups[1]["links"]], ["Gadgets"])
+
+    def test_navigation_is_rendered_without_queries_when_warm(self):
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "?category=jeans,shirts")
+
+
+class ProductAdminTests(ProductFixtureMixin, TestCase):
+    """Tests for the product changelist on large catalogues."""
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        self.url = reverse("admin:products_product_changelist")
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.client.get(self.url)
+        # User, category filter choices, statistics check, count, page.
+        with self.assertNumQueries(5) as first:
+            self.client.get(self.url)
+
+        category = Category.objects.create(name="extra")
+        Product.objects.bulk_create(
+            Product(category=category, sku=f"X{i}", name=f"Extra {i}",
+                    description="", price=Decimal("1.00"))
+            for i in range(50)
+        )
+        with self.assertNumQueries(len(first.captured_queries)):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Extra 1")
+
+    def test_search_uses_the_full_text_index(self):
+        Product.objects.create(
+            sku="J1", name="Jeans", description="A relaxed bootcut fit", price="30.00")
+
+        response = self.client.get(self.url, {"q": "bootcut"})
+        self.assertEqual(
+            [p.name for p in response.context["cl"].result_list], ["Jeans"])
+
+    def test_large_unfiltered_tables_use_estimated_counts(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        total = Product.objects.count()
+        self.assertEqual(estimated_row_count(Product, "default"), total)
+
+        paginator = EstimatedCountPaginator(Product.objects.all(), 10)
+        paginator.estimate_threshold = 1
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, total)
+
+        filtered = EstimatedCountPaginator(Product.objects.filter(price__gt=0), 10)
+        filtered.count_cap = 5
+        self.assertEqual(filtered.count, 5)
@@ -1,82 +1,292 @@
+import hashlib
+from dataclasses import dataclass, field
+
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import QuerySet
 from django.db.models.functions import Lower
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from bag.contexts import bag_fingerprint
+from bag.storage import BAG_SESSION_KEY
+
+from .cache import (
+    fragment_key,
+    get_catalog_modified,
+    get_catalog_version,
+    get_or_render_fragment,
+)
+from .facets import category_facets
 
 from .models import Category, Product
+from .pagination import count_results, paginate_keyset
+from .search import search_products
 
 
-def all_products(request):
+def _viewer_state(request):
     """
-    Show all products with optional sorting, category filtering, and search.
+    Describe the per-visitor parts of a catalogue page.
+
+    Every page shows the bag total and the account menu, so validators must
+    change with the bag and the user. Returns None when the page has to be
+    rendered regardless, i.e. when messages are waiting to be shown.
+    """
+    if len(messages.get_messages(request)):
+        return None
+
+    return ":".join(
+        (
+            str(request.user.pk or 0),
+            bag_fingerprint(request),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        )
+    )
+
+
+def _make_etag(*parts) -> str:
+    """Hash validator parts into an ETag value."""
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def _is_stateless_visitor(request) -> bool:
+    """
+    Return True for anonymous visitors with an empty bag and no messages.
+
+    Last-Modified cannot express bag or login changes, so it is only sent
+    when neither can affect the page. A pending message would be lost to a
+    304, as with the ETag.
+    """
+    return (
+        not len(messages.get_messages(request))
+        and not request.user.is_authenticated
+        and not request.session.get(BAG_SESSION_KEY)
+    )
+
+
+def _products_etag(request):
+    """ETag for the listing: catalogue version, query string and viewer."""
+    viewer = _viewer_state(request)
+    if viewer is None:
+        return None
+    query = sorted(request.GET.lists())
+    return _make_etag("products", get_catalog_version(), query, viewer)
+
+
+def _products_last_modified(request):
+    """Last-Modified for the listing: the last product or category change."""
+    if not _is_stateless_visitor(request):
+        return None
+    return get_catalog_modified()
+
+
+def _product_validators(request, product_id):
+    """Load the fields the detail page validators depend on, once per request."""
+    if not hasattr(request, "_product_validators"):
+        request._product_validators = (
+            Product.objects.filter(pk=product_id)
+            .values("updated_at", "category__name", "category__friendly_name")
+            .first()
+        )
+    return request._product_validators
+
+
+def _product_detail_etag(request, product_id):
+    """ETag for a product page: product and category state plus viewer."""
+    viewer = _viewer_state(request)
+    validators = _product_validators(request, product_id)
+    if viewer is None or validators is None:
+        return None
+    return _make_etag(
+        "product",
+        product_id,
+        validators["updated_at"].isoformat(),
+        validators["category__name"],
+        validators["category__friendly_name"],
+        viewer,
+    )
+
+
+def _product_detail_last_modified(request, product_id):
+    """Last-Modified for a product page: the product's own timestamp."""
+    if not _is_stateless_visitor(request):
+        return None
+    validators = _product_validators(request, product_id)
+    return validators["updated_at"] if validators else None
+
+
+def _cursor_url(request, cursor):
+    """
+    Build the listing URL for a cursor, keeping the other query parameters.
+    """
+    if cursor is None:
+        return None
+
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return f"{reverse('products')}?{params.urlencode()}"
+
+
+@dataclass
+class ListingQuery:
+    """The listing's query string, parsed, and the product queryset it selects."""
+
+    products: QuerySet
+    search_term: str | None = None
+    category_names: list = field(default_factory=list)
+    sort: str | None = None
+    direction: str | None = None
+    cursor: str | None = None
+
+    @property
+    def page_sort(self) -> str:
+        # Searches without an explicit sort are ordered by relevance.
+        return self.sort or ("relevance" if self.search_term else "default")
+
+    @property
+    def current_sorting(self) -> str:
+        return f"{self.sort}_{self.direction}"
+
+    def current_categories(self):
+        if not self.category_names:
+            return None
+        return Category.objects.filter(name__in=self.category_names)
+
+    def grid_params(self) -> dict:
+        """The fragment key parameters of this page of the grid."""
+        return {
+            "sort": self.page_sort,
+            "direction": self.direction if self.direction == "desc" else "asc",
+            "categories": sorted(set(self.category_names)),
+            "q": " ".join(self.search_term.lower().split()) if self.search_term else None,
+            "cursor": self.cursor or None,
+        }
+
+    def page_options(self) -> dict:
+        """Keyword arguments for paginate_keyset."""
+        return {
+            "sort": self.page_sort,
+            "descending": self.direction == "desc",
+            "cursor": self.cursor,
+            "per_page": getattr(settings, "PRODUCTS_PER_PAGE", 24),
+        }
+
+
+def parse_listing_query(request) -> ListingQuery | None:
     """
-    products = Product.objects.select_related("category").all()
+    Read sorting, category filtering and search from the query string.
 
-    search_term = None
-    current_categories = None
-    sort = None
-    direction = None
+    Returns None, with an error message queued, for an empty search.
+    """
+    query = ListingQuery(Product.objects.select_related("category").all())
+    if not request.GET:
+        return query
 
     allowed_sorts = {"price", "rating", "name", "category"}
     allowed_directions = {"asc", "desc"}
 
-    if request.GET:
-        sort_param = request.GET.get("sort")
-        direction_param = request.GET.get("direction")
+    sort_param = request.GET.get("sort")
+    direction_param = request.GET.get("direction")
 
-        if sort_param in allowed_sorts:
-            sort = sort_param
-            sort_key = sort_param
+    if sort_param in allowed_sorts:
+        query.sort = sort_param
 
-            if sort_param == "name":
-                sort_key = "lower_name"
-                products = products.annotate(lower_name=Lower("name"))
+        if sort_param == "name":
+            query.products = query.products.annotate(lower_name=Lower("name"))
 
-            if sort_param == "category":
-                sort_key = "category__name"
+        if direction_param in allowed_directions:
+            query.direction = direction_param
 
-            if direction_param in allowed_directions:
-                direction = direction_param
+    category_param = request.GET.get("category")
+    if category_param:
+        query.category_names = [c.strip()
+                                for c in category_param.split(",") if c.strip()]
+        if query.category_names:
+            query.products = query.products.filter(
+                category__name__in=query.category_names)
 
-            if direction == "desc":
-                sort_key = f"-{sort_key}"
+    q_param = request.GET.get("q")
+    if q_param is not None:
+        query.search_term = q_param.strip()
+        if not query.search_term:
+            messages.error(
+                request, "You didn't enter any search criteria!")
+            return None
 
-            products = products.order_by(sort_key)
+        query.products = search_products(query.products, query.search_term)
 
-        category_param = request.GET.get("category")
-        if category_param:
-            category_names = [c.strip()
-                              for c in category_param.split(",") if c.strip()]
-            if category_names:
-                products = products.filter(category__name__in=category_names)
-                current_categories = Category.objects.filter(
-                    name__in=category_names)
+    query.cursor = request.GET.get("cursor")
+    return query
 
-        q_param = request.GET.get("q")
-        if q_param is not None:
-            search_term = q_param.strip()
-            if not search_term:
-                messages.error(
-                    request, "You didn't enter any search criteria!")
-                return redirect(reverse("products"))
 
-            queries = Q(name__icontains=search_term) | Q(
-                description__icontains=search_term)
-            products = products.filter(queries)
+def _grid_fragment(page, result_count) -> dict:
+    """The cached part of a listing page."""
+    return {
+        "html": render_to_string(
+            "products/includes/product_grid.html",
+            {"products": page.object_list},
+        ),
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+        "result_count": result_count,
+    }
 
-    current_sorting = f"{sort}_{direction}"
 
-    context = {
-        "products": products,
-        "search_term": search_term,
+def _listing_context(request, query, grid, facets, current_categories) -> dict:
+    return {
+        "product_grid": grid["html"],
+        "result_count": grid["result_count"],
+        "next_page_url": _cursor_url(request, grid["next_cursor"]),
+        "previous_page_url": _cursor_url(request, grid["previous_cursor"]),
+        "category_facets": facets,
+        "current_category_names": query.category_names,
+        "search_term": query.search_term,
         "current_categories": current_categories,
-        "current_sorting": current_sorting,
+        "current_sorting": query.current_sorting,
     }
 
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_products_etag, last_modified_func=_products_last_modified)
+def all_products(request):
+    """
+    Show all products with optional sorting, category filtering, and search.
+    """
+    query = parse_listing_query(request)
+    if query is None:
+        return redirect(reverse("products"))
+
+    def render_grid():
+        return _grid_fragment(
+            paginate_keyset(query.products, **query.page_options()),
+            count_results(
+                query.products, cap=getattr(settings, "PRODUCTS_COUNT_CAP", 1000)),
+        )
+
+    grid = get_or_render_fragment(
+        fragment_key("grid", **query.grid_params()),
+        render_grid,
+    )
+
+    context = _listing_context(
+        request,
+        query,
+        grid,
+        category_facets(query.search_term),
+        query.current_categories(),
+    )
+
     return render(request, "products/products.html", context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=_product_detail_etag,
+    last_modified_func=_product_detail_last_modified,
+)
 def product_detail(request, product_id):
     """
     Show a single product detail page.